@@ -0,0 +1,40 @@
+"""Boards shared by the tests of the board engines."""
+import random
+
+import pytest
+
+from tetris_dp import engine
+from tetris_dp import tetris_players
+
+
+def _noisy_board(rng, rows, cols):
+    """Get a board filled more towards the bottom, with holes, wells and no full rows."""
+    board = []
+    for y_position in range(rows):
+        density = max(0.0, (y_position - rows / 3) / rows * 1.5)
+        row = [int(rng.random() < density) for _ in range(cols)]
+        row[rng.randrange(cols)] = 0
+        board.append(row)
+    return board + [[1] * cols]
+
+
+def _game_boards(seed, moves):
+    """Get the boards of a seeded single_stage game."""
+    game = engine.TetrisEngine(seed)
+    boards = []
+    for _ in range(moves):
+        boards.append([row[:] for row in game.board])
+        game.step(tetris_players.single_stage_player(game.board, game.piece))
+        if game.gameover:
+            break
+    return boards
+
+
+@pytest.fixture(name='boards')
+def fixture_boards():
+    """Get seeded noisy boards of a few sizes and the boards of a played game."""
+    rng = random.Random(0)
+    boards = [engine.new_board()]
+    for rows, cols in ((20, 10), (12, 7), (16, 13)):
+        boards += [_noisy_board(rng, rows, cols) for _ in range(15)]
+    return boards + _game_boards(5, 40)
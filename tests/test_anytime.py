@@ -0,0 +1,50 @@
+"""Anytime player depths and deadline."""
+import time
+
+from tetris_dp import anytime
+from tetris_dp import engine
+from tetris_dp import expectimax
+from tetris_dp import tetris_players
+
+
+def _positions(count=12):
+    """Get (board, piece) positions of a seeded single_stage game."""
+    game = engine.TetrisEngine(3)
+    positions = []
+    for _ in range(count):
+        positions.append(([row[:] for row in game.board], game.piece))
+        game.step(tetris_players.single_stage_player(game.board, game.piece))
+    return positions
+
+
+def test_depth_0_is_single_stage():
+    """The move ready before any lookahead is the greedy one."""
+    for board, piece in _positions():
+        assert anytime.search(board, piece, 10, 0) == (
+            tetris_players.single_stage_player(board, piece), 0)
+
+
+def test_depth_1_is_expectimax(monkeypatch):
+    """A finished first iteration picks the expectimax move."""
+    monkeypatch.setattr(expectimax, 'EXPECTIMAX_PROCESSES', 1)
+    for board, piece in _positions(6):
+        assert anytime.search(board, piece, 10, 1) == (
+            expectimax.expectimax_player(board, piece, depth=1), 1)
+
+
+def test_expired_deadline_returns_depth_0():
+    """With no time left the greedy move is returned without looking ahead."""
+    for board, piece in _positions(6):
+        anytime.NODE_TABLE.clear()
+        assert anytime.search(board, piece, 0.0, 3) == (
+            tetris_players.single_stage_player(board, piece), 0)
+
+
+def test_deep_searches_stop_at_the_deadline():
+    """A search too deep to finish stops at the deadline, with slack for loaded machines."""
+    for board, piece in _positions(3):
+        anytime.NODE_TABLE.clear()
+        start_time = time.perf_counter()
+        _, depth = anytime.search(board, piece, 0.05, 10)
+        assert depth < 10
+        assert time.perf_counter() - start_time < 1.0
@@ -0,0 +1,58 @@
+"""The batch evaluator against the single stage player's other board engines."""
+# pylint: disable=protected-access
+import pytest
+
+from tetris_dp import batch_evaluator
+from tetris_dp import constants
+from tetris_dp import tetris_players
+
+# (USE_BITBOARD, USE_INCREMENTAL_FEATURES, USE_PERSISTENT_BOARDS) of the per move paths
+ENGINES = [(1, 1, 0), (1, 0, 0), (0, 0, 1), (0, 0, 0)]
+
+
+def _move_key(move):
+    """Get a hashable key for an (x, y, piece) move."""
+    off_x, off_y, piece = move
+    return off_x, off_y, tuple(map(tuple, piece))
+
+
+@pytest.fixture(name='fresh_tables')
+def fixture_fresh_tables():
+    """Start and end without the moves and costs cached by other engines."""
+    tetris_players.MOVE_TABLE.clear()
+    tetris_players.AFTERSTATE_TABLE.clear()
+    yield
+    tetris_players.MOVE_TABLE.clear()
+    tetris_players.AFTERSTATE_TABLE.clear()
+
+
+@pytest.mark.parametrize('engine_flags', ENGINES)
+def test_best_move_matches(boards, monkeypatch, fresh_tables, engine_flags):
+    """The batch evaluator picks the same move at the same cost as every per move path."""
+    del fresh_tables
+    for flag, value in zip(('USE_BITBOARD', 'USE_INCREMENTAL_FEATURES',
+                            'USE_PERSISTENT_BOARDS'), engine_flags):
+        monkeypatch.setattr(tetris_players, flag, value)
+    for board in boards:
+        for piece in constants.TETRIS_SHAPES:
+            monkeypatch.setattr(tetris_players, 'USE_BATCH_EVALUATOR', 1)
+            move, cost = tetris_players._find_best_move(board, piece)
+            monkeypatch.setattr(tetris_players, 'USE_BATCH_EVALUATOR', 0)
+            expected_move, expected_cost = tetris_players._find_best_move(board, piece)
+            assert move == expected_move
+            assert cost == pytest.approx(expected_cost)
+
+
+def test_costs_of_every_move(boards, fresh_tables):
+    """Every candidate gets the cost the per move path gives it."""
+    del fresh_tables
+    for board in boards:
+        for piece in constants.TETRIS_SHAPES:
+            moves, costs = batch_evaluator.evaluate_moves(board, piece,
+                                                          tetris_players.DELLACHERIE_WEIGHTS)
+            cost_to_move = tetris_players._get_costs_of_moves(board, piece)
+            batch_costs = dict(zip(map(_move_key, moves), costs.tolist()))
+            # Moves of equal cost share a key in cost_to_move, the last one is kept
+            for cost, move in cost_to_move.items():
+                assert batch_costs[_move_key(move)] == pytest.approx(cost)
+            assert min(cost_to_move) == pytest.approx(min(batch_costs.values()))
@@ -0,0 +1,79 @@
+"""Batch runs and the settings they hand to the workers."""
+import json
+import multiprocessing
+
+import pytest
+
+from tetris_dp import batch_runner
+from tetris_dp import cli
+from tetris_dp import tetris_players
+
+# Weights which play very differently from the default ones
+BAD_WEIGHTS = [0.0, 0.0, 0.0, 0.0, -10.0, 0.0]
+
+
+def _pieces(output_path):
+    """Get the pieces placed in the game of every seed in an output file."""
+    return {int(result['seed']): result['pieces']
+            for result in batch_runner.read_results(str(output_path))}
+
+
+@pytest.fixture(name='spawn_workers')
+def fixture_spawn_workers():
+    """Start the pool workers with spawn, which inherits none of the module flags."""
+    start_method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method('spawn', force=True)
+    weights = list(tetris_players.DELLACHERIE_WEIGHTS)
+    yield
+    multiprocessing.set_start_method(start_method, force=True)
+    tetris_players.set_weights(weights)
+
+
+def test_weights_reach_spawned_workers(tmp_path, spawn_workers):
+    """The weights given on the command line are used by every worker."""
+    del spawn_workers
+    weights_path = tmp_path / 'weights.json'
+    weights_path.write_text(json.dumps(BAD_WEIGHTS))
+    arguments = ['--games', '2', '--max-pieces', '40']
+    cli.main(arguments + ['--output', str(tmp_path / 'default.jsonl'), '--processes', '1'])
+    cli.main(arguments + ['--output', str(tmp_path / 'pool.jsonl'), '--processes', '2',
+                          '--weights', str(weights_path)])
+    cli.main(arguments + ['--output', str(tmp_path / 'local.jsonl'), '--processes', '1',
+                          '--weights', str(weights_path)])
+    assert _pieces(tmp_path / 'pool.jsonl') == _pieces(tmp_path / 'local.jsonl')
+    assert _pieces(tmp_path / 'pool.jsonl') != _pieces(tmp_path / 'default.jsonl')
+
+
+@pytest.mark.parametrize('processes', ['0', '-1'])
+def test_processes_must_be_positive(tmp_path, processes):
+    """A worker count below 1 is an argument error instead of a Pool traceback."""
+    with pytest.raises(SystemExit):
+        cli.main(['--processes', processes, '--output', str(tmp_path / 'out.jsonl')])
+
+
+@pytest.mark.parametrize('extension', ['jsonl', 'csv'])
+def test_resume_after_a_torn_line(tmp_path, extension):
+    """A result cut short by a stopped run is played again instead of breaking the resume."""
+    output_path = str(tmp_path / 'out.{}'.format(extension))
+    batch_runner.run_batch('single_stage', range(3), output_path, processes=1, max_pieces=20)
+    with open(output_path, 'rb') as output_file:
+        data = output_file.read()
+    with open(output_path, 'wb') as output_file:
+        output_file.write(data[:-10])
+    assert [result['seed'] for result in batch_runner.read_results(output_path)] == [0, 1]
+    batch_runner.run_batch('single_stage', range(3), output_path, processes=1, max_pieces=20)
+    results = batch_runner.read_results(output_path)
+    assert [result['seed'] for result in results] == [0, 1, 2]
+    assert results[2]['pieces'] == 20
+
+
+def test_csv_fields_keep_their_types(tmp_path):
+    """CSV results read back with the types of the JSON lines ones."""
+    rows = {}
+    for extension in ('jsonl', 'csv'):
+        output_path = str(tmp_path / 'out.{}'.format(extension))
+        batch_runner.run_batch('single_stage', [4], output_path, processes=1, max_pieces=10)
+        rows[extension] = batch_runner.read_results(output_path)[0]
+    for field in batch_runner.RESULT_FIELDS:
+        assert type(rows['csv'][field]) is type(rows['jsonl'][field])
+    assert rows['csv']['seed'] == 4
@@ -0,0 +1,44 @@
+"""Beam search against single stage and exhaustive two piece search."""
+import pytest
+
+from tetris_dp import batch_evaluator
+from tetris_dp import beam_search
+from tetris_dp import constants
+from tetris_dp import tetris_players
+
+
+def _line_costs(board, piece):
+    """Get the lowest cost of a two piece line from every first move, with the beam's piece."""
+    weights = tetris_players.DELLACHERIE_WEIGHTS
+    next_piece = beam_search._sample_pieces(board, 1)[0]  # pylint: disable=protected-access
+    moves, costs, afterstates = batch_evaluator.evaluate_afterstates(board, piece, weights)
+    line_costs = []
+    for cost, afterstate in zip(costs.tolist(), afterstates):
+        _, next_costs, _ = batch_evaluator.evaluate_afterstates(afterstate, next_piece, weights)
+        line_costs.append(cost + float(next_costs.min()))
+    return moves, costs, line_costs
+
+
+def test_width_1_depth_1_is_single_stage(boards):
+    """A one move beam one piece deep picks the single stage move."""
+    for board in boards:
+        for piece in constants.TETRIS_SHAPES:
+            assert beam_search.beam_player(board, piece, 1, 1) == \
+                tetris_players.single_stage_player(board, piece)
+
+
+@pytest.mark.parametrize('width', [1, 2, 4, 1000])
+def test_never_worse_than_the_greedy_line(boards, width):
+    """The move picked starts a line at least as cheap as following single stage moves.
+
+    With a beam wide enough to keep every line the pruning must still find the cheapest one.
+    """
+    for board in boards[::4]:
+        for piece in constants.TETRIS_SHAPES:
+            moves, costs, line_costs = _line_costs(board, piece)
+            greedy_line_cost = line_costs[batch_evaluator.last_argmin(costs)]
+            move = beam_search.beam_player(board, piece, width, 2)
+            line_cost = line_costs[moves.index(move)]
+            assert line_cost <= greedy_line_cost + 1e-9
+            if width == 1000:
+                assert line_cost == pytest.approx(min(line_costs))
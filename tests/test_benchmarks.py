@@ -0,0 +1,38 @@
+"""Comparing benchmark results with a saved baseline."""
+import json
+
+import pytest
+
+from tetris_dp import benchmarks
+
+
+def _results(**seconds):
+    """Get benchmark results with the given seconds per call."""
+    return {'meta': {}, 'results': {name: {'seconds_per_call': value,
+                                           'calls_per_second': 1 / value}
+                                    for name, value in seconds.items()}}
+
+
+def test_compare_flags_only_slowdowns_over_the_tolerance():
+    """Benchmarks slower than the tolerance are flagged, faster or new ones are not."""
+    baseline = _results(slower=1.0, within=1.0, faster=1.0)
+    slower = 1.0 + benchmarks.REGRESSION_TOLERANCE * 1.5
+    within = 1.0 + benchmarks.REGRESSION_TOLERANCE / 2
+    results = _results(slower=slower, within=within, faster=0.5, new=9.0)
+    assert benchmarks.compare(results, baseline) == [('slower', 1.0, slower)]
+    assert not benchmarks.compare(results, baseline, tolerance=1.0)
+
+
+def test_main_exits_on_a_regression(tmp_path, monkeypatch, capsys):
+    """The command line exits with 1 and names the benchmark when one regressed."""
+    baseline_path = tmp_path / 'baseline.json'
+    baseline_path.write_text(json.dumps(_results(micro=1.0)), encoding='utf-8')
+    argv = ['--output', str(tmp_path / 'new.json'), '--compare', str(baseline_path)]
+    monkeypatch.setattr(benchmarks, 'run_benchmarks', lambda repeat: _results(micro=1.05))
+    benchmarks.main(argv)
+    assert 'No regressions' in capsys.readouterr().out
+    monkeypatch.setattr(benchmarks, 'run_benchmarks', lambda repeat: _results(micro=2.0))
+    with pytest.raises(SystemExit) as exit_info:
+        benchmarks.main(argv)
+    assert exit_info.value.code == 1
+    assert 'REGRESSION micro' in capsys.readouterr().out
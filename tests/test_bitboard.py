@@ -0,0 +1,65 @@
+"""Bitboard helpers against the list of lists ones."""
+import random
+
+from tetris_dp import bitboard
+from tetris_dp import constants
+from tetris_dp import helpers
+from tetris_dp import placements
+
+
+def _filled(board):
+    """Get a list of lists board with every non zero cell as 1."""
+    return [[int(bool(cell)) for cell in row] for row in board]
+
+
+def _moves(board):
+    """Yield every (piece, x, y) straight drop on a board and a few overlapping offsets."""
+    rng = random.Random(len(board) * 100 + len(board[0]))
+    for shape_index in range(len(constants.TETRIS_SHAPES)):
+        for placement in placements.get_placements(len(board[0]))[shape_index]:
+            for off_x in placement.x_range:
+                off_y = 0
+                while not helpers.check_collision(board, placement.piece, (off_x, off_y)):
+                    off_y += 1
+                yield placement.piece, off_x, off_y
+                # Anywhere above the floor, most of these overlap the board
+                lowest_y = len(board) - len(placement.piece) + 1
+                yield placement.piece, off_x, rng.randrange(1, lowest_y + 1)
+
+
+def test_check_collision(boards):
+    """Collisions agree everywhere, including off the sides and the bottom of the board."""
+    for board in boards:
+        rows = bitboard.from_board(board)
+        for piece, off_x, off_y in _moves(board):
+            for offset in ((off_x, off_y), (off_x, off_y - 1), (off_x - 1, off_y),
+                           (off_x + 1, off_y), (off_x, len(board))):
+                if offset[0] < 0:
+                    # A negative x wraps around in a list of lists board
+                    continue
+                assert bitboard.check_collision(rows, piece, offset) == \
+                    helpers.check_collision(board, piece, offset)
+
+
+def test_get_interm_board(boards):
+    """Afterstates and rows removed agree, overlapping cells are marked on the top row."""
+    for board in boards:
+        rows = bitboard.from_board(board)
+        for piece, off_x, off_y in _moves(board):
+            interm_board, removed_rows = helpers.get_interm_board(board, piece, (off_x, off_y))
+            interm_rows, bit_removed_rows = bitboard.get_interm_board(rows, piece,
+                                                                      (off_x, off_y))
+            assert bit_removed_rows == removed_rows
+            assert bitboard.to_board(interm_rows) == _filled(interm_board)
+
+
+def test_features_and_tops(boards):
+    """Holes, wells, transitions and column tops agree on boards and afterstates."""
+    for board in boards:
+        afterstates = [board] + [helpers.get_interm_board(board, piece, (off_x, off_y))[0]
+                                 for piece, off_x, off_y in _moves(board)]
+        for afterstate in afterstates:
+            rows = bitboard.from_board(afterstate)
+            assert bitboard.find_holes_and_wells(rows) == \
+                helpers.find_holes_and_wells(afterstate)
+            assert bitboard.column_tops(rows) == helpers.column_tops(afterstate)
@@ -0,0 +1,56 @@
+"""Incremental board features against recomputing them from scratch."""
+from tetris_dp import bitboard
+from tetris_dp import board_state
+from tetris_dp import constants
+from tetris_dp import helpers
+from tetris_dp import placements
+from tetris_dp import transposition
+
+
+def _assert_matches(state, board):
+    """Check every feature a board state keeps against the ones of a list of lists board."""
+    rows = bitboard.from_board(board)
+    assert state.rows == rows
+    assert state.features() == helpers.find_holes_and_wells(board)
+    assert state.tops == helpers.column_tops(board)
+    assert state.hash == transposition.zobrist_hash(rows)
+    fresh = board_state.BoardState(rows)
+    assert (state.column_holes, state.column_transitions) == \
+        (fresh.column_holes, fresh.column_transitions)
+    assert (state.row_transitions, state.row_wells) == \
+        (fresh.row_transitions, fresh.row_wells)
+
+
+def test_place_and_undo(boards):
+    """Every straight drop matches the recomputed afterstate and undo restores the board."""
+    for board in boards:
+        state = board_state.BoardState(bitboard.from_board(board))
+        tops = helpers.column_tops(board)
+        for shape_index in range(len(constants.TETRIS_SHAPES)):
+            for placement, off_x, off_y in placements.landing_placements(
+                    helpers, board, tops, shape_index):
+                interm_board, removed_rows = helpers.get_interm_board(
+                    board, placement.piece, (off_x, off_y))
+                assert state.place(placement, off_x, off_y) == removed_rows
+                _assert_matches(state, interm_board)
+                state.undo()
+                _assert_matches(state, board)
+
+
+def test_placements_stack(boards):
+    """Features stay exact over several placements before they are undone in turn."""
+    for board in boards[::5]:
+        state = board_state.BoardState(bitboard.from_board(board))
+        history = [board]
+        for shape_index in range(len(constants.TETRIS_SHAPES)):
+            board = history[-1]
+            moves = placements.landing_placements(helpers, board, helpers.column_tops(board),
+                                                  shape_index)
+            placement, off_x, off_y = moves[len(moves) // 2]
+            state.place(placement, off_x, off_y)
+            history.append(helpers.get_interm_board(board, placement.piece, (off_x, off_y))[0])
+            _assert_matches(state, history[-1])
+        while len(history) > 1:
+            state.undo()
+            history.pop()
+            _assert_matches(state, history[-1])
@@ -0,0 +1,56 @@
+"""Dataset exports, resuming them and the moves they record."""
+import numpy
+
+from tetris_dp import constants
+from tetris_dp import dataset
+from tetris_dp import engine
+from tetris_dp import pieces
+from tetris_dp import tetris_players
+
+SETTINGS = ('single_stage', 30, pieces.UNIFORM, (None, None))
+
+
+def _seeds(output_dir):
+    """Get the seed of every record in a dataset directory, in shard order."""
+    return numpy.concatenate([dataset.open_shard(path)['seed']
+                              for path in dataset.shard_paths(str(output_dir))]).tolist()
+
+
+def test_no_seeds_writes_nothing(tmp_path):
+    """An export without games returns 0 instead of starting an empty pool."""
+    assert dataset.export_dataset(str(tmp_path), [], SETTINGS, 2) == 0
+
+
+def test_rerun_skips_done_seeds(tmp_path):
+    """Seeds already in a shard are not played again, whatever the shard count."""
+    written = dataset.export_dataset(str(tmp_path), range(3), SETTINGS, 2)
+    assert dataset.export_dataset(str(tmp_path), range(3), SETTINGS, 2) == 0
+    written += dataset.export_dataset(str(tmp_path), range(5), SETTINGS, 3)
+    seeds = _seeds(tmp_path)
+    assert len(seeds) == written
+    assert sorted(set(seeds)) == list(range(5))
+
+
+def test_torn_game_is_played_again(tmp_path):
+    """A game cut short by a crash is dropped and played again on the next run."""
+    dataset.export_dataset(str(tmp_path), range(2), SETTINGS, 1)
+    shard_path = dataset.shard_paths(str(tmp_path))[0]
+    complete = dataset.open_shard(shard_path)['seed'].tolist()
+    with open(shard_path, 'r+b') as shard_file:
+        shard_file.truncate(shard_file.seek(0, 2) - 5)
+    dataset.export_dataset(str(tmp_path), range(2), SETTINGS, 1)
+    assert sorted(_seeds(tmp_path)) == sorted(complete)
+
+
+def _ask_single_stage(board, piece):
+    """Ask the single stage player, which play_records can't tell apart from other players."""
+    return tetris_players.single_stage_player(board, piece)
+
+
+def test_single_stage_records_match_the_player():
+    """The single stage moves taken from the recorded costs are the ones the player makes."""
+    dtype = dataset.record_dtype(constants.CONFIG['rows'], constants.CONFIG['cols'])
+    records = dataset.play_records(engine.TetrisEngine(7), tetris_players.single_stage_player,
+                                   30, dtype)
+    asked = dataset.play_records(engine.TetrisEngine(7), _ask_single_stage, 30, dtype)
+    assert records.tobytes() == asked.tobytes()
@@ -0,0 +1,98 @@
+"""Headless game rules against the rules TetrisApp played by before the engine."""
+import random
+
+import pytest
+
+from tetris_dp import constants
+from tetris_dp import engine
+from tetris_dp import helpers
+from tetris_dp import pieces
+from tetris_dp import tetris_game
+from tetris_dp import tetris_players
+
+# Pieces placed by single_stage before random moves end the game quickly
+GREEDY_PIECES = 40
+
+
+class _AppRules:
+    """TetrisApp's own drop, spawn and scoring, rescanning the board after every clear."""
+    def __init__(self, seed, piece_mode):
+        self.pieces = pieces.PieceGenerator(seed, piece_mode)
+        self.board = engine.new_board()
+        self.score = 0
+        self.gameover = False
+        self.piece = None
+        self.new_piece()
+
+    def new_piece(self):
+        """Spawn the next piece at the top, the game is over if it doesn't fit."""
+        self.piece = constants.TETRIS_SHAPES[self.pieces.next_index()]
+        piece_x = int(constants.CONFIG['cols'] / 2 - len(self.piece[0])/2)
+        if helpers.check_collision(self.board, self.piece, (piece_x, 0)):
+            self.gameover = True
+
+    def drop(self, move):
+        """Add the piece of a move, spawn the next one and remove full rows one at a time."""
+        piece_x, piece_y, piece = move
+        self.board = helpers.add_piece_to_board(self.board, piece, (piece_x, piece_y))
+        self.new_piece()
+        while True:
+            for i, row in enumerate(self.board[:-1]):
+                if 0 not in row:
+                    self.board = helpers.remove_row(self.board, i)
+                    self.score += 1
+                    break
+            else:
+                break
+
+
+@pytest.mark.parametrize('piece_mode', pieces.PIECE_MODES)
+@pytest.mark.parametrize('seed', range(10))
+def test_steps_follow_the_app_rules(seed, piece_mode):
+    """Boards, pieces, scores and game over match placement for placement."""
+    game = engine.TetrisEngine(seed, piece_mode)
+    app_rules = _AppRules(seed, piece_mode)
+    rng = random.Random(seed)
+    while not game.gameover:
+        assert game.board == app_rules.board
+        assert game.piece == app_rules.piece
+        if game.pieces_placed < GREEDY_PIECES:
+            move = tetris_players.single_stage_player(game.board, game.piece)
+        else:
+            move = rng.choice(game.legal_moves())
+        score = game.score
+        assert game.step(move) == game.score - score
+        app_rules.drop(move)
+        assert (game.score, game.gameover) == (app_rules.score, app_rules.gameover)
+    assert game.board == app_rules.board
+
+
+def _middle_move(board, piece):
+    """Player which always drops the piece in the middle, it tops out quickly."""
+    moves = engine.TetrisEngine(0)
+    moves.board = board
+    moves.shape_index = constants.TETRIS_SHAPES.index(piece)
+    return min(moves.legal_moves(),
+               key=lambda move: abs(2 * move[0] + len(move[2][0]) - len(board[0])))
+
+
+def test_fast_mode_app_plays_like_the_engine(monkeypatch):
+    """TetrisApp's game loop gives the final board and score of TetrisEngine.play."""
+    monkeypatch.setattr(tetris_game, 'FAST_MODE', 1)
+    app = tetris_game.TetrisApp(_middle_move, 11)
+    game = engine.TetrisEngine(11)
+    assert app.run() == game.play(_middle_move)
+    assert app.board == game.board
+    assert app.engine.pieces_placed == game.pieces_placed
+
+
+def test_reset_keeps_the_piece_mode():
+    """A reset without a piece mode keeps drawing pieces the way the last game did."""
+    game = engine.TetrisEngine(1, pieces.BAG)
+    game.reset(2)
+    assert game.pieces.mode == pieces.BAG
+    bag_game = engine.TetrisEngine(2, pieces.BAG)
+    assert [game.pieces.next_index() for _ in range(14)] == [
+        bag_game.pieces.next_index() for _ in range(14)]
+    game.reset(2, pieces.UNIFORM)
+    assert game.pieces.mode == pieces.UNIFORM
@@ -0,0 +1,98 @@
+"""The reset and step environment against TetrisEngine."""
+import random
+
+import numpy
+import pytest
+
+from tetris_dp import engine
+from tetris_dp import environment
+from tetris_dp import tetris_players
+
+# Pieces placed by single_stage before random moves end the game quickly
+GREEDY_PIECES = 40
+
+
+def _choose(game, rng):
+    """Get a single_stage move early in the game and a random one after."""
+    if game.pieces_placed < GREEDY_PIECES:
+        return tetris_players.single_stage_player(game.board, game.piece)
+    return rng.choice(game.legal_moves())
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_placement_episodes_match_the_engine(seed):
+    """Boards, rewards, done flags and the final score match TetrisEngine."""
+    env = environment.TetrisEnv(seed=seed)
+    game = engine.TetrisEngine(seed)
+    rng = random.Random(seed)
+    observation = env.reset(seed)
+    done = False
+    while not done:
+        assert numpy.array_equal(observation['board'], game.board[:-1])
+        assert observation['piece'].argmax() == game.shape_index
+        move = _choose(game, rng)
+        action = game.legal_moves().index(move)
+        assert observation['action_mask'][action]
+        observation, reward, done, info = env.step(action)
+        assert reward == game.step(move)
+        assert done == game.gameover
+    assert info == {'score': game.score, 'pieces': game.pieces_placed}
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_keystroke_episodes_match_the_engine(seed):
+    """Random keys move, rotate and drop the piece like TetrisEngine does."""
+    env = environment.TetrisEnv(environment.KEYSTROKE, seed)
+    game = engine.TetrisEngine(seed)
+    rng = random.Random(seed)
+    done = False
+    while not done:
+        action = rng.choice((environment.LEFT, environment.RIGHT, environment.ROTATE,
+                             environment.SOFT_DROP, environment.SOFT_DROP,
+                             environment.HARD_DROP))
+        rows_before = game.score
+        if action in (environment.LEFT, environment.RIGHT):
+            game.move(-1 if action == environment.LEFT else 1)
+        elif action == environment.ROTATE:
+            game.rotate()
+        elif action == environment.SOFT_DROP:
+            game.soft_drop()
+        else:
+            while not game.soft_drop():
+                pass
+        observation, reward, done, _ = env.step(action)
+        assert reward == game.score - rows_before
+        assert done == game.gameover
+        if not done:
+            assert numpy.array_equal(observation['board'], game.board[:-1])
+            assert observation['position'][:2].tolist() == [game.piece_x, game.piece_y]
+
+
+def test_observation_buffers_are_not_aliased():
+    """The buffers are filled in place each step, none overlaps another or goes stale."""
+    env = environment.TetrisEnv(seed=3)
+    observation = env.reset(3)
+    names = sorted(observation)
+    for index, name in enumerate(names):
+        for other in names[index + 1:]:
+            assert not numpy.shares_memory(observation[name], observation[other])
+    game = engine.TetrisEngine(3)
+    for _ in range(30):
+        kept = {name: buffer.copy() for name, buffer in observation.items()}
+        move = tetris_players.single_stage_player(game.board, game.piece)
+        next_observation, _, _, _ = env.step(game.legal_moves().index(move))
+        game.step(move)
+        assert next_observation is observation
+        # A copy keeps the step it was taken at
+        assert not numpy.array_equal(kept['board'], observation['board'])
+        assert numpy.array_equal(observation['board'], game.board[:-1])
+        assert observation['piece'].argmax() == game.shape_index
+        fresh = environment.TetrisEnv(seed=3)
+        assert numpy.array_equal(observation['features'], _features_of(fresh, game))
+
+
+def _features_of(env, game):
+    """Get the afterstate features of a fresh environment put in the position of a game."""
+    env.game.boards[0] = game.board
+    env.game.shape_indexes[0] = game.shape_index
+    return env.game.afterstate_features()[0]
@@ -0,0 +1,55 @@
+"""Expectimax values against single stage costs of every next shape."""
+import numpy
+import pytest
+
+from tetris_dp import batch_evaluator
+from tetris_dp import constants
+from tetris_dp import expectimax
+from tetris_dp import tetris_players
+
+WEIGHTS = list(tetris_players.DELLACHERIE_WEIGHTS)
+
+
+def _single_stage_cost(board, piece):
+    """Get the cost of the move single_stage_player makes."""
+    moves, costs, _ = batch_evaluator.evaluate_afterstates(board, piece, WEIGHTS)
+    return float(costs[moves.index(tetris_players.single_stage_player(board, piece))])
+
+
+def test_depth_0_is_single_stage(boards):
+    """Without looking ahead the value is the single stage cost and so is the move."""
+    for board in boards[::2]:
+        for piece in constants.TETRIS_SHAPES:
+            assert expectimax._best_cost(  # pylint: disable=protected-access
+                board, piece, 0, WEIGHTS) == _single_stage_cost(board, piece)
+            assert expectimax.expectimax_player(board, piece, 0) == \
+                tetris_players.single_stage_player(board, piece)
+
+
+def test_depth_1_averages_single_stage_values(boards):
+    """One piece ahead a move costs its own cost plus the mean single stage cost of every shape."""
+    for board in boards[::8]:
+        for piece in constants.TETRIS_SHAPES:
+            moves, costs, afterstates = batch_evaluator.evaluate_afterstates(board, piece, WEIGHTS)
+            values = costs + numpy.array([
+                numpy.mean([_single_stage_cost(afterstate, shape)
+                            for shape in constants.TETRIS_SHAPES])
+                for afterstate in afterstates])
+            assert expectimax._best_cost(  # pylint: disable=protected-access
+                board, piece, 1, WEIGHTS) == pytest.approx(float(values.min()))
+            assert expectimax.expectimax_player(board, piece, 1) == \
+                moves[batch_evaluator.last_argmin(values)]
+
+
+def test_pool_values_match_in_process(boards):
+    """Chance nodes sent to the worker pool average to the values found in this process."""
+    _, _, afterstates = batch_evaluator.evaluate_afterstates(
+        boards[-1], constants.TETRIS_SHAPES[0], WEIGHTS)
+    try:
+        pooled = expectimax._expected_costs(  # pylint: disable=protected-access
+            afterstates, 0, WEIGHTS, 2)
+    finally:
+        expectimax.close_pool()
+    in_process = expectimax._expected_costs(  # pylint: disable=protected-access
+        afterstates, 0, WEIGHTS, 1)
+    assert pooled == pytest.approx(in_process)
@@ -0,0 +1,48 @@
+"""Phase timings and counters recorded from many threads."""
+import threading
+import time
+
+import pytest
+
+from tetris_dp import engine
+from tetris_dp import instrumentation
+from tetris_dp import tetris_players
+
+
+@pytest.fixture(name='instrumented')
+def fixture_instrumented():
+    """Record a game, then turn instrumentation off again."""
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_counters_from_threads_are_not_lost(instrumented):
+    """Counting from many threads at once adds up exactly."""
+    del instrumented
+
+    def count_many():
+        for _ in range(20000):
+            instrumentation.count('calls')
+    threads = [threading.Thread(target=count_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    instrumentation.end_move()
+    assert instrumentation.game_summary()['counters']['calls'] == 8 * 20000
+
+
+def test_phases_add_up_to_the_wall_time(instrumented):
+    """The pool phase leaves out the phases of the lookahead threads inside it."""
+    del instrumented
+    game = engine.TetrisEngine(2)
+    start_time = time.perf_counter()
+    for _ in range(20):
+        game.step(tetris_players.lookahead_player(game.board, game.piece))
+        instrumentation.end_move()
+    wall_time = time.perf_counter() - start_time
+    phases = instrumentation.game_summary()['phases']
+    assert 'pool' in phases
+    assert sum(phase['total_seconds'] for phase in phases.values()) <= wall_time
@@ -0,0 +1,92 @@
+"""Move server protocol and robustness."""
+import socket
+import struct
+import threading
+
+import pytest
+
+from tetris_dp import batch_runner
+from tetris_dp import constants
+from tetris_dp import engine
+from tetris_dp import move_server
+from tetris_dp import tetris_players
+
+
+@pytest.fixture(name='server_address')
+def fixture_server_address(tmp_path):
+    """Serve moves on a socket in tmp_path from a thread and get its address."""
+    address = str(tmp_path / 'moves.sock')
+    server = move_server.MoveServer(address, processes=1)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield address
+    server.shutdown()
+    thread.join()
+    server.close()
+
+
+def _ask(address, payload):
+    """Send one raw frame and get the raw answer payload, None if the server hung up."""
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(address)
+    connection.settimeout(10)
+    data = b''
+    try:
+        connection.sendall(struct.pack('<I', len(payload)) + payload)
+        while len(data) < 4 or len(data) < 4 + struct.unpack_from('<I', data)[0]:
+            chunk = connection.recv(1 << 16)
+            if not chunk:
+                return None
+            data += chunk
+    except (ConnectionResetError, BrokenPipeError):
+        return None
+    finally:
+        connection.close()
+    return data[4:]
+
+
+def test_player_indexes_are_stable():
+    """Player indexes only ever grow, so old clients keep asking the same players."""
+    assert move_server.PLAYER_NAMES[:5] == (
+        'beam', 'expectimax', 'lookahead', 'single_stage', 'anytime')
+    assert set(move_server.PLAYER_NAMES) == set(batch_runner.PLAYERS)
+
+
+def test_answers_match_the_player(server_address):
+    """The server answers with the move the player makes in process."""
+    game = engine.TetrisEngine(1)
+    game.play(tetris_players.single_stage_player, 20)
+    client = move_server.MoveClient(server_address)
+    try:
+        for player_name in ('single_stage', 'beam'):
+            expected = batch_runner.get_player(player_name)(game.board, game.piece)
+            assert client.best_move(game.board, game.piece, player_name) == expected
+    finally:
+        client.close()
+
+
+@pytest.mark.parametrize('query', [
+    b'',
+    bytes([len(move_server.PLAYER_NAMES), 0, 0, 20, 0, 10, 0]),
+    bytes([0, 0, len(constants.TETRIS_SHAPES), 1, 0, 1, 0, 0]),
+    b'\x03\x00',
+])
+def test_bad_queries_are_answered(server_address, query):
+    """Queries which can't be searched get BAD_QUERY instead of stopping the server."""
+    answer = _ask(server_address, struct.pack('<I', 7) + query)
+    assert answer[:4] == struct.pack('<I', 7)
+    assert answer[4] == move_server.BAD_QUERY
+    # The server keeps answering
+    board = engine.new_board()
+    client = move_server.MoveClient(server_address)
+    try:
+        assert client.best_move(board, constants.TETRIS_SHAPES[0]) == \
+            tetris_players.single_stage_player(board, constants.TETRIS_SHAPES[0])
+    finally:
+        client.close()
+
+
+def test_bad_frames_close_the_connection(server_address):
+    """Frames too short or too long to be a query drop the connection."""
+    assert _ask(server_address, b'\x01') is None
+    assert _ask(server_address, bytes(move_server.MAX_FRAME_BYTES + 1)) is None
@@ -0,0 +1,56 @@
+"""Cross-entropy tuning of the weights and resuming it."""
+import json
+
+import numpy
+
+from tetris_dp import optimizer
+from tetris_dp import pieces
+
+SETTINGS = ('single_stage', 10, pieces.UNIFORM)
+TARGET = numpy.array([-4.0, 1.0, -3.0, -3.0, -8.0, -3.0])
+
+
+def _distance_scores(pool, processes, population, seeds, settings):
+    """Score candidates higher the closer they are to TARGET, instead of playing games."""
+    del pool, processes, seeds, settings
+    return -numpy.linalg.norm(population - TARGET, axis=1)
+
+
+def test_mean_moves_towards_better_candidates(monkeypatch):
+    """Refitting to the elite pulls the mean towards the candidates scoring best."""
+    monkeypatch.setattr(optimizer, 'evaluate_population', _distance_scores)
+    state = optimizer.new_state([0.0] * len(TARGET))
+    distances = [numpy.linalg.norm(state['mean'] - TARGET)]
+    for _ in range(5):
+        optimizer.run_generation(None, 1, state, range(1), SETTINGS)
+        distances.append(numpy.linalg.norm(state['mean'] - TARGET))
+        last = state['history'][-1]
+        assert last['best'] >= last['elite_mean'] >= last['mean']
+    assert distances[-1] < distances[0] / 2
+
+
+def test_seed_picks_the_populations(monkeypatch):
+    """Runs with the same seed sample the same candidates, other seeds other ones."""
+    monkeypatch.setattr(optimizer, 'evaluate_population', _distance_scores)
+    means = []
+    for seed in (0, 0, 1):
+        state = optimizer.new_state([0.0] * len(TARGET), seed)
+        optimizer.run_generation(None, 1, state, range(1), SETTINGS)
+        means.append(state['mean'])
+    assert means[0] == means[1]
+    assert means[0] != means[2]
+
+
+def test_resume_carries_on_like_one_run(tmp_path, monkeypatch):
+    """A run stopped after a generation and resumed ends where an unbroken run does."""
+    monkeypatch.setattr(optimizer, 'POPULATION_SIZE', 4)
+    monkeypatch.setattr(optimizer, 'GAMES_PER_CANDIDATE', 1)
+    unbroken_path = str(tmp_path / 'unbroken.json')
+    resumed_path = str(tmp_path / 'resumed.json')
+    unbroken = optimizer.optimize(unbroken_path, 2, SETTINGS, processes=1, seed=3)
+    optimizer.optimize(resumed_path, 1, SETTINGS, processes=1, seed=3)
+    with open(resumed_path, encoding='utf-8') as checkpoint_file:
+        assert json.load(checkpoint_file)['generation'] == 1
+    resumed = optimizer.optimize(resumed_path, 2, SETTINGS, processes=1, seed=3)
+    assert resumed == unbroken
+    assert optimizer.read_checkpoint(resumed_path) == unbroken
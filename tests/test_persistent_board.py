@@ -0,0 +1,41 @@
+"""Persistent boards against the list of lists helpers."""
+from tetris_dp import constants
+from tetris_dp import helpers
+from tetris_dp import persistent_board
+from tetris_dp import placements
+
+
+def _moves(board):
+    """Yield every (piece, x, y) straight drop on a board."""
+    tops = helpers.column_tops(board)
+    for shape_index in range(len(constants.TETRIS_SHAPES)):
+        for placement, off_x, off_y in placements.landing_placements(helpers, board, tops,
+                                                                     shape_index):
+            yield placement.piece, off_x, off_y
+
+
+def test_get_interm_board(boards):
+    """Afterstates and rows removed agree and the board searched from is left as it was."""
+    for board in boards:
+        rows = persistent_board.from_board(board)
+        for piece, off_x, off_y in _moves(board):
+            interm_board, removed_rows = helpers.get_interm_board(board, piece, (off_x, off_y))
+            interm_rows, persistent_removed_rows = persistent_board.get_interm_board(
+                rows, piece, (off_x, off_y))
+            assert persistent_removed_rows == removed_rows
+            assert persistent_board.to_board(interm_rows) == interm_board
+            assert persistent_board.to_board(rows) == board
+
+
+def test_add_piece_to_board(boards):
+    """Pieces are added like helpers.add_piece_to_board, sharing the rows not under them."""
+    for board in boards:
+        rows = persistent_board.from_board(board)
+        for piece, off_x, off_y in _moves(board):
+            added = persistent_board.add_piece_to_board(rows, piece, (off_x, off_y))
+            expected = helpers.add_piece_to_board([row[:] for row in board], piece,
+                                                  (off_x, off_y))
+            assert persistent_board.to_board(added) == expected
+            changed = {y_position for y_position, row in enumerate(added)
+                       if row is not rows[y_position]}
+            assert changed == set(range(off_y - 1, off_y - 1 + len(piece)))
@@ -0,0 +1,49 @@
+"""Placement tables against rotating and dropping pieces one row at a time."""
+import pytest
+
+from tetris_dp import bitboard
+from tetris_dp import constants
+from tetris_dp import helpers
+from tetris_dp import placements
+
+
+def _stepped_moves(engine, board, shape_index, cols):
+    """Get every move the way the players did before the tables, rotating and stepping down."""
+    moves = []
+    piece = constants.TETRIS_SHAPES[shape_index]
+    for rotation in range(0, constants.SHAPE_TO_ROTATION[shape_index]):
+        if rotation:
+            piece = helpers.rotate_clockwise(piece)
+        for new_x in range(0, cols - len(piece[0]) + 1):
+            new_y = 0
+            while not engine.check_collision(board, piece, (new_x, new_y)):
+                new_y += 1
+            moves.append((new_x, new_y, piece))
+    return moves
+
+
+@pytest.mark.parametrize('cols', list(range(4, 17)) + [64, 100])
+def test_tables_match_rotating_the_shapes(cols):
+    """Every shape has the rotations and x ranges the players used to step through."""
+    all_placements = placements.get_placements(cols)
+    assert len(all_placements) == len(constants.TETRIS_SHAPES)
+    for shape_index, shape_placements in enumerate(all_placements):
+        expected = [(x, piece) for x, _, piece in _stepped_moves(
+            helpers, [[1] * cols], shape_index, cols)]
+        assert [(x, placement.piece) for placement in shape_placements
+                for x in placement.x_range] == expected
+    assert placements.get_placements(cols) is all_placements
+
+
+def test_landing_matches_stepping_down(boards):
+    """Moves dropped from the column tops land where stepping the piece down stops."""
+    for board in boards:
+        cols = len(board[0])
+        tops = helpers.column_tops(board)
+        rows = bitboard.from_board(board)
+        for shape_index in range(len(constants.TETRIS_SHAPES)):
+            expected = _stepped_moves(helpers, board, shape_index, cols)
+            for engine, engine_board in ((helpers, board), (bitboard, rows)):
+                assert [(x, y, placement.piece) for placement, x, y in
+                        placements.landing_placements(engine, engine_board, tops, shape_index)
+                        ] == expected
@@ -0,0 +1,46 @@
+"""Record and replay round trips."""
+import pytest
+
+from tetris_dp import engine
+from tetris_dp import recording
+from tetris_dp import tetris_players
+
+
+def _play(rows, cols, pieces_placed=30):
+    """Play a seeded single_stage game on a board of the given size."""
+    game = engine.TetrisEngine(0, rows=rows, cols=cols)
+    game.play(tetris_players.single_stage_player, pieces_placed)
+    return game
+
+
+@pytest.mark.parametrize('rows, cols', [(20, 10), (30, 64), (40, 100)])
+def test_replay_rebuilds_every_board(tmp_path, rows, cols):
+    """A written recording replays to the final board, score and pieces of its game."""
+    game = _play(rows, cols)
+    path = str(tmp_path / 'games.bin')
+    recording.write_recordings(path, [recording.Recording.from_engine(game)])
+    recordings = recording.read_recordings(path)
+    assert len(recordings) == 1
+    recorded = recordings[0]
+    assert recorded.board_size == (rows, cols)
+    assert len(recorded.move_codes()) == game.pieces_placed
+    replayed = None
+    for replayed in recording.replay(recorded):
+        pass
+    assert replayed.board == game.board
+    assert replayed.score == game.score
+    assert replayed.pieces_placed == game.pieces_placed
+
+
+def test_wide_boards_use_two_byte_codes():
+    """Boards wider than a one byte code can hold get two bytes per move."""
+    game = _play(40, 100, 5)
+    assert len(game.move_codes) == 2 * game.pieces_placed
+
+
+def test_other_files_are_refused(tmp_path):
+    """Files which don't start with a recording header raise instead of replaying garbage."""
+    path = tmp_path / 'games.bin'
+    path.write_bytes(b'TDPD' + bytes(40))
+    with pytest.raises(ValueError):
+        recording.read_recordings(str(path))
@@ -0,0 +1,41 @@
+"""Searching moves on the background thread."""
+import threading
+import time
+
+from tetris_dp import engine
+from tetris_dp import search_worker
+from tetris_dp import tetris_players
+
+
+def test_result_is_the_players_move():
+    """The move polled for is the one the player makes for the position."""
+    game = engine.TetrisEngine(2)
+    worker = search_worker.SearchWorker(tetris_players.single_stage_player)
+    try:
+        move = None
+        while move is None:
+            move = worker.result(game)
+            time.sleep(0.001)
+        assert move == tetris_players.single_stage_player(game.board, game.piece)
+    finally:
+        worker.close()
+
+
+def test_close_does_not_wait_for_searches():
+    """Closing while slow searches are running or queued returns at once."""
+    release = threading.Event()
+
+    def slow_player(board, piece):
+        release.wait(10)
+        return tetris_players.single_stage_player(board, piece)
+
+    game = engine.TetrisEngine(2)
+    worker = search_worker.SearchWorker(slow_player)
+    worker.request(game)
+    next_game = game.clone()
+    next_game.step(tetris_players.single_stage_player(game.board, game.piece))
+    worker.request(next_game)
+    start_time = time.time()
+    worker.close()
+    assert time.time() - start_time < 1
+    release.set()
@@ -0,0 +1,38 @@
+"""The bounded transposition table and its least recently used eviction."""
+from tetris_dp import transposition
+
+
+def test_size_is_bounded():
+    """The table never holds more than max_entries, the newest entries are kept."""
+    table = transposition.TranspositionTable(3)
+    for key in range(10):
+        table.put(key, str(key))
+        assert len(table) == min(key + 1, 3)
+    assert [table.get(key) for key in range(10)] == [None] * 7 + ['7', '8', '9']
+
+
+def test_least_recently_used_is_evicted():
+    """Reading or rewriting an entry keeps it, the entry untouched the longest goes first."""
+    table = transposition.TranspositionTable(3)
+    for key in 'abc':
+        table.put(key, key.upper())
+    assert table.get('a') == 'A'
+    table.put('d', 'D')
+    assert table.get('b') is None
+    table.put('c', 'C2')
+    table.put('e', 'E')
+    assert table.get('a') is None
+    assert [table.get(key) for key in 'cde'] == ['C2', 'D', 'E']
+    assert len(table) == 3
+
+
+def test_hits_and_misses_are_counted():
+    """Lookups count towards the hit rate until the table is cleared."""
+    table = transposition.TranspositionTable(2)
+    assert table.hit_rate() == 0.0
+    table.put(1, 'one')
+    table.get(1)
+    table.get(2)
+    assert (table.hits, table.misses, table.hit_rate()) == (1, 1, 0.5)
+    table.clear()
+    assert (len(table), table.hits, table.misses) == (0, 0, 0)
@@ -0,0 +1,77 @@
+"""Games stepped together against TetrisEngine games."""
+import random
+
+import numpy
+import pytest
+
+from tetris_dp import engine
+from tetris_dp import pieces
+from tetris_dp import tetris_players
+from tetris_dp import vector_engine
+
+GAMES = 4
+STEPS = 250
+# Pieces placed by single_stage before random moves end the game quickly
+GREEDY_PIECES = 40
+
+
+def _choose(game, rng):
+    """Get a single_stage move early in the game and a random one after."""
+    if game.pieces_placed < GREEDY_PIECES:
+        return tetris_players.single_stage_player(game.board, game.piece)
+    return rng.choice(game.legal_moves())
+
+
+@pytest.mark.parametrize('board_size', [(20, 10), (12, 7), (16, 13)])
+@pytest.mark.parametrize('piece_mode', [pieces.UNIFORM, pieces.BAG])
+def test_games_match_the_engine(board_size, piece_mode):
+    """Every slot plays like TetrisEngine, including the games started after one ends."""
+    rows, cols = board_size
+    games = vector_engine.VectorEngine(GAMES, 100, piece_mode, board_size)
+    engines = [engine.TetrisEngine(100 + game, piece_mode, rows, cols) for game in range(GAMES)]
+    rng = random.Random(cols)
+    next_seed = 100 + GAMES
+    finished = []
+    for _ in range(STEPS):
+        moves = [_choose(game, rng) for game in engines]
+        actions = []
+        for slot, (game, move) in enumerate(zip(engines, moves)):
+            assert numpy.array_equal(games.boards[slot], game.board)
+            assert games.shape_indexes[slot] == game.shape_index
+            legal_moves = game.legal_moves()
+            mask = games.action_mask()[slot]
+            assert mask[:len(legal_moves)].all() and not mask[len(legal_moves):].any()
+            actions.append(legal_moves.index(move))
+        assert games.moves(numpy.array(actions)) == moves
+        removed_rows, ended = games.step(actions)
+        for slot, (game, move) in enumerate(zip(engines, moves)):
+            assert removed_rows[slot] == game.step(move)
+            assert ended[slot] == game.gameover
+            if game.gameover:
+                finished.append((game.seed, game.score, game.pieces_placed))
+                engines[slot] = engine.TetrisEngine(next_seed, piece_mode, rows, cols)
+                next_seed += 1
+    assert finished
+    assert games.finished == finished
+
+
+def test_masked_actions_are_refused():
+    """Actions past the placements of the current piece raise instead of placing anything."""
+    games = vector_engine.VectorEngine(2, 0)
+    # The O piece has a single rotation so most of its actions are masked
+    games.shape_indexes[0] = min(range(len(games.table.mask)),
+                                 key=lambda shape_index: games.table.mask[shape_index].sum())
+    masked = numpy.flatnonzero(~games.action_mask()[0])
+    boards = games.boards.copy()
+    with pytest.raises(ValueError):
+        games.step([masked[0], 0])
+    assert numpy.array_equal(games.boards, boards)
+
+
+def test_max_pieces_ends_games():
+    """Games placing max_pieces end like games which topped out."""
+    games = vector_engine.VectorEngine(3, 0, max_pieces=5)
+    for _ in range(5):
+        _, ended = games.step(games.greedy_actions(tetris_players.DELLACHERIE_WEIGHTS))
+    assert ended.all()
+    assert [pieces_placed for _, _, pieces_placed in games.finished] == [5, 5, 5]
@@ -1,2 +1,13 @@
-"""Exports everything needed to play the tetris game."""
-from tetris_dp.tetris_game import TetrisApp
+"""Exports everything needed to play the tetris game.
+
+TetrisApp is only imported when it is first used since it loads pygame, headless runs only
+need TetrisEngine.
+"""
+from tetris_dp.engine import TetrisEngine
+
+
+def __getattr__(name):
+    if name == 'TetrisApp':
+        from tetris_dp.tetris_game import TetrisApp  # pylint: disable=import-outside-toplevel
+        return TetrisApp
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
@@ -0,0 +1,4 @@
+"""Run the command line entry point with python -m tetris_dp, see cli."""
+from tetris_dp import cli
+
+cli.main()
@@ -0,0 +1,144 @@
+"""Anytime player which searches deeper until a per move deadline.
+
+The search is iterative deepening expectimax. Depth 0 is the greedy Dellacherie move of
+single_stage_player, so a move is ready after one batch evaluation, and every later
+iteration looks one more piece ahead, averaging the best cost over all seven shapes at every
+chance node like expectimax_player. Depth 1 scores every move, deeper iterations only the
+ANYTIME_WIDTH best moves of the iteration before, and below the root only the ANYTIME_WIDTH
+cheapest placements of every piece are expanded, so every iteration costs about 30 times the
+one before. When the deadline passes the move of the last finished iteration is returned and
+faster machines get deeper searches.
+
+The deadline is checked before every node is expanded and the search stops
+ANYTIME_MARGIN_SECONDS before it, so a move takes the budget plus at most one node expansion
+past the margin, under a millisecond on the default board. Node values are kept in a
+transposition table keyed by the board, the piece and the depth left, so iterations reuse the
+nodes of shallower ones and moves reuse the nodes searched below the board they left. The
+table is cleared when the weights change.
+"""
+import time
+
+import numpy
+
+from tetris_dp import batch_evaluator
+from tetris_dp import constants
+from tetris_dp import instrumentation
+from tetris_dp import tetris_players
+from tetris_dp import transposition
+
+# Seconds per move, None uses ANYTIME_DELAY_FRACTION of the gravity delay in CONFIG
+ANYTIME_SECONDS = None
+ANYTIME_DELAY_FRACTION = 0.5
+# The search stops this long before the deadline, it covers the last node expansion
+ANYTIME_MARGIN_SECONDS = 0.002
+# Deepest iteration, the search stops here even if there is time left
+ANYTIME_MAX_DEPTH = 3
+# Moves kept after each iteration and placements expanded below the root
+ANYTIME_WIDTH = 4
+# Max node values kept before the least recently used are evicted
+ANYTIME_TABLE_SIZE = 200000
+# (packed board, shape index, depth) -> best cost
+NODE_TABLE = transposition.TranspositionTable(ANYTIME_TABLE_SIZE)
+# Weights the values in NODE_TABLE were worked out with
+_TABLE_WEIGHTS = []
+# Depth, seconds and nodes evaluated of the last move searched
+LAST_SEARCH = {}
+
+
+class DeadlineExpired(Exception):
+    """Raised inside an iteration when the time for the move is up."""
+
+
+def node_key(board, shape_index, depth):
+    """Get the table key of a shape on a board array searched depth pieces ahead."""
+    return (numpy.packbits(board).tobytes() + board.shape[1].to_bytes(2, 'little')
+            + bytes((shape_index, depth)))
+
+
+def _use_weights(weights):
+    """Clear NODE_TABLE if its values were worked out with other weights."""
+    if weights != _TABLE_WEIGHTS:
+        NODE_TABLE.clear()
+        _TABLE_WEIGHTS[:] = weights
+
+
+class _Search:
+    """State of the search of one move."""
+    def __init__(self, deadline, weights):
+        self.deadline = deadline
+        self.weights = weights
+        self.nodes = 0
+
+    def best_cost(self, board, shape_index, depth):
+        """Get the lowest cost of placing a shape on a board array, looking depth pieces ahead."""
+        key = node_key(board, shape_index, depth)
+        cost = NODE_TABLE.get(key)
+        if cost is not None:
+            return cost
+        if time.perf_counter() > self.deadline:
+            raise DeadlineExpired()
+        self.nodes += 1
+        _, costs, afterstates = batch_evaluator.evaluate_afterstates(
+            board, constants.TETRIS_SHAPES[shape_index], self.weights)
+        if depth:
+            cheapest = costs.argsort(kind='stable')[:ANYTIME_WIDTH].tolist()
+            cost = min(float(costs[index]) + self.expected_cost(afterstates[index], depth - 1)
+                       for index in cheapest)
+        else:
+            cost = float(costs.min())
+        NODE_TABLE.put(key, cost)
+        return cost
+
+    def expected_cost(self, board, depth):
+        """Average the best cost over every shape which could come next."""
+        return sum(self.best_cost(board, shape_index, depth)
+                   for shape_index in range(len(constants.TETRIS_SHAPES))
+                   ) / len(constants.TETRIS_SHAPES)
+
+
+def search(board, piece, seconds=None, max_depth=None):
+    """Search a move until the deadline and get the move and the depth of the last iteration.
+
+    Ties go to the last move like in single_stage_player.
+    """
+    start_time = time.perf_counter()
+    if seconds is None:
+        seconds = ANYTIME_SECONDS
+    if seconds is None:
+        seconds = constants.CONFIG['delay'] / 1000 * ANYTIME_DELAY_FRACTION
+    max_depth = ANYTIME_MAX_DEPTH if max_depth is None else max_depth
+    current = _Search(start_time + seconds - ANYTIME_MARGIN_SECONDS,
+                      list(tetris_players.DELLACHERIE_WEIGHTS))
+    _use_weights(current.weights)
+    moves, values, depth = _deepen(current, board, piece, max_depth)
+    best_index = max(values, key=lambda index: (-values[index], index))
+    LAST_SEARCH.update({'depth': depth, 'seconds': time.perf_counter() - start_time,
+                        'nodes': current.nodes})
+    instrumentation.count('search_depth', depth)
+    instrumentation.count('search_nodes', current.nodes)
+    return moves[best_index], depth
+
+
+def _deepen(current, board, piece, max_depth):
+    """Run iterations until the deadline or max_depth and get the moves, values and depth."""
+    moves, costs, afterstates = batch_evaluator.evaluate_afterstates(board, piece,
+                                                                     current.weights)
+    values = dict(enumerate(costs.tolist()))
+    candidates = list(values)
+    depth = 0
+    while depth < max_depth:
+        try:
+            values = {index: float(costs[index])
+                      + current.expected_cost(afterstates[index], depth)
+                      for index in candidates}
+        except DeadlineExpired:
+            break
+        depth += 1
+        # The next iteration only looks at the best moves of this one
+        candidates = sorted(values, key=values.get)[:ANYTIME_WIDTH]
+    return moves, values, depth
+
+
+def anytime_player(board, piece):
+    """Player which returns the best move found before the deadline."""
+    return search(board, piece)[0]
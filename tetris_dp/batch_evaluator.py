@@ -0,0 +1,162 @@
+"""Batched Dellacherie evaluation of every candidate placement of a piece.
+
+All the afterstates of a piece are stacked into one (N, rows + 1, cols) array so building the
+boards, clearing rows, extracting the features and scoring them are a handful of numpy
+operations instead of a Python loop per candidate.
+"""
+import numpy
+
+from tetris_dp import constants
+from tetris_dp import helpers
+from tetris_dp import instrumentation
+from tetris_dp import placements
+
+
+def candidate_moves(board, piece):
+    """Get every (x, y, piece) move for a piece along with its placement entry.
+
+    The board can be a list of lists board or a numpy array of the same shape.
+    """
+    board = numpy.asarray(board, dtype=bool)
+    tops = board.argmax(axis=0).tolist()
+    shape_index = constants.TETRIS_SHAPES.index(piece)
+    return placements.landing_placements(helpers, board, tops, shape_index)
+
+
+def build_afterstates(board, moves):
+    """Stack the boards left by every move and the rows each one removed.
+
+    Like helpers.get_interm_board, piece cells which overlap the board are marked on the top
+    row instead so the move is seen as invalid.
+    """
+    board_array = numpy.asarray(board, dtype=bool)
+    afterstates = numpy.repeat(board_array[numpy.newaxis], len(moves), axis=0)
+    move_indexes = []
+    cell_rows = []
+    cell_columns = []
+    for move_index, (placement, new_x, new_y) in enumerate(moves):
+        for row_index, column_index in placement.cells:
+            move_indexes.append(move_index)
+            cell_rows.append(row_index + new_y - 1)
+            cell_columns.append(column_index + new_x)
+    move_indexes = numpy.array(move_indexes)
+    cell_rows = numpy.array(cell_rows)
+    cell_columns = numpy.array(cell_columns)
+    overlaps = board_array[cell_rows, cell_columns]
+    cell_rows[overlaps] = 0
+    afterstates[move_indexes, cell_rows, cell_columns] = True
+    return afterstates, clear_full_rows(afterstates, afterstates[:, :-1, :].all(axis=2))
+
+
+def clear_full_rows(boards, full_rows):
+    """Remove the full rows of a stack of boards in place and return how many each lost.
+
+    full_rows is an (N, rows) mask of the rows above the floor to remove. Like removing them
+    one by one with helpers.remove_row, the rows above drop down and empty rows fill the top.
+    """
+    removed_rows = full_rows.sum(axis=1)
+    clearing = numpy.nonzero(removed_rows)[0]
+    if len(clearing):
+        # Full rows sort to the top, the rest keep their order, then the top rows are emptied
+        row_order = numpy.argsort(~full_rows[clearing], axis=1, kind='stable')
+        playfield = numpy.take_along_axis(boards[clearing, :-1, :],
+                                          row_order[:, :, numpy.newaxis], axis=1)
+        playfield[numpy.arange(playfield.shape[1])
+                  < removed_rows[clearing, numpy.newaxis]] = 0
+        boards[clearing, :-1, :] = playfield
+    return removed_rows
+
+
+def find_features(afterstates, removed_rows, landing_rows):
+    """Get the Dellacherie features of every afterstate as an (N, 6) array.
+
+    The columns are the same as the costs in tetris_players._calculate_dellacheries_cost and
+    the holes, wells and transitions match helpers.find_holes_and_wells exactly.
+    """
+    empty = ~afterstates
+    walls = numpy.ones(afterstates.shape[:2] + (1,), dtype=bool)
+    left_filled = numpy.concatenate((walls, afterstates[:, :, :-1]), axis=2)
+    right_filled = numpy.concatenate((afterstates[:, :, 1:], walls), axis=2)
+    features = numpy.empty((len(afterstates), 6))
+    features[:, 0] = afterstates.shape[1] - landing_rows
+    features[:, 1] = removed_rows**4
+    features[:, 2] = (afterstates[:, :, 1:] != afterstates[:, :, :-1]).sum(axis=(1, 2))
+    features[:, 3] = (afterstates[:, 1:, :] != afterstates[:, :-1, :]).sum(axis=(1, 2))
+    features[:, 4] = (empty[:, 1:, :] & afterstates[:, :-1, :]).sum(axis=(1, 2))
+    features[:, 5] = (empty & left_filled & right_filled).sum(axis=(1, 2))
+    return features
+
+
+def _evaluate(board, piece, weights):
+    """Get the moves, their costs, the afterstates cropped to the rows in play and the crop.
+
+    The rows more than one above the highest piece cell of any move are empty in every
+    afterstate and add nothing to the features, so on tall boards they are left out and the
+    work grows with the height of the stack rather than the height of the board.
+    """
+    board = numpy.asarray(board, dtype=bool)
+    timer = instrumentation.start()
+    moves = candidate_moves(board, piece)
+    instrumentation.stop('move_generation', timer)
+    timer = instrumentation.start()
+    first_row = max(0, min(new_y for _, _, new_y in moves) - 2)
+    cropped_moves = [(placement, new_x, new_y - first_row) for placement, new_x, new_y in moves]
+    afterstates, removed_rows = build_afterstates(board[first_row:], cropped_moves)
+    instrumentation.stop('board_copy', timer)
+    timer = instrumentation.start()
+    landing_rows = numpy.array([new_y for _, _, new_y in cropped_moves])
+    features = find_features(afterstates, removed_rows, landing_rows)
+    instrumentation.stop('features', timer)
+    timer = instrumentation.start()
+    costs = features.dot(weights)
+    instrumentation.stop('scoring', timer)
+    instrumentation.count('candidates', len(moves))
+    instrumentation.count('afterstates', len(moves))
+    moves = [(new_x, new_y, placement.piece) for placement, new_x, new_y in moves]
+    return moves, costs, afterstates, first_row
+
+
+def evaluate_afterstates(board, piece, weights):
+    """Get every (x, y, piece) move for the piece, their costs and their afterstates."""
+    moves, costs, afterstates, first_row = _evaluate(board, piece, weights)
+    if first_row:
+        empty_rows = numpy.zeros((len(afterstates), first_row, afterstates.shape[2]), dtype=bool)
+        afterstates = numpy.concatenate((empty_rows, afterstates), axis=1)
+    return moves, costs, afterstates
+
+
+def evaluate_moves(board, piece, weights):
+    """Get every (x, y, piece) move for the piece and a numpy array of their costs."""
+    moves, costs, _, _ = _evaluate(board, piece, weights)
+    return moves, costs
+
+
+def last_argmin(costs):
+    """Get the index of the lowest cost, ties go to the last one."""
+    return len(costs) - 1 - int(numpy.argmin(costs[::-1]))
+
+
+def pack_board(board):
+    """Pack a board array into a tuple of bitboard row masks to send between processes."""
+    if board.shape[1] > 62:
+        column_bits = numpy.array([1 << x_position for x_position in range(board.shape[1])],
+                                  dtype=object)
+        return tuple(board.astype(object).dot(column_bits).tolist())
+    return tuple(board.dot(1 << numpy.arange(board.shape[1])).tolist())
+
+
+def unpack_board(rows):
+    """Unpack a tuple of bitboard row masks into a board array."""
+    cols = rows[-1].bit_length()
+    return (numpy.array(rows, dtype=object if cols > 62 else numpy.int64)[:, numpy.newaxis]
+            >> numpy.arange(cols)) & 1 > 0
+
+
+def best_move(board, piece, weights):
+    """Get the lowest cost (x, y, piece) move and its cost.
+
+    Ties go to the last candidate, the same move the players keep when costs are keyed in a dict.
+    """
+    moves, costs = evaluate_moves(board, piece, weights)
+    best_index = last_argmin(costs)
+    return moves[best_index], float(costs[best_index])
@@ -0,0 +1,306 @@
+"""Play many headless games in parallel and stream their results to a file.
+
+Every game gets its own seed so a batch can be repeated or resumed. Results are written as
+they finish, as JSON lines or CSV depending on the output file extension, and games whose
+seeds are already in the output file are skipped. With --instrument every JSON line also
+holds the per phase timings and counters of the game, see instrumentation.GameStats.
+
+Usage: python -m tetris_dp.batch_runner --player single_stage --games 1000 --output out.jsonl
+"""
+import argparse
+import csv
+import importlib
+import json
+import math
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+from tetris_dp import engine
+from tetris_dp import instrumentation
+from tetris_dp import pieces
+from tetris_dp import recording
+
+PLAYERS = {
+    'single_stage': ('tetris_dp.tetris_players', 'single_stage_player'),
+    'lookahead': ('tetris_dp.tetris_players', 'lookahead_player'),
+    'expectimax': ('tetris_dp.expectimax', 'expectimax_player'),
+    'beam': ('tetris_dp.beam_search', 'beam_player'),
+    'anytime': ('tetris_dp.anytime', 'anytime_player'),
+}
+# Player name -> (module, flag) of the number of pieces the player looks ahead
+DEPTH_FLAGS = {
+    'beam': ('tetris_dp.beam_search', 'BEAM_DEPTH'),
+    'expectimax': ('tetris_dp.expectimax', 'EXPECTIMAX_DEPTH'),
+    'anytime': ('tetris_dp.anytime', 'ANYTIME_MAX_DEPTH'),
+}
+RESULT_FIELDS = ['seed', 'score', 'pieces', 'wall_time', 'pieces_per_second']
+# Type of every CSV field, the others are floats like in the JSON lines
+_INT_FIELDS = ('seed', 'score', 'pieces')
+
+
+def get_player(name):
+    """Import and return the player function registered under name."""
+    module_name, function_name = PLAYERS[name]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def configure_player(player_name, depth=None, weights=None):
+    """Set the lookahead depth of a player and the Dellacherie weights of every player."""
+    if depth is not None:
+        module_name, flag = DEPTH_FLAGS[player_name]
+        setattr(importlib.import_module(module_name), flag, depth)
+    if weights is not None:
+        from tetris_dp import tetris_players  # pylint: disable=import-outside-toplevel
+        tetris_players.set_weights(weights)
+
+
+def init_worker(player_settings=None):
+    """Games are already spread over the processes so the players search in process.
+
+    player_settings are the (player name, depth, weights) given to configure_player, they
+    are set up in every worker since module flags don't reach spawned processes.
+    """
+    from tetris_dp import expectimax  # pylint: disable=import-outside-toplevel
+    expectimax.EXPECTIMAX_PROCESSES = 1
+    if player_settings is not None:
+        configure_player(*player_settings)
+
+
+def play_game(task):
+    """Play one headless game and return its result row and recording."""
+    player_name, seed, max_pieces, piece_mode, board_size, instrument, profile_dir = task
+    player = get_player(player_name)
+    game = engine.TetrisEngine(seed, piece_mode, *board_size)
+    if instrument:
+        instrumentation.enable()
+    start_time = time.time()
+    if profile_dir:
+        with instrumentation.profiled(os.path.join(profile_dir, '{}.prof'.format(seed))):
+            game.play(player, max_pieces)
+    else:
+        game.play(player, max_pieces)
+    wall_time = time.time() - start_time
+    result = {'seed': seed, 'score': game.score, 'pieces': game.pieces_placed,
+              'wall_time': wall_time,
+              'pieces_per_second': game.pieces_placed / wall_time if wall_time else 0.0}
+    if instrument:
+        result['instrumentation'] = instrumentation.game_summary()
+        instrumentation.disable()
+    return result, recording.Recording.from_engine(game)
+
+
+def _drop_torn_line(output_path):
+    """Cut an output file back to its last whole line if a run was stopped mid write."""
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, 'rb') as output_file:
+        data = output_file.read()
+    if data and not data.endswith(b'\n'):
+        os.truncate(output_path, data.rfind(b'\n') + 1)
+
+
+def read_results(output_path):
+    """Read the result rows already written to an output file.
+
+    A last line cut short by a run stopped while writing it is left out.
+    """
+    if not os.path.exists(output_path):
+        return []
+    with open(output_path, newline='', encoding='utf-8') as output_file:
+        text = output_file.read()
+    lines = text[:text.rfind('\n') + 1].splitlines()
+    if output_path.endswith('.csv'):
+        return [{key: int(value) if key in _INT_FIELDS else float(value)
+                 for key, value in row.items()} for row in csv.DictReader(lines)]
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+class ResultWriter:
+    """Appends result rows to a JSON lines or CSV file, flushing after each one.
+
+    A last line cut short by a run stopped while writing it is dropped first.
+    """
+    def __init__(self, output_path):
+        _drop_torn_line(output_path)
+        self.is_csv = output_path.endswith('.csv')
+        write_header = self.is_csv and (not os.path.exists(output_path)
+                                        or not os.path.getsize(output_path))
+        self.output_file = open(output_path, 'a', newline='', encoding='utf-8')
+        self.csv_writer = None
+        if self.is_csv:
+            self.csv_writer = csv.DictWriter(self.output_file, fieldnames=RESULT_FIELDS,
+                                             extrasaction='ignore')
+            if write_header:
+                self.csv_writer.writeheader()
+
+    def write(self, result):
+        """Write a single result row."""
+        if self.is_csv:
+            self.csv_writer.writerow(result)
+        else:
+            self.output_file.write(json.dumps(result) + '\n')
+        self.output_file.flush()
+
+    def close(self):
+        """Close the output file."""
+        self.output_file.close()
+
+
+def summarize(scores):
+    """Get the mean, median, percentiles and 95% confidence interval of the scores."""
+    summary = {'games': len(scores), 'mean': statistics.mean(scores),
+               'median': statistics.median(scores)}
+    sorted_scores = sorted(scores)
+    for percentile in (10, 90, 99):
+        index = min(len(sorted_scores) - 1, int(percentile / 100 * len(sorted_scores)))
+        summary['p{}'.format(percentile)] = sorted_scores[index]
+    stdev = statistics.stdev(scores) if len(scores) > 1 else 0.0
+    summary['ci95'] = 1.96 * stdev / math.sqrt(len(scores))
+    return summary
+
+
+def summarize_phases(results):
+    """Get the mean seconds per move of every phase and the counters summed over the games.
+
+    Only results written with instrumentation on are used, the histograms are merged.
+    """
+    moves = 0
+    phases = {}
+    counters = {}
+    for result in results:
+        stats = result.get('instrumentation')
+        if not stats:
+            continue
+        moves += stats['moves']
+        for phase, phase_stats in stats['phases'].items():
+            merged = phases.setdefault(phase, {'total_seconds': 0.0, 'histogram_us': {}})
+            merged['total_seconds'] += phase_stats['total_seconds']
+            histogram = merged['histogram_us']
+            for bucket, bucket_moves in phase_stats['histogram_us'].items():
+                histogram[bucket] = histogram.get(bucket, 0) + bucket_moves
+        for counter, amount in stats['counters'].items():
+            counters[counter] = counters.get(counter, 0) + amount
+    for merged in phases.values():
+        merged['seconds_per_move'] = merged['total_seconds'] / moves if moves else 0.0
+    return {'moves': moves, 'phases': phases, 'counters': counters}
+
+
+def format_phases(phase_summary):
+    """Format a phase summary with one line per phase and counter."""
+    lines = ['{} moves'.format(phase_summary['moves'])]
+    for phase, merged in sorted(phase_summary['phases'].items(),
+                                key=lambda item: -item[1]['total_seconds']):
+        lines.append('  {:20} {:10.1f} us/move'.format(phase, merged['seconds_per_move'] * 1e6))
+    for counter, amount in sorted(phase_summary['counters'].items()):
+        lines.append('  {:20} {:10.1f} /move'.format(
+            counter, amount / phase_summary['moves'] if phase_summary['moves'] else 0.0))
+    return '\n'.join(lines)
+
+
+def format_summary(summary):
+    """Format a summary on a single line."""
+    return ('{games} games, mean {mean:.1f} +/- {ci95:.1f}, median {median}, '
+            'p10 {p10}, p90 {p90}, p99 {p99}'.format(**summary))
+
+
+def _play_games(tasks, processes=None, player_settings=None):
+    """Get an iterator over the results of the tasks and the pool playing them.
+
+    With processes 1 the games are played in this process and the pool is None.
+    """
+    if processes == 1:
+        # Short jobs play in this process instead of paying for starting a pool
+        init_worker(player_settings)
+        return map(play_game, tasks), None
+    pool = multiprocessing.Pool(processes, init_worker, (player_settings,))
+    return pool.imap_unordered(play_game, tasks), pool
+
+
+def run_batch(player_name, seeds, output_path, *,  # pylint: disable=too-many-arguments
+              processes=None, max_pieces=None, progress_every=10,
+              piece_mode=pieces.UNIFORM, recordings_path=None, instrument=False,
+              profile_dir=None, board_size=(None, None), player_settings=None):
+    """Play a game for every seed not already in output_path and return the summary.
+
+    If recordings_path is given the recording of every game is appended to it, they are
+    written in bulk each time the progress is printed. With instrument on every result holds
+    its per phase timings and with profile_dir set every game is run under cProfile and its
+    stats are dumped to <seed>.prof in that directory. board_size is the (rows, cols) of
+    the board, None for either uses the size in CONFIG. With processes 1 the games are
+    played in this process. player_settings are the (depth, weights) of the player, see
+    configure_player.
+    """
+    done_results = read_results(output_path)
+    done_seeds = {int(result['seed']) for result in done_results}
+    scores = [result['score'] for result in done_results]
+    tasks = [(player_name, seed, max_pieces, piece_mode, board_size, instrument, profile_dir)
+             for seed in seeds if seed not in done_seeds]
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+    if done_seeds:
+        print('Skipping {} games already in {}.'.format(len(seeds) - len(tasks), output_path))
+
+    writer = ResultWriter(output_path)
+    pending_recordings = []
+    games, pool = _play_games(tasks, processes,
+                              (player_name,) + tuple(player_settings or (None, None)))
+    try:
+        for result, game_recording in games:
+            writer.write(result)
+            scores.append(result['score'])
+            if recordings_path:
+                pending_recordings.append(game_recording)
+            if len(scores) % progress_every == 0:
+                print(format_summary(summarize(scores)))
+                sys.stdout.flush()
+                if pending_recordings:
+                    recording.write_recordings(recordings_path, pending_recordings)
+                    pending_recordings = []
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        writer.close()
+        if pending_recordings:
+            recording.write_recordings(recordings_path, pending_recordings)
+    summary = summarize(scores) if scores else {}
+    if summary and (not tasks or len(scores) % progress_every):
+        print(format_summary(summary))
+    if instrument and not writer.is_csv:
+        print(format_phases(summarize_phases(read_results(output_path))))
+    return summary
+
+
+def main(argv=None):
+    """Run a batch from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--player', choices=sorted(PLAYERS), default='single_stage')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--output', default='results.jsonl')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--max-pieces', type=int, default=None)
+    parser.add_argument('--progress-every', type=int, default=10)
+    parser.add_argument('--piece-mode', choices=pieces.PIECE_MODES, default=pieces.UNIFORM)
+    parser.add_argument('--rows', type=int, default=None)
+    parser.add_argument('--cols', type=int, default=None)
+    parser.add_argument('--recordings', default=None,
+                        help='Append a binary recording of every game to this file')
+    parser.add_argument('--instrument', action='store_true',
+                        help='Record per phase timings and counters of every game')
+    parser.add_argument('--profile-dir', default=None,
+                        help='Run every game under cProfile and dump the stats here')
+    args = parser.parse_args(argv)
+    seeds = range(args.first_seed, args.first_seed + args.games)
+    run_batch(args.player, seeds, args.output, processes=args.processes,
+              max_pieces=args.max_pieces, progress_every=args.progress_every,
+              piece_mode=args.piece_mode, recordings_path=args.recordings,
+              instrument=args.instrument, profile_dir=args.profile_dir,
+              board_size=(args.rows, args.cols))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Beam search player.
+
+Every ply keeps the BEAM_WIDTH lowest cumulative cost boards and expands them with the next
+piece. Like lookahead_player the pieces are sampled from a generator seeded with the board,
+but only the root board, so every line of a ply sees the same piece and lines aren't ranked
+by how lucky their sampled pieces were. Boards reached through different move orders are
+merged keeping the cheaper line, and branches whose cost is already above the best finished
+line are dropped. Ply costs are only negative when rows are cleared so like the beam itself
+the pruning is a heuristic. Width and depth trade speed for quality, width 1 and depth 1
+plays the same moves as single_stage_player.
+"""
+import random
+
+from tetris_dp import batch_evaluator
+from tetris_dp import bitboard
+from tetris_dp import constants
+from tetris_dp import tetris_players
+from tetris_dp import transposition
+
+# Number of partial lines kept at each ply
+BEAM_WIDTH = 4
+# Number of pieces placed along each line, including the current one
+BEAM_DEPTH = 2
+
+
+def _sample_pieces(board, count):
+    """Sample the pieces after the current one from the board so the search is reproducible."""
+    piece_generator = random.Random(transposition.zobrist_hash(bitboard.from_board(board)))
+    return [piece_generator.choice(constants.TETRIS_SHAPES) for _ in range(count)]
+
+
+def _expand(beam, piece, weights):
+    """Get (cost, root index, packed board, afterstate) of every child of the beam."""
+    children = []
+    for cost, root_index, _, board in beam:
+        _, child_costs, afterstates = batch_evaluator.evaluate_afterstates(board, piece, weights)
+        for child_cost, afterstate in zip((cost + child_costs).tolist(), afterstates):
+            children.append((child_cost, root_index, batch_evaluator.pack_board(afterstate),
+                             afterstate))
+    return children
+
+
+def _select(children, width, bound):
+    """Keep the width cheapest children with distinct boards and a cost below bound.
+
+    Equal costs go to the later first move, the same move single_stage_player picks.
+    """
+    beam = []
+    seen_boards = set()
+    for child in sorted(children, key=lambda child: (child[0], -child[1])):
+        if child[0] >= bound or len(beam) == width:
+            break
+        if child[2] not in seen_boards:
+            seen_boards.add(child[2])
+            beam.append(child)
+    return beam
+
+
+def _greedy_line_cost(node, next_pieces, weights):
+    """Get the cost of following the cheapest move from node for every next piece."""
+    cost, _, _, board = node
+    for piece in next_pieces:
+        _, child_costs, afterstates = batch_evaluator.evaluate_afterstates(board, piece, weights)
+        best_index = batch_evaluator.last_argmin(child_costs)
+        cost += float(child_costs[best_index])
+        board = afterstates[best_index]
+    return cost
+
+
+def beam_player(board, piece, width=None, depth=None):
+    """Player which returns the first move of the lowest cost line found by beam search."""
+    width = BEAM_WIDTH if width is None else width
+    depth = BEAM_DEPTH if depth is None else depth
+    weights = tetris_players.DELLACHERIE_WEIGHTS
+    moves, costs, afterstates = batch_evaluator.evaluate_afterstates(board, piece, weights)
+    beam = _select([(cost, root_index, batch_evaluator.pack_board(afterstate), afterstate)
+                    for root_index, (cost, afterstate)
+                    in enumerate(zip(costs.tolist(), afterstates))], width, float('inf'))
+    best_root = beam[0][1]
+    if depth > 1:
+        next_pieces = _sample_pieces(board, depth - 1)
+        # The greedy line from the cheapest first move is the first finished line
+        best_cost = _greedy_line_cost(beam[0], next_pieces, weights)
+        for next_piece in next_pieces:
+            beam = _select(_expand(beam, next_piece, weights), width, best_cost)
+            if not beam:
+                break
+        else:
+            best_root = beam[0][1]
+    return moves[best_root]
@@ -0,0 +1,242 @@
+"""Benchmarks for move generation, evaluation and end to end play.
+
+The micro benchmarks run on a fixed set of boards taken from seeded games, so runs on the
+same machine are comparable. The board size benchmarks play seeded games on bigger boards to
+show how placements per second change with the size, and the vector engine benchmark plays
+the greedy games of single_stage_player VECTOR_GAMES at a time. Results are written as JSON
+and can be compared with a saved baseline, benchmarks which got slower than the tolerance
+are reported as regressions.
+
+Usage:
+    python -m tetris_dp.benchmarks --output bench.json
+    python -m tetris_dp.benchmarks --output new.json --compare bench.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+
+import numpy
+
+from tetris_dp import bitboard
+from tetris_dp import constants
+from tetris_dp import engine
+from tetris_dp import helpers
+from tetris_dp import persistent_board
+from tetris_dp import placements
+from tetris_dp import tetris_players
+from tetris_dp import vector_engine
+
+BOARD_SEEDS = range(0, 4)
+BOARDS_PER_GAME = 10
+PIECES_BETWEEN_BOARDS = 15
+END_TO_END_SEEDS = range(100, 103)
+END_TO_END_PIECES = 300
+VECTOR_GAMES = 64
+# (rows, cols) of the board size benchmarks
+BOARD_SIZES = [(20, 10), (40, 20), (100, 40)]
+BOARD_SIZE_PIECES = 200
+REGRESSION_TOLERANCE = 0.10
+
+
+def sample_positions():
+    """Get (board, piece) positions from seeded games played by single_stage_player."""
+    positions = []
+    for seed in BOARD_SEEDS:
+        game = engine.TetrisEngine(seed)
+        for _ in range(BOARDS_PER_GAME):
+            game.play(tetris_players.single_stage_player,
+                      game.pieces_placed + PIECES_BETWEEN_BOARDS)
+            if game.gameover:
+                break
+            positions.append(([row[:] for row in game.board], game.piece))
+    return positions
+
+
+def _module_board(board, module):
+    """Convert a list of lists board to the board type used by module."""
+    if module in (bitboard, persistent_board):
+        return module.from_board(board)
+    return board
+
+
+def _collision_calls(positions, module):
+    """Every check_collision call made stepping each piece down from its spawn column."""
+    calls = []
+    for board, piece in positions:
+        module_board = _module_board(board, module)
+        off_x = int(constants.CONFIG['cols'] / 2 - len(piece[0]) / 2)
+        for off_y in range(0, len(board)):
+            calls.append((module_board, piece, (off_x, off_y)))
+            if helpers.check_collision(board, piece, (off_x, off_y)):
+                break
+    return calls
+
+
+def _interm_calls(positions, module):
+    """Every get_interm_board call for the candidate moves of each position."""
+    calls = []
+    for board, piece in positions:
+        module_board = _module_board(board, module)
+        tops = helpers.column_tops(board)
+        shape_index = constants.TETRIS_SHAPES.index(piece)
+        for placement in placements.get_placements(len(board[0]))[shape_index]:
+            for new_x in placement.x_range:
+                new_y = placements.landing_y(helpers, board, tops, placement, new_x)
+                calls.append((module_board, placement.piece, (new_x, new_y)))
+    return calls
+
+
+def micro_benchmarks(positions):
+    """Get (name, function, calls) for every micro benchmark."""
+    benchmarks = []
+    for module in (helpers, bitboard, persistent_board):
+        collision_calls = _collision_calls(positions, module)
+        interm_calls = _interm_calls(positions, module)
+        feature_boards = [module.get_interm_board(*call)[0] for call in interm_calls]
+        benchmarks.append((
+            '{}.check_collision'.format(module.__name__.split('.')[-1]),
+            lambda calls=collision_calls, module=module: [
+                module.check_collision(*call) for call in calls],
+            len(collision_calls)))
+        benchmarks.append((
+            '{}.get_interm_board'.format(module.__name__.split('.')[-1]),
+            lambda calls=interm_calls, module=module: [
+                module.get_interm_board(*call) for call in calls],
+            len(interm_calls)))
+        benchmarks.append((
+            '{}.find_holes_and_wells'.format(module.__name__.split('.')[-1]),
+            lambda boards=feature_boards, module=module: [
+                module.find_holes_and_wells(board) for board in boards],
+            len(feature_boards)))
+    landing_calls = [(helpers, board, helpers.column_tops(board),
+                      constants.TETRIS_SHAPES.index(piece)) for board, piece in positions]
+    benchmarks.append((
+        'placements.landing_placements',
+        lambda: [placements.landing_placements(*call) for call in landing_calls],
+        len(landing_calls)))
+    benchmarks.append((
+        'tetris_players._get_costs_of_moves',
+        lambda: [tetris_players._get_costs_of_moves(  # pylint: disable=protected-access
+            board, piece) for board, piece in positions],
+        len(positions)))
+    for player in (tetris_players.single_stage_player, tetris_players.lookahead_player):
+        benchmarks.append((
+            'tetris_players.{}'.format(player.__name__),
+            lambda player=player: [player(board, piece) for board, piece in positions],
+            len(positions)))
+    return benchmarks
+
+
+def board_size_benchmarks():
+    """Get the seconds per placement of single_stage_player on every board size.
+
+    Both evaluators are timed, the batch evaluator and the incremental board state. The
+    transposition table is off or the second evaluator would replay the first one's moves.
+    """
+    results = {}
+    use_batch_evaluator = tetris_players.USE_BATCH_EVALUATOR
+    use_transposition_table = tetris_players.USE_TRANSPOSITION_TABLE
+    tetris_players.USE_TRANSPOSITION_TABLE = 0
+    try:
+        for rows, cols in BOARD_SIZES:
+            for name, batch in (('single_stage_player', 1), ('incremental', 0)):
+                tetris_players.USE_BATCH_EVALUATOR = batch
+                game = engine.TetrisEngine(END_TO_END_SEEDS[0], rows=rows, cols=cols)
+                start_time = time.time()
+                game.play(tetris_players.single_stage_player, BOARD_SIZE_PIECES)
+                seconds = (time.time() - start_time) / max(1, game.pieces_placed)
+                results['board_size.{}x{}.{}'.format(rows, cols, name)] = {
+                    'seconds_per_call': seconds, 'calls_per_second': 1 / seconds}
+    finally:
+        tetris_players.USE_BATCH_EVALUATOR = use_batch_evaluator
+        tetris_players.USE_TRANSPOSITION_TABLE = use_transposition_table
+    return results
+
+
+def _time_per_call(function, calls, repeat):
+    """Get the best time per call over repeat runs."""
+    return min(timeit.repeat(function, number=1, repeat=repeat)) / calls
+
+
+def run_benchmarks(repeat=3):
+    """Run every benchmark and return the results."""
+    positions = sample_positions()
+    results = {}
+    use_transposition_table = tetris_players.USE_TRANSPOSITION_TABLE
+    # The cache would turn every repeat after the first into lookups
+    tetris_players.USE_TRANSPOSITION_TABLE = 0
+    try:
+        for name, function, calls in micro_benchmarks(positions):
+            seconds = _time_per_call(function, calls, repeat)
+            results[name] = {'seconds_per_call': seconds, 'calls_per_second': 1 / seconds}
+        results.update(board_size_benchmarks())
+    finally:
+        tetris_players.USE_TRANSPOSITION_TABLE = use_transposition_table
+
+    pieces_placed = 0
+    start_time = time.time()
+    for seed in END_TO_END_SEEDS:
+        game = engine.TetrisEngine(seed)
+        game.play(tetris_players.single_stage_player, END_TO_END_PIECES)
+        pieces_placed += game.pieces_placed
+    seconds = (time.time() - start_time) / pieces_placed
+    results['end_to_end.single_stage_player'] = {'seconds_per_call': seconds,
+                                                 'calls_per_second': 1 / seconds}
+
+    games = vector_engine.VectorEngine(VECTOR_GAMES, END_TO_END_SEEDS[0])
+    weights = numpy.array(tetris_players.DELLACHERIE_WEIGHTS)
+    start_time = time.time()
+    for _ in range(END_TO_END_PIECES):
+        games.step(games.greedy_actions(weights))
+    seconds = (time.time() - start_time) / (END_TO_END_PIECES * VECTOR_GAMES)
+    results['end_to_end.vector_engine'] = {'seconds_per_call': seconds,
+                                           'calls_per_second': 1 / seconds}
+    return {'meta': {'python': platform.python_version(), 'machine': platform.machine(),
+                     'positions': len(positions), 'time': time.time()},
+            'results': results}
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Get (name, baseline seconds, new seconds) of every benchmark slower than tolerance."""
+    regressions = []
+    for name, result in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        old_seconds = baseline['results'][name]['seconds_per_call']
+        if result['seconds_per_call'] > old_seconds * (1 + tolerance):
+            regressions.append((name, old_seconds, result['seconds_per_call']))
+    return regressions
+
+
+def main(argv=None):
+    """Run the benchmarks from the command line, exits with 1 if anything regressed."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--compare', default=None, help='Baseline results to compare with')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.repeat)
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        json.dump(results, output_file, indent=2, sort_keys=True)
+    for name, result in sorted(results['results'].items()):
+        print('{:50} {:12.1f} calls/s'.format(name, result['calls_per_second']))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, old_seconds, new_seconds in regressions:
+            print('REGRESSION {}: {:.3g}s -> {:.3g}s per call ({:+.0%})'.format(
+                name, old_seconds, new_seconds, new_seconds / old_seconds - 1))
+        if regressions:
+            sys.exit(1)
+        print('No regressions against {}.'.format(args.compare))
+
+
+if __name__ == '__main__':
+    main()
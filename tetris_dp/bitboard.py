@@ -0,0 +1,165 @@
+"""Bitboard version of the board helpers.
+
+A bitboard is a list of integers, one per row, where bit x is set if column x is filled. Like
+the boards made by TetrisApp.new_board the last row is a filled sentinel floor. The functions
+here mirror the ones in helpers so the players can swap between the two engines, but collision,
+placement and full row detection are shifts and ANDs instead of per cell loops. The sentinel
+row is also the full row mask of the board, so boards of any width work without a config.
+"""
+from tetris_dp import constants
+from tetris_dp import feature_tables
+from tetris_dp import helpers
+
+FULL_ROW = (1 << constants.CONFIG['cols']) - 1
+_PIECE_MASKS = {}
+
+
+def _piece_key(piece):
+    """Get a hashable key for a piece."""
+    return tuple(tuple(row) for row in piece)
+
+
+def _build_piece_masks(piece):
+    """Turn every row of a piece into a bitmask."""
+    return tuple(sum(1 << column_index for column_index, cell in enumerate(row) if cell)
+                 for row in piece)
+
+
+def piece_masks(piece):
+    """Get the row masks of a piece, these are cached after the first lookup."""
+    key = _piece_key(piece)
+    masks = _PIECE_MASKS.get(key)
+    if masks is None:
+        masks = _PIECE_MASKS[key] = _build_piece_masks(piece)
+    return masks
+
+
+def new_board(rows=None, cols=None):
+    """Spawn a new empty bitboard, the size defaults to the one in CONFIG."""
+    rows = constants.CONFIG['rows'] if rows is None else rows
+    cols = constants.CONFIG['cols'] if cols is None else cols
+    return [0] * rows + [(1 << cols) - 1]
+
+
+def from_board(board):
+    """Convert a list of lists board into a bitboard."""
+    return feature_tables.row_masks(board)
+
+
+def to_board(board):
+    """Convert a bitboard into a list of lists board of 0 and 1 cells."""
+    cols = board[-1].bit_length()
+    return [[(row >> x_position) & 1 for x_position in range(cols)] for row in board]
+
+
+def check_collision(board, piece, offset):
+    """Check if the piece, board and given position causes a collision."""
+    off_x, off_y = offset
+    masks = piece_masks(piece)
+    if off_x < 0 or off_x + len(piece[0]) > board[-1].bit_length():
+        return True
+    if off_y + len(masks) > len(board):
+        return True
+    for row_index, mask in enumerate(masks):
+        if board[row_index + off_y] & (mask << off_x):
+            return True
+    return False
+
+
+def remove_row(board, row):
+    """Remove a filled row from the board."""
+    del board[row]
+    return [0] + board
+
+
+def clear_full_rows(board):
+    """Remove every filled row above the sentinel and return the board and rows removed."""
+    removed_rows = 0
+    full_row = board[-1]
+    for i in range(len(board) - 1):
+        if board[i] == full_row:
+            board = remove_row(board, i)
+            removed_rows += 1
+    return board, removed_rows
+
+
+def add_piece_to_board(board, piece, offset):
+    """Add the piece to the board at the given position."""
+    off_x, off_y = offset
+    for row_index, mask in enumerate(piece_masks(piece)):
+        board[row_index + off_y - 1] |= mask << off_x
+    return board
+
+
+def get_interm_board(board, piece, offset):
+    """Add a piece to a copy of the board and return it for cost evaluation.
+
+    Works like helpers.get_interm_board, cells which overlap something on the board are marked
+    on the top row so the cost functions see the move as invalid.
+    """
+    off_x, off_y = offset
+    interm_board = board[:]
+    for row_index, mask in enumerate(piece_masks(piece)):
+        y_offset = row_index + off_y - 1
+        shifted = mask << off_x
+        interm_board[0] |= interm_board[y_offset] & shifted
+        interm_board[y_offset] |= shifted
+    return clear_full_rows(interm_board)
+
+
+def column_tops(board):
+    """Find the row index of the highest filled cell in every column."""
+    full_row = board[-1]
+    tops = [0] * full_row.bit_length()
+    seen = 0
+    for y_position, row in enumerate(board):
+        for x_position in iterate_columns(row & ~seen):
+            tops[x_position] = y_position
+        seen |= row
+        if seen == full_row:
+            break
+    return tops
+
+
+def row_transitions(row, full_row=FULL_ROW):
+    """Count the filled cells next to empty cells in a single row, borders not included."""
+    tables = feature_tables.row_tables(full_row)
+    if tables is None:
+        return feature_tables.count_row_transitions(row, full_row)
+    return tables[0][row]
+
+
+def row_wells(row, full_row=FULL_ROW):
+    """Count the empty cells in a row with filled cells or walls on both sides."""
+    tables = feature_tables.row_tables(full_row)
+    if tables is None:
+        return feature_tables.count_row_wells(row, full_row)
+    return tables[1][row]
+
+
+def iterate_columns(mask):
+    """Yield the column index of every set bit in a row mask."""
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+def find_holes_and_wells(board):
+    """Find number of empty cells with one covered cell above it.
+
+    Returns the same holes, wells, row transitions and column transitions as
+    helpers.find_holes_and_wells does for the equivalent list of lists board.
+    """
+    return feature_tables.find_holes_and_wells(board)
+
+
+def _cache_all_rotations():
+    """Fill the piece mask cache with every rotation of every shape."""
+    for shape in constants.TETRIS_SHAPES:
+        for _ in range(4):
+            piece_masks(shape)
+            shape = helpers.rotate_clockwise(shape)
+
+
+_cache_all_rotations()
@@ -0,0 +1,199 @@
+"""Board state which keeps the Dellacherie board features up to date incrementally.
+
+Placing a piece only touches the rows and columns under its cells and clearing a row only
+touches the cells around the seam it leaves, so evaluating a candidate costs time in the size
+of the piece rather than the size of the board. Every place can be rolled back with undo.
+"""
+from tetris_dp import bitboard
+from tetris_dp import transposition
+
+
+def _add_column_count(counts, mask, delta):
+    """Add delta to the count of every column set in mask and return the total change."""
+    total = 0
+    for x_position in bitboard.iterate_columns(mask & ((1 << len(counts)) - 1)):
+        counts[x_position] += delta
+        total += delta
+    return total
+
+
+class BoardState:  # pylint: disable=too-many-instance-attributes
+    """A bitboard plus per row and per column feature counts.
+
+    It has the length of its bitboard so it can stand in for a board in the cost functions.
+    """
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.height = len(self.rows)
+        self.full_row = self.rows[-1]
+        self.cell_keys = transposition.board_keys(self.rows).cell_keys
+        self.tops = bitboard.column_tops(self.rows)
+        self.column_holes = [0] * len(self.tops)
+        self.column_transitions = [0] * len(self.tops)
+        self.row_transitions = [bitboard.row_transitions(row, self.full_row)
+                                for row in self.rows]
+        self.row_wells = [bitboard.row_wells(row, self.full_row) for row in self.rows]
+        for y_position in range(1, self.height):
+            above, row = self.rows[y_position - 1], self.rows[y_position]
+            for x_position in bitboard.iterate_columns(~row & above & self.full_row):
+                self.column_holes[x_position] += 1
+            for x_position in bitboard.iterate_columns(row ^ above):
+                self.column_transitions[x_position] += 1
+        self.total_holes = sum(self.column_holes)
+        self.total_wells = sum(self.row_wells)
+        self.total_row_transitions = sum(self.row_transitions)
+        self.total_column_transitions = sum(self.column_transitions)
+        self.hash = transposition.zobrist_hash(self.rows)
+        self._history = []
+
+    def __len__(self):
+        return self.height
+
+    def features(self):
+        """Get the holes, wells, row and column transitions like find_holes_and_wells."""
+        return (self.total_holes, self.total_wells,
+                self.total_row_transitions, self.total_column_transitions)
+
+    def _snapshot(self):
+        """Copy everything a row clear changes."""
+        return (self.rows[:], self.tops[:], self.column_holes[:], self.column_transitions[:],
+                self.row_transitions[:], self.row_wells[:], self.features(), self.hash)
+
+    def _restore(self, snapshot):
+        """Restore a copy made by _snapshot."""
+        (self.rows, self.tops, self.column_holes, self.column_transitions,
+         self.row_transitions, self.row_wells, totals, self.hash) = snapshot
+        (self.total_holes, self.total_wells,
+         self.total_row_transitions, self.total_column_transitions) = totals
+
+    def _fill_cell(self, x_position, y_position, changed_columns):
+        """Fill an empty cell and update the column features it touches."""
+        bit = 1 << x_position
+        if x_position not in changed_columns:
+            changed_columns[x_position] = (self.tops[x_position],
+                                           self.column_holes[x_position],
+                                           self.column_transitions[x_position])
+        if y_position > 0:
+            if self.rows[y_position - 1] & bit:
+                self.column_holes[x_position] -= 1
+                self.total_holes -= 1
+                self.column_transitions[x_position] -= 1
+                self.total_column_transitions -= 1
+            else:
+                self.column_transitions[x_position] += 1
+                self.total_column_transitions += 1
+        if y_position + 1 < self.height:
+            if self.rows[y_position + 1] & bit:
+                self.column_transitions[x_position] -= 1
+                self.total_column_transitions -= 1
+            else:
+                self.column_holes[x_position] += 1
+                self.total_holes += 1
+                self.column_transitions[x_position] += 1
+                self.total_column_transitions += 1
+        if y_position < self.tops[x_position]:
+            self.tops[x_position] = y_position
+        self.rows[y_position] |= bit
+        self.hash ^= self.cell_keys[y_position][x_position]
+
+    def place(self, placement, off_x, off_y):
+        """Place a piece from the placement tables and return the number of rows removed.
+
+        The offset is the same as for helpers.get_interm_board, including marking cells which
+        overlap the board on the top row.
+        """
+        old_totals = self.features()
+        old_hash = self.hash
+        changed_rows = {}
+        changed_columns = {}
+        for row_index, column_index in placement.cells:
+            x_position = column_index + off_x
+            y_position = (row_index + off_y - 1) % self.height
+            bit = 1 << x_position
+            if self.rows[y_position] & bit:
+                y_position = 0
+                if self.rows[0] & bit:
+                    continue
+            if y_position not in changed_rows:
+                changed_rows[y_position] = self.rows[y_position]
+            self._fill_cell(x_position, y_position, changed_columns)
+        for y_position in changed_rows:
+            row = self.rows[y_position]
+            transitions = bitboard.row_transitions(row, self.full_row)
+            wells = bitboard.row_wells(row, self.full_row)
+            self.total_row_transitions += transitions - self.row_transitions[y_position]
+            self.total_wells += wells - self.row_wells[y_position]
+            changed_rows[y_position] = (changed_rows[y_position],
+                                        self.row_transitions[y_position],
+                                        self.row_wells[y_position])
+            self.row_transitions[y_position] = transitions
+            self.row_wells[y_position] = wells
+
+        snapshot = None
+        removed_rows = 0
+        for y_position in range(0, self.height - 1):
+            if self.rows[y_position] == self.full_row:
+                if snapshot is None:
+                    snapshot = self._snapshot()
+                self._remove_row(y_position)
+                removed_rows += 1
+        if removed_rows:
+            self.hash = transposition.zobrist_hash(self.rows)
+        self._history.append((changed_rows, changed_columns, old_totals, old_hash, snapshot))
+        return removed_rows
+
+    def _remove_row(self, y_position):
+        """Remove a full row, only the column features across the seam it leaves change."""
+        below = self.rows[y_position + 1]
+        empty_below = ~below & self.full_row
+        holes_delta = _add_column_count(self.column_holes, empty_below, -1)
+        transitions_delta = _add_column_count(self.column_transitions, empty_below, -1)
+        if y_position > 0:
+            above = self.rows[y_position - 1]
+            holes_delta += _add_column_count(self.column_holes, empty_below & above, 1)
+            transitions_delta += _add_column_count(self.column_transitions, ~above, -1)
+            transitions_delta += _add_column_count(
+                self.column_transitions, above ^ below, 1)
+            transitions_delta += _add_column_count(
+                self.column_transitions, self.rows[0], 1)
+        else:
+            transitions_delta += _add_column_count(self.column_transitions, below, 1)
+        self.total_holes += holes_delta
+        self.total_column_transitions += transitions_delta
+
+        self.total_row_transitions -= self.row_transitions[y_position]
+        self.total_wells -= self.row_wells[y_position]
+        for row_features in (self.rows, self.row_transitions, self.row_wells):
+            del row_features[y_position]
+            row_features.insert(0, 0)
+        for x_position, top in enumerate(self.tops):
+            if top < y_position:
+                self.tops[x_position] = top + 1
+            elif top == y_position:
+                bit = 1 << x_position
+                top = y_position + 1
+                while not self.rows[top] & bit:
+                    top += 1
+                self.tops[x_position] = top
+
+    def undo(self):
+        """Roll back the last place."""
+        changed_rows, changed_columns, old_totals, old_hash, snapshot = self._history.pop()
+        if snapshot is not None:
+            self._restore(snapshot)
+        for y_position, (row, transitions, wells) in changed_rows.items():
+            self.rows[y_position] = row
+            self.row_transitions[y_position] = transitions
+            self.row_wells[y_position] = wells
+        for x_position, (top, holes, transitions) in changed_columns.items():
+            self.tops[x_position] = top
+            self.column_holes[x_position] = holes
+            self.column_transitions[x_position] = transitions
+        (self.total_holes, self.total_wells,
+         self.total_row_transitions, self.total_column_transitions) = old_totals
+        self.hash = old_hash
+
+
+def find_holes_and_wells(state):
+    """Get the features of a board state, so it can stand in for a board in the cost functions."""
+    return state.features()
@@ -0,0 +1,81 @@
+"""Command line entry point for playing games, headless or in a window.
+
+Headless runs play a game for every seed with batch_runner and write one result per game to
+the output file, visual runs open the pygame window on the first seed. Only the light
+modules are imported up front: pygame is imported for visual runs only, and the players,
+numpy and the optimizer once the options are known to need them. Short jobs should use one
+process so no worker pool is started.
+
+Usage:
+    python -m tetris_dp --player beam --depth 3 --games 100 --output results.jsonl
+    python -m tetris_dp --player single_stage --games 10 --processes 1
+    python -m tetris_dp --visual --player expectimax --weights checkpoint.json
+    python -m tetris_dp --visual --manual
+"""
+import argparse
+
+from tetris_dp import batch_runner
+from tetris_dp import pieces
+
+
+def positive_int(value):
+    """Parse a command line value which has to be a whole number above 0."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError('expected a number above 0, got {}'.format(value))
+    return number
+
+
+def play_visual(args):
+    """Play the first seed in the pygame window, the app exits when the game is over."""
+    from tetris_dp import tetris_game  # pylint: disable=import-outside-toplevel
+    tetris_game.ANIMATE_FALLING = int(args.animate)
+    if args.manual:
+        tetris_game.TetrisApp(seed=args.first_seed, piece_mode=args.piece_mode).manual_run()
+    else:
+        tetris_game.TetrisApp(batch_runner.get_player(args.player), args.first_seed,
+                              args.piece_mode).run()
+
+
+def main(argv=None):
+    """Play games from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--player', choices=sorted(batch_runner.PLAYERS), default='single_stage')
+    parser.add_argument('--depth', type=int, default=None,
+                        help='Pieces to look ahead, for the {} players'.format(
+                            ', '.join(sorted(batch_runner.DEPTH_FLAGS))))
+    parser.add_argument('--weights', default=None,
+                        help='Dellacherie weights, a JSON list or an optimizer checkpoint')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--processes', type=positive_int, default=None,
+                        help='Worker processes, 1 plays in this process')
+    parser.add_argument('--max-pieces', type=int, default=None)
+    parser.add_argument('--piece-mode', choices=pieces.PIECE_MODES, default=pieces.UNIFORM)
+    parser.add_argument('--output', default='results.jsonl')
+    parser.add_argument('--visual', action='store_true', help='Play in a pygame window')
+    parser.add_argument('--manual', action='store_true',
+                        help='Play with the arrow keys, implies --visual')
+    parser.add_argument('--animate', action='store_true',
+                        help='Animate the falling pieces in the window')
+    args = parser.parse_args(argv)
+    if args.depth is not None and args.player not in batch_runner.DEPTH_FLAGS:
+        parser.error('--depth is only supported by the {} players'.format(
+            ', '.join(sorted(batch_runner.DEPTH_FLAGS))))
+    weights = None
+    if args.weights is not None:
+        from tetris_dp import optimizer  # pylint: disable=import-outside-toplevel
+        weights = optimizer.load_weights(args.weights)
+    if args.visual or args.manual:
+        batch_runner.configure_player(args.player, args.depth, weights)
+        play_visual(args)
+        return
+    seeds = range(args.first_seed, args.first_seed + args.games)
+    # The depth and weights go to every worker, module flags set here would not reach them
+    batch_runner.run_batch(args.player, seeds, args.output, processes=args.processes,
+                           max_pieces=args.max_pieces, piece_mode=args.piece_mode,
+                           player_settings=(args.depth, weights))
+
+
+if __name__ == '__main__':
+    main()
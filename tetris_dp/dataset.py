@@ -0,0 +1,248 @@
+"""Export the decisions of a player as a dataset of fixed size records.
+
+Every placement of a game becomes one record holding the board before the move as bitboard
+row masks, the shape index, the action the player chose, indexed like vector_engine actions,
+its landing row, the Dellacherie cost of every action of the piece, NaN for masked actions,
+and the final score of the game. The records of a game are appended once the game is over
+so the score is known.
+
+Games are spread over processes which each append to their own shard file, so no locking is
+needed and an interrupted export keeps every game finished so far. Like batch_runner, seeds
+already in a shard of the output directory are skipped, so an export can be resumed or
+extended with other shard counts without writing a game twice. Shards are read back by
+memory mapping them, iter_batches yields slices of the maps so only the pages of the batches
+in use are ever read.
+
+Shard file layout: magic b'TDPD', version byte, pad byte, rows, cols and actions (uint16),
+4 pad bytes, then the records, see record_dtype.
+
+Usage: python -m tetris_dp.dataset --player lookahead --games 1000 --output-dir data
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import struct
+
+import numpy
+
+from tetris_dp import batch_evaluator
+from tetris_dp import batch_runner
+from tetris_dp import bitboard
+from tetris_dp import constants
+from tetris_dp import engine
+from tetris_dp import pieces
+from tetris_dp import tetris_players
+from tetris_dp import vector_engine
+
+MAGIC = b'TDPD'
+VERSION = 1
+_HEADER = struct.Struct('<4sBxHHH4x')
+SHARD_PATTERN = 'shard-{:03d}.tdpd'
+
+
+def record_dtype(rows, cols):
+    """Get the numpy dtype of a record of a board rows by cols."""
+    for row_type, max_cols in (('<u2', 16), ('<u4', 32), ('<u8', 64)):
+        if cols <= max_cols:
+            break
+    else:
+        raise ValueError('Boards wider than 64 columns are not supported, got {}'.format(cols))
+    num_actions = vector_engine.get_action_table(cols).mask.shape[1]
+    return numpy.dtype([('seed', '<u8'), ('move_number', '<u4'), ('board', row_type, (rows,)),
+                        ('piece', 'u1'), ('action', '<u2'), ('landing_row', '<u2'),
+                        ('costs', '<f4', (num_actions,)), ('score', '<u4')])
+
+
+def read_header(shard_file):
+    """Read the header of a shard and get the (rows, cols) of its boards."""
+    magic, version, rows, cols, _ = _HEADER.unpack(shard_file.read(_HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('{} is not a version {} dataset shard'.format(shard_file.name,
+                                                                        VERSION))
+    return rows, cols
+
+
+class ShardWriter:
+    """Appends records to a shard file, writing the header first if the file is new."""
+    def __init__(self, path, rows, cols):
+        self.dtype = record_dtype(rows, cols)
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as shard_file:
+                if read_header(shard_file) != (rows, cols):
+                    raise ValueError('{} holds boards of another size'.format(path))
+            self.shard_file = open(path, 'ab')
+        else:
+            self.shard_file = open(path, 'wb')
+            self.shard_file.write(_HEADER.pack(MAGIC, VERSION, rows, cols,
+                                               self.dtype['costs'].shape[0]))
+        self.records = 0
+
+    def append(self, records):
+        """Append an array of records and flush them."""
+        self.shard_file.write(records.tobytes())
+        self.shard_file.flush()
+        self.records += len(records)
+
+    def close(self):
+        """Close the shard file."""
+        self.shard_file.close()
+
+
+def play_records(game, player, max_pieces, dtype):
+    """Let a player play a game until game over or max_pieces and get its records.
+
+    The single stage player's move is the lowest of the costs recorded, so it is taken from
+    them instead of evaluating every move again.
+    """
+    boards = []
+    shape_indexes = []
+    actions = []
+    landing_rows = []
+    all_costs = []
+    while not game.gameover and (max_pieces is None or game.pieces_placed < max_pieces):
+        moves, costs = batch_evaluator.evaluate_moves(game.board, game.piece,
+                                                      tetris_players.DELLACHERIE_WEIGHTS)
+        if player is tetris_players.single_stage_player:
+            move = moves[batch_evaluator.last_argmin(costs)]
+        else:
+            move = player(game.board, game.piece)
+        if move not in moves:
+            raise ValueError('The player chose a move which is not a straight drop')
+        boards.append(bitboard.from_board(game.board[:-1]))
+        shape_indexes.append(game.shape_index)
+        actions.append(moves.index(move))
+        landing_rows.append(move[1])
+        all_costs.append(costs)
+        game.step(move)
+    records = numpy.zeros(len(boards), dtype=dtype)
+    records['seed'] = game.seed
+    records['move_number'] = numpy.arange(len(boards))
+    if boards:
+        records['board'] = boards
+        records['costs'] = numpy.nan
+        for record_costs, costs in zip(records['costs'], all_costs):
+            record_costs[:len(costs)] = costs
+    records['piece'] = shape_indexes
+    records['action'] = actions
+    records['landing_row'] = landing_rows
+    records['score'] = game.score
+    return records
+
+
+def _write_shard(task):
+    """Play the games of one shard and append their records, returns the records written."""
+    shard_path, seeds, settings = task
+    player_name, max_pieces, piece_mode, board_size = settings
+    player = batch_runner.get_player(player_name)
+    rows = constants.CONFIG['rows'] if board_size[0] is None else board_size[0]
+    cols = constants.CONFIG['cols'] if board_size[1] is None else board_size[1]
+    writer = ShardWriter(shard_path, rows, cols)
+    try:
+        for seed in seeds:
+            game = engine.TetrisEngine(seed, piece_mode, rows, cols)
+            writer.append(play_records(game, player, max_pieces, writer.dtype))
+    finally:
+        writer.close()
+    return writer.records
+
+
+def _drop_torn_game(path):
+    """Cut a shard back to its last whole game if a crash left a record cut short."""
+    with open(path, 'rb') as shard_file:
+        dtype = record_dtype(*read_header(shard_file))
+    if not (os.path.getsize(path) - _HEADER.size) % dtype.itemsize:
+        return
+    seeds = numpy.array(open_shard(path)['seed'])
+    # The records of a game are written together, so the torn game is the last one
+    other_games = numpy.flatnonzero(seeds != seeds[-1]) if len(seeds) else []
+    whole_records = int(other_games[-1]) + 1 if len(other_games) else 0
+    os.truncate(path, _HEADER.size + whole_records * dtype.itemsize)
+
+
+def done_seeds(output_dir):
+    """Get the seeds of the games already in the shards of output_dir."""
+    seeds = set()
+    for path in shard_paths(output_dir):
+        if os.path.getsize(path):
+            _drop_torn_game(path)
+            seeds.update(open_shard(path)['seed'].tolist())
+    return seeds
+
+
+def export_dataset(output_dir, seeds, settings, shards=None):
+    """Play a game for every seed not already in output_dir and append the records to shards.
+
+    settings is (player name, max pieces, piece mode, (rows, cols)). Shard i gets the seeds
+    left seeds[i::shards] and is written by one process. Returns the number of records written.
+    """
+    shards = shards or os.cpu_count()
+    os.makedirs(output_dir, exist_ok=True)
+    skipped_seeds = done_seeds(output_dir)
+    seeds = [seed for seed in seeds if seed not in skipped_seeds]
+    if not seeds:
+        return 0
+    tasks = [(os.path.join(output_dir, SHARD_PATTERN.format(shard)), seeds[shard::shards],
+              settings) for shard in range(shards) if seeds[shard::shards]]
+    pool = multiprocessing.Pool(len(tasks), batch_runner.init_worker)
+    try:
+        return sum(pool.map(_write_shard, tasks, chunksize=1))
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def shard_paths(output_dir):
+    """Get the paths of the shards in a dataset directory."""
+    return sorted(glob.glob(os.path.join(output_dir, SHARD_PATTERN.replace('{:03d}', '*'))))
+
+
+def open_shard(path):
+    """Memory map the records of a shard, a record cut short by a crash is left out."""
+    with open(path, 'rb') as shard_file:
+        dtype = record_dtype(*read_header(shard_file))
+    count = (os.path.getsize(path) - _HEADER.size) // dtype.itemsize
+    if not count:
+        return numpy.zeros(0, dtype=dtype)
+    return numpy.memmap(path, dtype=dtype, mode='r', offset=_HEADER.size, shape=(count,))
+
+
+def iter_batches(paths, batch_size=4096):
+    """Yield the records of every shard in batches of at most batch_size.
+
+    The batches are read only views of the memory maps, copy them to keep them around.
+    """
+    for path in paths:
+        records = open_shard(path)
+        for start in range(0, len(records), batch_size):
+            yield records[start:start + batch_size]
+
+
+def unpack_boards(records, cols):
+    """Get the boards of records as an (N, rows, cols) bool array."""
+    return (records['board'][..., numpy.newaxis] >> numpy.arange(cols, dtype=numpy.uint64)
+            & 1).astype(bool)
+
+
+def main(argv=None):
+    """Export a dataset from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--player', choices=sorted(batch_runner.PLAYERS), default='single_stage')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--output-dir', default='dataset')
+    parser.add_argument('--shards', type=int, default=None)
+    parser.add_argument('--max-pieces', type=int, default=None)
+    parser.add_argument('--piece-mode', choices=pieces.PIECE_MODES, default=pieces.UNIFORM)
+    parser.add_argument('--rows', type=int, default=None)
+    parser.add_argument('--cols', type=int, default=None)
+    args = parser.parse_args(argv)
+    seeds = range(args.first_seed, args.first_seed + args.games)
+    records = export_dataset(args.output_dir, seeds, (args.player, args.max_pieces,
+                                                      args.piece_mode, (args.rows, args.cols)),
+                             args.shards)
+    print('Wrote {} positions to {}.'.format(records, args.output_dir))
+
+
+if __name__ == '__main__':
+    main()
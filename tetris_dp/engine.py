@@ -0,0 +1,158 @@
+"""Headless tetris game rules.
+
+The engine holds the board, the falling piece and the score and knows nothing about pygame,
+so batch runs can play games without opening a display. TetrisApp renders on top of it.
+"""
+import random
+
+from tetris_dp import constants
+from tetris_dp import helpers
+from tetris_dp import instrumentation
+from tetris_dp import pieces
+from tetris_dp import placements
+
+
+def new_board(rows=None, cols=None):
+    """Spawn a new empty board, the size defaults to the one in CONFIG."""
+    rows = constants.CONFIG['rows'] if rows is None else rows
+    cols = constants.CONFIG['cols'] if cols is None else cols
+    board = [[0 for _ in range(cols)] for _ in range(rows)]
+    board += [[1 for _ in range(cols)]]
+    return board
+
+
+class TetrisEngine:
+    """The rules of a single tetris game.
+
+    Every placement is kept as a little endian move code in move_codes, one byte up to 64
+    columns and two above, so the game can be saved with recording.Recording.from_engine and
+    replayed. The board is rows by cols, CONFIG gives the default size.
+    """
+    def __init__(self, seed=None, piece_mode=pieces.UNIFORM, rows=None, cols=None):
+        self.rows = constants.CONFIG['rows'] if rows is None else rows
+        self.cols = constants.CONFIG['cols'] if cols is None else cols
+        self.board = None
+        self.piece = None
+        self.shape_index = None
+        self.piece_x = None
+        self.piece_y = None
+        self.score = 0
+        self.pieces_placed = 0
+        self.move_codes = None
+        self.gameover = False
+        self.pieces = None
+        self.reset(seed, piece_mode)
+
+    def reset(self, seed=None, piece_mode=None):
+        """Start a new game, pieces come from a generator seeded with seed or a random seed.
+
+        piece_mode None keeps the piece mode of the last game, uniform for a new engine.
+        """
+        if seed is None:
+            seed = random.SystemRandom().randrange(1 << 32)
+        if piece_mode is None:
+            piece_mode = self.pieces.mode if self.pieces else pieces.UNIFORM
+        self.pieces = pieces.PieceGenerator(seed, piece_mode)
+        self.board = new_board(self.rows, self.cols)
+        self.score = 0
+        self.pieces_placed = 0
+        self.move_codes = bytearray()
+        self.gameover = False
+        self.new_piece()
+
+    @property
+    def seed(self):
+        """The seed of the piece generator."""
+        return self.pieces.seed
+
+    def new_piece(self):
+        """Spawn the next piece from the piece generator."""
+        self.shape_index = self.pieces.next_index()
+        self.piece = constants.TETRIS_SHAPES[self.shape_index]
+        self.piece_x = int(self.cols / 2 - len(self.piece[0])/2)
+        self.piece_y = 0
+
+        if helpers.check_collision(self.board, self.piece, (self.piece_x, self.piece_y)):
+            self.gameover = True
+
+    def legal_moves(self):
+        """Get every (x, y, piece) move for the current piece, dropped straight down."""
+        tops = helpers.column_tops(self.board)
+        return [(new_x, new_y, placement.piece) for placement, new_x, new_y
+                in placements.landing_placements(helpers, self.board, tops, self.shape_index)]
+
+    def move(self, delta_x):
+        """Move the piece left or right if it won't cause a collision."""
+        if not self.gameover:
+            new_x = self.piece_x + delta_x
+            if new_x < 0:
+                new_x = 0
+            if new_x > self.cols - len(self.piece[0]):
+                new_x = self.cols - len(self.piece[0])
+            if not helpers.check_collision(self.board, self.piece, (new_x, self.piece_y)):
+                self.piece_x = new_x
+
+    def rotate(self):
+        """Rotate the piece clockwise as long as it won't cause a collision."""
+        if not self.gameover:
+            new_piece = helpers.rotate_clockwise(self.piece)
+            if not helpers.check_collision(self.board, new_piece, (self.piece_x, self.piece_y)):
+                self.piece = new_piece
+
+    def drop(self):
+        """Lock the piece in place, spawn the next one and return the rows removed.
+
+        The piece y is the first row offset where it collides, the same as the moves from
+        the players, so it is added to the board one row above that.
+        """
+        if self.gameover:
+            return 0
+        code = placements.move_code(self.shape_index, (self.piece_x, self.piece_y, self.piece),
+                                    placements.move_x_bits(self.cols))
+        self.move_codes += code.to_bytes(placements.move_code_bytes(self.cols), 'little')
+        self.board = helpers.add_piece_to_board(self.board, self.piece,
+                                                (self.piece_x, self.piece_y))
+        # Only the rows the piece went into can have filled up
+        piece_rows = sorted({(row_index + self.piece_y - 1) % len(self.board)
+                             for row_index in range(len(self.piece))})
+        self.pieces_placed += 1
+        self.new_piece()
+        removed_rows = 0
+        for i in piece_rows:
+            if i < len(self.board) - 1 and 0 not in self.board[i]:
+                self.board = helpers.remove_row(self.board, i)
+                removed_rows += 1
+        self.score += removed_rows
+        instrumentation.count('rows_cleared', removed_rows)
+        return removed_rows
+
+    def soft_drop(self):
+        """Move the piece down one row, locking it if it lands, and return True if it locked."""
+        if self.gameover:
+            return False
+        self.piece_y += 1
+        if helpers.check_collision(self.board, self.piece, (self.piece_x, self.piece_y)):
+            self.drop()
+            return True
+        return False
+
+    def step(self, move):
+        """Place the current piece with an (x, y, piece) move and return the rows removed."""
+        self.piece_x, self.piece_y, self.piece = move
+        return self.drop()
+
+    def play(self, player, max_pieces=None):
+        """Let a player play until game over or max_pieces are placed and return the score."""
+        while not self.gameover and (max_pieces is None or self.pieces_placed < max_pieces):
+            self.step(player(self.board, self.piece))
+            instrumentation.end_move()
+        return self.score
+
+    def clone(self):
+        """Copy the game, including the state of its piece generator."""
+        engine_copy = TetrisEngine.__new__(TetrisEngine)
+        engine_copy.__dict__.update(self.__dict__)
+        engine_copy.board = [row[:] for row in self.board]
+        engine_copy.move_codes = bytearray(self.move_codes)
+        engine_copy.pieces = self.pieces.clone()
+        return engine_copy
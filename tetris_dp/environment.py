@@ -0,0 +1,146 @@
+"""Reset and step environment over the headless game for training policies.
+
+The game is a one game vector_engine.VectorEngine so the board already lives in a numpy
+array. Observations are a dict of numpy arrays allocated once: the board is a view of the
+engine's board and the current piece, the afterstate features of every placement and the
+action mask are filled in place, so every step returns the same dict and nothing is copied
+or rebuilt. Copy an observation to keep it past the next step.
+
+With the placement action space an action places the piece with a rotation and x at once,
+indexed like vector_engine actions. With the keystroke action space the piece spawns at the
+top and is moved one key at a time like in TetrisApp.manual_run, there is no gravity so the
+piece only falls with the soft and hard drop keys.
+"""
+import numpy
+
+from tetris_dp import constants
+from tetris_dp import helpers
+from tetris_dp import pieces
+from tetris_dp import placements
+from tetris_dp import vector_engine
+
+PLACEMENT = 'placement'
+KEYSTROKE = 'keystroke'
+ACTION_MODES = (PLACEMENT, KEYSTROKE)
+# Keystroke actions
+LEFT, RIGHT, ROTATE, SOFT_DROP, HARD_DROP = range(5)
+KEYS = ('left', 'right', 'rotate', 'soft_drop', 'hard_drop')
+
+
+class TetrisEnv:
+    """Single game environment with reset and step.
+
+    step returns (observation, reward, done, info), the reward being the rows removed. The
+    game is started again as soon as it ends, so the observation returned with done is the
+    first of the next game and info holds the score and pieces of the one that ended. Games
+    can be capped with max_pieces.
+    """
+    def __init__(self, action_mode=PLACEMENT, seed=0,  # pylint: disable=too-many-arguments
+                 piece_mode=pieces.UNIFORM, board_size=(None, None), max_pieces=None):
+        if action_mode not in ACTION_MODES:
+            raise ValueError('Unknown action mode {!r}, expected one of {}'.format(
+                action_mode, ACTION_MODES))
+        self.action_mode = action_mode
+        self.game = vector_engine.VectorEngine(1, seed, piece_mode, board_size, max_pieces)
+        table = self.game.table
+        self.num_actions = len(KEYS) if action_mode == KEYSTROKE else table.mask.shape[1]
+        self._placements = placements.get_placements(self.game.cols)
+        self._piece_x = self._piece_y = self._rotation = 0
+        self.observation = {
+            'board': self.game.boards[0, :-1],
+            'piece': numpy.zeros(len(constants.TETRIS_SHAPES), dtype=numpy.uint8),
+            'features': numpy.zeros(table.mask.shape[1:] + (6,)),
+            'placement_mask': numpy.zeros(table.mask.shape[1], dtype=bool),
+            'action_mask': numpy.zeros(self.num_actions, dtype=bool),
+            'position': numpy.zeros(3, dtype=numpy.intp),
+        }
+        self._new_piece()
+
+    @property
+    def max_pieces(self):
+        """The number of pieces a game ends after, None for no limit."""
+        return self.game.max_pieces
+
+    def reset(self, seed=None):
+        """Start a new game, with seed or else the next unused seed, and get its observation."""
+        self.game.reset(seed)
+        self._new_piece()
+        return self.observation
+
+    def _shape_index(self):
+        """Get the shape index of the current piece."""
+        return int(self.game.shape_indexes[0])
+
+    def _placement(self, rotations=0):
+        """Get the placement entry of the current piece turned clockwise a number of times."""
+        shape_placements = self._placements[self._shape_index()]
+        return shape_placements[(self._rotation + rotations) % len(shape_placements)]
+
+    def _new_piece(self):
+        """Fill in the observation of a new piece."""
+        shape_index = self._shape_index()
+        self.observation['piece'][:] = 0
+        self.observation['piece'][shape_index] = 1
+        self.observation['features'][:] = self.game.afterstate_features()[0]
+        self.observation['placement_mask'][:] = self.game.table.mask[shape_index]
+        self._rotation = 0
+        self._piece_x = int(self.game.cols / 2 - len(constants.TETRIS_SHAPES[shape_index][0])/2)
+        self._piece_y = 0
+        self._update_keystroke_state()
+
+    def _update_keystroke_state(self):
+        """Fill in the position and the action mask for the current piece."""
+        self.observation['position'][:] = (self._piece_x, self._piece_y, self._rotation)
+        if self.action_mode == PLACEMENT:
+            self.observation['action_mask'][:] = self.observation['placement_mask']
+            return
+        action_mask = self.observation['action_mask']
+        action_mask[LEFT] = self._can_move(self._placement(), self._piece_x - 1)
+        action_mask[RIGHT] = self._can_move(self._placement(), self._piece_x + 1)
+        action_mask[ROTATE] = (self._placement(1) is not self._placement()
+                               and self._can_move(self._placement(1), self._piece_x))
+        action_mask[SOFT_DROP] = action_mask[HARD_DROP] = True
+
+    def _can_move(self, placement, new_x, new_y=None):
+        """Check if a placement fits on the board at new_x and new_y, the piece y by default.
+
+        Like TetrisEngine.move and rotate a piece can't leave the board or overlap it.
+        """
+        new_y = self._piece_y if new_y is None else new_y
+        return 0 <= new_x <= self.game.cols - len(placement.piece[0]) and \
+            not helpers.check_collision(self.game.boards[0], placement.piece, (new_x, new_y))
+
+    def _place(self, action, landing=None):
+        """Place the current piece with a placement action and get the step result."""
+        removed_rows, ended = self.game.step([action], None if landing is None else [landing])
+        info = {}
+        if ended[0]:
+            _, score, pieces_placed = self.game.finished[-1]
+            info = {'score': score, 'pieces': pieces_placed}
+        self._new_piece()
+        return self.observation, int(removed_rows[0]), bool(ended[0]), info
+
+    def step(self, action):
+        """Take an action and get (observation, reward, done, info)."""
+        if self.action_mode == PLACEMENT:
+            return self._place(action)
+        if action in (LEFT, RIGHT):
+            new_x = self._piece_x + (-1 if action == LEFT else 1)
+            if self._can_move(self._placement(), new_x):
+                self._piece_x = new_x
+        elif action == ROTATE:
+            if self._can_move(self._placement(1), self._piece_x):
+                self._rotation = (self._rotation + 1) % len(self._placements[self._shape_index()])
+        elif action in (SOFT_DROP, HARD_DROP):
+            new_y = self._piece_y + 1
+            while action == HARD_DROP and self._can_move(self._placement(), self._piece_x, new_y):
+                new_y += 1
+            if not self._can_move(self._placement(), self._piece_x, new_y):
+                # The piece locks one row above the first y it collides at, like TetrisEngine
+                return self._place(self.game.table.first_actions[self._shape_index()][
+                    self._rotation] + self._piece_x, new_y)
+            self._piece_y = new_y
+        else:
+            raise ValueError('Unknown keystroke action {!r}'.format(action))
+        self._update_keystroke_state()
+        return self.observation, 0, False, {}
@@ -0,0 +1,98 @@
+"""Expectimax lookahead player.
+
+Instead of sampling one random next piece like lookahead_player, every chance node averages
+the best cost over all seven shapes so the result is deterministic. The chance nodes below
+the root are spread over a process pool which lives for the whole session, boards are sent
+to it as tuples of bitboard row masks.
+"""
+import atexit
+import multiprocessing
+import os
+import time
+
+import numpy
+
+from tetris_dp import batch_evaluator
+from tetris_dp import constants
+from tetris_dp import instrumentation
+from tetris_dp import tetris_players
+
+# Number of pieces to look ahead after the current one
+EXPECTIMAX_DEPTH = 1
+# Number of worker processes, None uses every core and 1 searches in this process
+EXPECTIMAX_PROCESSES = None
+_POOL = None
+
+
+def start_pool(processes=None):
+    """Start the worker pool if it isn't running yet and return it."""
+    global _POOL  # pylint: disable=global-statement
+    if _POOL is None:
+        _POOL = multiprocessing.Pool(processes=processes or os.cpu_count())
+        atexit.register(close_pool)
+    return _POOL
+
+
+def close_pool():
+    """Stop the worker pool."""
+    global _POOL  # pylint: disable=global-statement
+    if _POOL is not None:
+        _POOL.terminate()
+        _POOL.join()
+        _POOL = None
+
+
+def _best_cost(board, piece, depth, weights):
+    """Get the lowest cost of placing a piece, looking depth more pieces ahead."""
+    _, costs, afterstates = batch_evaluator.evaluate_afterstates(board, piece, weights)
+    if depth:
+        costs = costs + numpy.array([_expected_cost(afterstate, depth - 1, weights)
+                                     for afterstate in afterstates])
+    return float(costs.min())
+
+
+def _expected_cost(board, depth, weights):
+    """Average the best cost over every shape which could come next."""
+    return sum(_best_cost(board, shape, depth, weights)
+               for shape in constants.TETRIS_SHAPES) / len(constants.TETRIS_SHAPES)
+
+
+def _chance_task(task):
+    """Worker entry point, get the best cost of one shape on a packed board and its seconds."""
+    start_time = time.perf_counter()
+    rows, shape_index, depth, weights = task
+    cost = _best_cost(batch_evaluator.unpack_board(rows), constants.TETRIS_SHAPES[shape_index],
+                      depth, weights)
+    return cost, time.perf_counter() - start_time
+
+
+def _expected_costs(afterstates, depth, weights, processes):
+    """Get the expected future cost of every afterstate, in parallel when there are workers."""
+    if processes == 1:
+        return numpy.array([_expected_cost(afterstate, depth, weights)
+                            for afterstate in afterstates])
+    tasks = [(batch_evaluator.pack_board(afterstate), shape_index, depth, weights)
+             for afterstate in afterstates
+             for shape_index in range(len(constants.TETRIS_SHAPES))]
+    timer = instrumentation.start_exclusive()
+    pool = start_pool(processes)
+    chunk_size = max(1, len(tasks) // (4 * (processes or os.cpu_count())))
+    costs, seconds = zip(*pool.map(_chance_task, tasks, chunksize=chunk_size))
+    if timer is not None:
+        # The workers search side by side, so their time is spread over the processes
+        instrumentation.add('chance_nodes', sum(seconds) / (processes or os.cpu_count()))
+    instrumentation.stop_exclusive('pool', timer)
+    return numpy.array(costs).reshape(len(afterstates), len(constants.TETRIS_SHAPES)).mean(axis=1)
+
+
+def expectimax_player(board, piece, depth=None):
+    """Player which returns the move with the lowest cost plus expected future cost."""
+    depth = EXPECTIMAX_DEPTH if depth is None else depth
+    processes = EXPECTIMAX_PROCESSES
+    if processes is None and os.cpu_count() == 1:
+        processes = 1
+    weights = list(tetris_players.DELLACHERIE_WEIGHTS)
+    moves, costs, afterstates = batch_evaluator.evaluate_afterstates(board, piece, weights)
+    if depth:
+        costs = costs + _expected_costs(afterstates, depth - 1, weights, processes)
+    return moves[batch_evaluator.last_argmin(costs)]
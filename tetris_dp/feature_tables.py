@@ -0,0 +1,114 @@
+"""Table driven Dellacherie board features.
+
+A row of a board cols wide has only 1 << cols occupancy patterns, so the row transitions and
+wells of every pattern are worked out once and then read from tables. The tables of the
+default width are built at import and the ones of other widths up to
+transposition.ROW_TABLE_MAX_COLS, the width the Zobrist row keys stop at too, the first time
+they are used. Holes and column transitions compare every row with its neighbour, so the rows
+are stacked into one integer and both come from a couple of shifts over the whole board
+instead of a loop over the rows. The features are the same as the ones of
+helpers.find_holes_and_wells.
+"""
+import array
+import itertools
+import sys
+
+from tetris_dp import constants
+from tetris_dp import transposition
+
+# (row bits, array typecode) to stack boards up to that wide in one integer, row y is at bit
+# y * row bits
+_STACK_TYPECODES = [(array.array(typecode).itemsize * 8, typecode)
+                    for typecode in ('B', 'H', 'I', 'Q')]
+_ROW_TABLES = {}
+_STACK_MASKS = {}
+_COLUMN_BITS = {}
+
+
+def popcount(mask):
+    """Count the set bits of a mask."""
+    return bin(mask).count('1')
+
+
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count  # pylint: disable=invalid-name
+
+
+def count_row_transitions(row, full_row):
+    """Count the filled cells next to empty cells in a single row, borders not included."""
+    return popcount((row ^ (row >> 1)) & (full_row >> 1))
+
+
+def count_row_wells(row, full_row):
+    """Count the empty cells in a row with filled cells or walls on both sides."""
+    left_filled = (row << 1) | 1
+    right_filled = (row >> 1) | ((full_row + 1) >> 1)
+    return popcount(~row & full_row & left_filled & right_filled)
+
+
+def row_tables(full_row):
+    """Get the (transitions, wells) tables of every row of a board, None if it is too wide."""
+    tables = _ROW_TABLES.get(full_row)
+    if tables is None and full_row.bit_length() <= transposition.ROW_TABLE_MAX_COLS:
+        tables = _ROW_TABLES[full_row] = (
+            [count_row_transitions(row, full_row) for row in range(full_row + 1)],
+            [count_row_wells(row, full_row) for row in range(full_row + 1)])
+    return tables
+
+
+def _stack_masks(full_row, height):
+    """Get the typecode, row bits and cell masks to stack a board, None if it is too wide.
+
+    The masks are every cell of the board and every cell but the ones of the last row.
+    """
+    key = (full_row, height)
+    masks = _STACK_MASKS.get(key)
+    if masks is None:
+        for row_bits, typecode in _STACK_TYPECODES:
+            if full_row.bit_length() <= row_bits:
+                cells = sum(full_row << (y_position * row_bits) for y_position in range(height))
+                masks = _STACK_MASKS[key] = (typecode, row_bits, cells, cells >> row_bits)
+                break
+    return masks
+
+
+def row_masks(board):
+    """Get the row masks of a list of lists board, every non zero cell counts as filled."""
+    cols = len(board[0])
+    column_bits = _COLUMN_BITS.get(cols)
+    if column_bits is None:
+        column_bits = _COLUMN_BITS[cols] = [1 << x_position for x_position in range(cols)]
+    return [sum(itertools.compress(column_bits, row)) for row in board]
+
+
+def find_holes_and_wells(rows, full_row=None):
+    """Get the holes, wells, row transitions and column transitions of a bitboard.
+
+    full_row is the mask of a full row, by default the sentinel floor of the board.
+    """
+    full_row = rows[-1] if full_row is None else full_row
+    tables = row_tables(full_row)
+    if tables is not None:
+        row_transitions = sum(map(tables[0].__getitem__, rows))
+        wells = sum(map(tables[1].__getitem__, rows))
+    else:
+        row_transitions = sum(count_row_transitions(row, full_row) for row in rows)
+        wells = sum(count_row_wells(row, full_row) for row in rows)
+    masks = _stack_masks(full_row, len(rows))
+    if masks is None:
+        holes = sum(popcount(~row & row_above & full_row)
+                    for row_above, row in zip(rows, rows[1:]))
+        column_transitions = sum(popcount(row ^ row_above)
+                                 for row_above, row in zip(rows, rows[1:]))
+        return holes, wells, row_transitions, column_transitions
+    typecode, row_bits, cells, upper_cells = masks
+    stack = array.array(typecode, rows)
+    if sys.byteorder == 'big':
+        stack.byteswap()
+    stacked = int.from_bytes(stack.tobytes(), 'little')
+    holes = popcount(~stacked & (stacked << row_bits) & cells)
+    column_transitions = popcount((stacked ^ (stacked >> row_bits)) & upper_cells)
+    return holes, wells, row_transitions, column_transitions
+
+
+row_tables((1 << constants.CONFIG['cols']) - 1)
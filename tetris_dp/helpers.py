@@ -1,5 +1,5 @@
 """Tetris player logic."""
-from tetris_dp import constants
+from tetris_dp import feature_tables
 
 
 def rotate_clockwise(piece):
@@ -24,7 +24,7 @@ def check_collision(board, piece, offset):
 def remove_row(board, row):
     """Remove a filled row from the board."""
     del board[row]
-    return [[0 for _ in range(constants.CONFIG['cols'])]] + board
+    return [[0 for _ in range(len(board[0]))]] + board
 
 
 def add_piece_to_board(board, piece, offset):
@@ -45,9 +45,8 @@ def get_interm_board(board, piece, offset):
     """
     off_x, off_y = offset
     removed_rows = 0
-    interm_board = [[board[y][x] for x in range(constants.CONFIG['cols'])]
-                    for y in range(constants.CONFIG['rows'])]
-    interm_board += [[1 for _ in range(constants.CONFIG['cols'])]]
+    interm_board = [row[:] for row in board[:-1]]
+    interm_board += [[1 for _ in range(len(board[0]))]]
     for row_index, row in enumerate(piece):
         for column_index, val in enumerate(row):
             y_offset = row_index + off_y - 1
@@ -106,44 +105,22 @@ def _find_holes_in_board(board, x_position, y_position, max_x, max_y):
     return found_hole
 
 
-def find_holes_and_wells(board):  # pylint: disable=too-many-branches
-    """Find number of empty cells with one covered cell above it."""
-    max_x = len(board[0])
-    max_y = len(board)
-    total_holes = 0
-    total_wells = 0
-    row_transitions = 0
-    column_transitions = 0
-    for x_position in range(0, max_x):
-        for y_position in range(0, max_y):
-            y_above = y_position - 1
-            filled = 0
-            x_offset = min(x_position + 1, max_x - 1)
-            y_offset = min(y_position + 1, max_y - 1)
-            if y_above < 0:
-                y_above = 0
-            plus_x = x_position + 1
-            minus_x = x_position - 1
-            if plus_x > max_x - 1:
-                plus_x = max_x - 1
-                filled += 1
-            if minus_x < 0:
-                minus_x = 0
-                filled += 1
-            if not board[y_position][x_position] and board[y_above][x_position]:
-                total_holes += 1
-            if not board[y_position][x_position] and board[y_position][plus_x]:
-                filled += 1
-            if not board[y_position][x_position] and board[y_position][minus_x]:
-                filled += 1
-            if filled >= 2:
-                total_wells += 1
-            if board[y_position][x_position] and not board[y_position][x_offset]:
-                row_transitions += 1
-            if not board[y_position][x_position] and board[y_position][x_offset]:
-                row_transitions += 1
-            if board[y_position][x_position] and not board[y_offset][x_position]:
-                column_transitions += 1
-            if not board[y_position][x_position] and board[y_offset][x_position]:
-                column_transitions += 1
-    return total_holes, total_wells, row_transitions, column_transitions
+def find_holes_and_wells(board):
+    """Find number of empty cells with one covered cell above it.
+
+    Returns the holes, wells, row transitions and column transitions, every non zero cell
+    counts as filled. The features come from the row masks of the board, see feature_tables.
+    """
+    return feature_tables.find_holes_and_wells(feature_tables.row_masks(board),
+                                               (1 << len(board[0])) - 1)
+
+
+def column_tops(board):
+    """Find the row index of the highest filled cell in every column."""
+    tops = []
+    for x_position in range(0, len(board[0])):
+        y_position = 0
+        while not board[y_position][x_position]:
+            y_position += 1
+        tops.append(y_position)
+    return tops
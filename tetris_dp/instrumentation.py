@@ -0,0 +1,192 @@
+"""Low overhead instrumentation and profiling hooks for the players.
+
+Instrumentation is off by default and every hook is then a single flag check. With ENABLED
+set the players record the time spent in each phase of a move along with counters such as
+candidates generated, afterstates evaluated, rows cleared and cache hits. end_move folds a
+move into the current game, which keeps per phase totals and log2 histograms of the time
+per move. Threads such as the lookahead ones record into the same move under a lock.
+
+Phases which other phases run inside, like the pool phases around the lookahead threads and
+the expectimax workers, are timed with start_exclusive and only get the time which none of
+the phases inside them recorded, so the phases of a move add up to its wall time and the pool
+phase is the overhead of the pool alone. Threads inside it may record more time than passed
+while they wait for each other, the phase then gets 0.
+"""
+import collections
+import contextlib
+import signal
+import threading
+import time
+
+ENABLED = False
+_MOVE_PHASES = collections.defaultdict(float)
+_MOVE_COUNTERS = collections.Counter()
+# Seconds recorded in every phase so far, exclusive phases take the part recorded inside them
+_RECORDED_SECONDS = [0.0]
+_LOCK = threading.Lock()
+
+
+class GameStats:
+    """Per phase timings and counters of the moves of a game."""
+    def __init__(self):
+        self.moves = 0
+        self.phase_totals = collections.defaultdict(float)
+        self.phase_histograms = collections.defaultdict(collections.Counter)
+        self.counters = collections.Counter()
+
+    def add_move(self, phases, counters):
+        """Add the phase timings and counters of a single move."""
+        self.moves += 1
+        for phase, seconds in phases.items():
+            self.phase_totals[phase] += seconds
+            self.phase_histograms[phase][_histogram_bucket(seconds)] += 1
+        self.counters.update(counters)
+
+    def summary(self):
+        """Get the stats as a dict which can be written as JSON.
+
+        Histogram keys are the upper bound of each bucket in microseconds.
+        """
+        phases = {}
+        for phase, total in self.phase_totals.items():
+            phases[phase] = {
+                'total_seconds': total,
+                'seconds_per_move': total / self.moves if self.moves else 0.0,
+                'histogram_us': {str(bucket): moves for bucket, moves
+                                 in sorted(self.phase_histograms[phase].items())}}
+        return {'moves': self.moves, 'phases': phases, 'counters': dict(self.counters)}
+
+
+_GAME = GameStats()
+
+
+def _histogram_bucket(seconds):
+    """Get the power of two bucket, in microseconds, a time falls in."""
+    return 1 << int(seconds * 1e6).bit_length()
+
+
+def enable():
+    """Turn instrumentation on and start a new game."""
+    global ENABLED  # pylint: disable=global-statement
+    ENABLED = True
+    reset()
+
+
+def disable():
+    """Turn instrumentation off."""
+    global ENABLED  # pylint: disable=global-statement
+    ENABLED = False
+
+
+def reset():
+    """Drop everything recorded and start a new game."""
+    global _GAME  # pylint: disable=global-statement
+    with _LOCK:
+        _GAME = GameStats()
+        _MOVE_PHASES.clear()
+        _MOVE_COUNTERS.clear()
+
+
+def start():
+    """Start timing a phase, returns None when instrumentation is off."""
+    return time.perf_counter() if ENABLED else None
+
+
+def stop(phase, start_time):
+    """Add the time since start_time to a phase of the current move."""
+    if start_time is not None:
+        add(phase, time.perf_counter() - start_time)
+
+
+def add(phase, seconds):
+    """Add seconds to a phase of the current move."""
+    with _LOCK:
+        _MOVE_PHASES[phase] += seconds
+        _RECORDED_SECONDS[0] += seconds
+
+
+def start_exclusive():
+    """Start timing a phase which other phases run inside, returns None when off."""
+    if not ENABLED:
+        return None
+    with _LOCK:
+        return time.perf_counter(), _RECORDED_SECONDS[0]
+
+
+def stop_exclusive(phase, timer):
+    """Add the time since start_exclusive less the time of the phases inside to a phase."""
+    if timer is not None:
+        start_time, recorded_seconds = timer
+        with _LOCK:
+            seconds = max(0.0, time.perf_counter() - start_time
+                          - (_RECORDED_SECONDS[0] - recorded_seconds))
+            _MOVE_PHASES[phase] += seconds
+            _RECORDED_SECONDS[0] += seconds
+
+
+def count(counter, amount=1):
+    """Add to a counter of the current move."""
+    if ENABLED:
+        with _LOCK:
+            _MOVE_COUNTERS[counter] += amount
+
+
+def end_move():
+    """Fold the current move into the game stats."""
+    if ENABLED:
+        with _LOCK:
+            _GAME.add_move(_MOVE_PHASES, _MOVE_COUNTERS)
+            _MOVE_PHASES.clear()
+            _MOVE_COUNTERS.clear()
+
+
+def game_summary():
+    """Get the stats of the current game, see GameStats.summary."""
+    return _GAME.summary()
+
+
+@contextlib.contextmanager
+def profiled(output_path=None, sort='cumulative', limit=30):
+    """Run the block under cProfile, dumping the stats to output_path or printing the top."""
+    # Imported here, pstats alone costs more at startup than the rest of the package
+    import cProfile  # pylint: disable=import-outside-toplevel
+    import pstats  # pylint: disable=import-outside-toplevel
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if output_path:
+            profiler.dump_stats(output_path)
+        else:
+            pstats.Stats(profiler).sort_stats(sort).print_stats(limit)
+
+
+@contextlib.contextmanager
+def sampled(interval=0.001):
+    """Sample the main thread's stack every interval seconds of CPU time while in the block.
+
+    Yields a Counter of 'file:line function' to the number of samples the function was on
+    the stack for. Uses SIGPROF so it only works on Unix and in the main thread, but unlike
+    cProfile it doesn't slow down the code being measured.
+    """
+    samples = collections.Counter()
+
+    def _take_sample(_, frame):
+        seen = set()
+        while frame is not None:
+            code = frame.f_code
+            name = '{}:{} {}'.format(code.co_filename, code.co_firstlineno, code.co_name)
+            if name not in seen:
+                seen.add(name)
+                samples[name] += 1
+            frame = frame.f_back
+
+    old_handler = signal.signal(signal.SIGPROF, _take_sample)
+    signal.setitimer(signal.ITIMER_PROF, interval, interval)
+    try:
+        yield samples
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, old_handler)
@@ -0,0 +1,326 @@
+"""Local best move server and its client.
+
+Tools which need moves connect to one server over a Unix socket or localhost TCP instead of
+each running their own search. Every query is a board, a piece, a player and a search depth
+in a small binary frame. The server answers every query which arrived in the same select
+round as one batch: repeated positions are answered from a cache shared by all the clients
+and the rest are searched together on a pool of warm worker processes, except for players
+in IN_PROCESS_PLAYERS which are quicker to search than to send to a worker. While a batch
+is searched new queries queue up on the sockets, so the busier the server the bigger the
+batches.
+
+Frames are a uint32 length followed by the payload. A query payload is the request id
+(uint32), the player index into PLAYER_NAMES, the depth, the shape index (uint8), rows and
+cols (uint16) and the board without its floor, one little endian row mask of (cols + 7) // 8
+bytes per row. An answer payload is the request id, a status byte, 0 for a move, and the x,
+y (int16) and rotation (uint8) of the move. A depth of 0 uses the player's default. Queries
+which can't be answered get BAD_QUERY, frames over MAX_FRAME_BYTES or too short to hold a
+request id close the connection.
+
+Usage: python -m tetris_dp.move_server --socket /tmp/tetris_dp.sock
+"""
+import argparse
+import multiprocessing
+import os
+import selectors
+import socket
+import struct
+import threading
+
+from tetris_dp import batch_runner
+from tetris_dp import bitboard
+from tetris_dp import constants
+from tetris_dp import placements
+from tetris_dp import transposition
+
+# Player index of the protocol -> player name, only ever append so old clients keep working
+PLAYER_NAMES = ('beam', 'expectimax', 'lookahead', 'single_stage', 'anytime')
+# Players which take a depth argument
+DEPTH_PLAYERS = ('beam', 'expectimax')
+# Players searched in the server process, sending them to the pool costs more than the search
+IN_PROCESS_PLAYERS = ('single_stage',)
+# Max answers kept in the shared cache before the least recently used are evicted
+CACHE_SIZE = 100000
+POLL_SECONDS = 0.5
+# Largest payload accepted, a 512 by 1000 board is a bit under 64 KiB
+MAX_FRAME_BYTES = 1 << 16
+OK = 0
+BAD_QUERY = 1
+
+_LENGTH = struct.Struct('<I')
+_REQUEST_ID = struct.Struct('<I')
+_QUERY = struct.Struct('<BBBHH')
+_ANSWER = struct.Struct('<BhhB')
+
+
+def encode_query(request_id, board, piece, player_name='single_stage', depth=0):
+    """Encode a query for the best move of a piece on a list of lists board as a frame."""
+    rows = len(board) - 1
+    cols = len(board[0])
+    row_bytes = (cols + 7) // 8
+    payload = (_REQUEST_ID.pack(request_id)
+               + _QUERY.pack(PLAYER_NAMES.index(player_name), depth,
+                             constants.TETRIS_SHAPES.index(piece), rows, cols)
+               + b''.join(mask.to_bytes(row_bytes, 'little')
+                          for mask in bitboard.from_board(board[:-1])))
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def decode_query(query):
+    """Get the (player name, depth, shape index, board) of a query without its request id."""
+    player_index, depth, shape_index, rows, cols = _QUERY.unpack_from(query)
+    row_bytes = (cols + 7) // 8
+    body = query[_QUERY.size:]
+    if len(body) != rows * row_bytes:
+        raise ValueError('Expected {} board bytes, got {}'.format(rows * row_bytes, len(body)))
+    board = [[(mask >> x_position) & 1 for x_position in range(cols)]
+             for mask in (int.from_bytes(body[row * row_bytes:(row + 1) * row_bytes], 'little')
+                          for row in range(rows))]
+    board.append([1] * cols)
+    return PLAYER_NAMES[player_index], depth, shape_index, board
+
+
+def is_valid_query(query):
+    """Check if a query without its request id has a header and a known player."""
+    return len(query) >= _QUERY.size and query[0] < len(PLAYER_NAMES)
+
+
+def search(query):
+    """Get the encoded answer to a query without its request id, BAD_QUERY if it fails."""
+    try:
+        player_name, depth, shape_index, board = decode_query(query)
+        player = batch_runner.get_player(player_name)
+        piece = constants.TETRIS_SHAPES[shape_index]
+        if depth and player_name in DEPTH_PLAYERS:
+            new_x, new_y, new_piece = player(board, piece, depth=depth)
+        else:
+            new_x, new_y, new_piece = player(board, piece)
+        shape_placements = placements.get_placements(len(board[0]))[shape_index]
+        rotation = [placement.piece for placement in shape_placements].index(new_piece)
+    except Exception:  # pylint: disable=broad-except
+        # A bad query or a player failing on it must not stop the server
+        return _ANSWER.pack(BAD_QUERY, 0, 0, 0)
+    return _ANSWER.pack(OK, new_x, new_y, rotation)
+
+
+def _listening_socket(address):
+    """Bind a socket to a Unix socket path or a (host, port) address."""
+    if isinstance(address, str):
+        if os.path.exists(address):
+            os.unlink(address)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(address)
+    listener.listen()
+    return listener
+
+
+class MoveServer:
+    """Answers move queries in batches from a shared cache and a worker pool.
+
+    address is a Unix socket path or a (host, port) pair. With processes 0 the queries are
+    searched in the server process.
+    """
+    def __init__(self, address, processes=None):
+        self.address = address
+        self.listener = _listening_socket(address)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.buffers = {}
+        self.processes = os.cpu_count() if processes is None else processes
+        self.pool = None
+        if self.processes:
+            self.pool = multiprocessing.Pool(self.processes, batch_runner.init_worker)
+        self.cache = transposition.TranspositionTable(CACHE_SIZE)
+        self.stats = {'queries': 0, 'batches': 0, 'searched': 0}
+        self._running = threading.Event()
+
+    def serve_forever(self):
+        """Answer queries until shutdown is called."""
+        self._running.set()
+        while self._running.is_set():
+            pending = []
+            for key, _ in self.selector.select(POLL_SECONDS):
+                if key.fileobj is self.listener:
+                    connection, _ = self.listener.accept()
+                    self.buffers[connection] = bytearray()
+                    self.selector.register(connection, selectors.EVENT_READ)
+                else:
+                    pending.extend(self._read(key.fileobj))
+            if pending:
+                self._answer(pending)
+
+    def _read(self, connection):
+        """Read from a connection and get (connection, payload) of every complete frame."""
+        try:
+            data = connection.recv(1 << 16)
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(connection)
+            return []
+        buffer = self.buffers[connection]
+        buffer += data
+        frames = []
+        while len(buffer) >= _LENGTH.size:
+            length = _LENGTH.unpack_from(buffer)[0]
+            if not _REQUEST_ID.size <= length <= MAX_FRAME_BYTES:
+                self._drop(connection)
+                return []
+            if len(buffer) < _LENGTH.size + length:
+                break
+            frames.append((connection, bytes(buffer[_LENGTH.size:_LENGTH.size + length])))
+            del buffer[:_LENGTH.size + length]
+        return frames
+
+    def _drop(self, connection):
+        """Stop listening to a closed connection."""
+        self.selector.unregister(connection)
+        del self.buffers[connection]
+        connection.close()
+
+    def _answer(self, pending):
+        """Answer a batch of queries, searching each distinct uncached query once."""
+        answers = {}
+        for _, payload in pending:
+            query = payload[_REQUEST_ID.size:]
+            if query not in answers:
+                answers[query] = (self.cache.get(query) if is_valid_query(query)
+                                  else _ANSWER.pack(BAD_QUERY, 0, 0, 0))
+        to_search = [query for query, answer in answers.items() if answer is None]
+        pooled = []
+        for query in to_search:
+            if self.pool is None or PLAYER_NAMES[query[0]] in IN_PROCESS_PLAYERS:
+                answers[query] = search(query)
+            else:
+                pooled.append(query)
+        if pooled:
+            chunk_size = max(1, len(pooled) // self.processes)
+            for query, answer in zip(pooled, self.pool.map(search, pooled, chunk_size)):
+                answers[query] = answer
+        for query in to_search:
+            self.cache.put(query, answers[query])
+        self.stats['queries'] += len(pending)
+        self.stats['batches'] += 1
+        self.stats['searched'] += len(to_search)
+
+        frames = {}
+        for connection, payload in pending:
+            answer = payload[:_REQUEST_ID.size] + answers[payload[_REQUEST_ID.size:]]
+            frames.setdefault(connection, []).append(_LENGTH.pack(len(answer)) + answer)
+        for connection, connection_frames in frames.items():
+            try:
+                connection.sendall(b''.join(connection_frames))
+            except OSError:
+                if connection in self.buffers:
+                    self._drop(connection)
+
+    def shutdown(self):
+        """Make serve_forever return after the current round."""
+        self._running.clear()
+
+    def close(self):
+        """Close every connection, the listener and the worker pool."""
+        for connection in list(self.buffers):
+            self._drop(connection)
+        self.selector.close()
+        self.listener.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+
+
+class MoveClient:
+    """Connection to a move server, safe to share between threads."""
+    def __init__(self, address):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.connection = socket.socket(family, socket.SOCK_STREAM)
+        self.connection.connect(address)
+        if family == socket.AF_INET:
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._buffer = bytearray()
+
+    def _read_frame(self):
+        """Read the next frame's payload."""
+        while True:
+            if len(self._buffer) >= _LENGTH.size:
+                length = _LENGTH.unpack_from(self._buffer)[0]
+                if len(self._buffer) >= _LENGTH.size + length:
+                    payload = bytes(self._buffer[_LENGTH.size:_LENGTH.size + length])
+                    del self._buffer[:_LENGTH.size + length]
+                    return payload
+            data = self.connection.recv(1 << 16)
+            if not data:
+                raise ConnectionError('The move server closed the connection')
+            self._buffer += data
+
+    def best_moves(self, positions, player_name='single_stage', depth=0):
+        """Get the (x, y, piece) move of every (board, piece) position.
+
+        All the queries are sent before any answer is read so the server can batch them.
+        """
+        with self._lock:
+            first_id = self._next_id
+            self._next_id += len(positions)
+            self.connection.sendall(b''.join(
+                encode_query((first_id + index) & 0xFFFFFFFF, board, piece, player_name, depth)
+                for index, (board, piece) in enumerate(positions)))
+            answers = [self._read_frame() for _ in positions]
+        moves = []
+        for (board, piece), answer in zip(positions, answers):
+            status, new_x, new_y, rotation = _ANSWER.unpack_from(answer, _REQUEST_ID.size)
+            if status != OK:
+                raise ValueError('The move server could not answer the query')
+            shape_placements = placements.get_placements(len(board[0]))[
+                constants.TETRIS_SHAPES.index(piece)]
+            moves.append((new_x, new_y, shape_placements[rotation].piece))
+        return moves
+
+    def best_move(self, board, piece, player_name='single_stage', depth=0):
+        """Get the (x, y, piece) move of a piece on a board."""
+        return self.best_moves([(board, piece)], player_name, depth)[0]
+
+    def close(self):
+        """Close the connection."""
+        self.connection.close()
+
+
+def remote_player(address, player_name='single_stage', depth=0):
+    """Get a player which asks a move server, it can be given to TetrisApp or TetrisEngine."""
+    client = MoveClient(address)
+
+    def player(board, piece):
+        """Ask the move server for the move."""
+        return client.best_move(board, piece, player_name, depth)
+    return player
+
+
+def main(argv=None):
+    """Run a move server from the command line until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--socket', default=None, help='Unix socket path to listen on')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None, help='TCP port to listen on')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args(argv)
+    if args.socket is None and args.port is None:
+        parser.error('one of --socket or --port is required')
+    server = MoveServer(args.socket or (args.host, args.port), args.processes)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        print('Answered {queries} queries in {batches} batches, searched {searched}.'.format(
+            **server.stats))
+
+
+if __name__ == '__main__':
+    main()
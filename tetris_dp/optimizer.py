@@ -0,0 +1,164 @@
+"""Tune the Dellacherie weights with the noisy cross-entropy method.
+
+Every generation samples a population of weight vectors around the current mean, plays
+each of them on the same seeded games across a process pool and refits the mean and
+standard deviation to the best candidates. A little noise is added to the variance so
+the search doesn't collapse too early, see ref #3 in
+tetris_players._calculate_dellacheries_cost. Games are capped at max_pieces so strong
+candidates finish, and the state is saved after every generation so a run can be resumed.
+The mean of the last generation is the tuned weight vector.
+
+Usage: python -m tetris_dp.optimizer --generations 50 --checkpoint cem.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+
+import numpy
+
+from tetris_dp import batch_runner
+from tetris_dp import engine
+from tetris_dp import pieces
+from tetris_dp import tetris_players
+
+POPULATION_SIZE = 50
+ELITE_FRACTION = 0.2
+GAMES_PER_CANDIDATE = 5
+MAX_PIECES = 1000
+INITIAL_STD = 5.0
+# Extra variance added each generation, it decays as max(0, NOISE - generation * NOISE_DECAY)
+NOISE = 5.0
+NOISE_DECAY = 0.1
+
+
+def load_weights(path):
+    """Read weights from a JSON list or from the mean of an optimizer checkpoint."""
+    with open(path, encoding='utf-8') as weights_file:
+        weights = json.load(weights_file)
+    if isinstance(weights, dict):
+        weights = weights['mean']
+    return [float(weight) for weight in weights]
+
+
+def _play_candidate(task):
+    """Play one seeded game with a candidate's weights and return its score."""
+    player_name, weights, seed, max_pieces, piece_mode = task
+    tetris_players.set_weights(weights)
+    game = engine.TetrisEngine(seed, piece_mode)
+    return game.play(batch_runner.get_player(player_name), max_pieces)
+
+
+def evaluate_population(pool, processes, population, seeds, settings):
+    """Get the mean score of every candidate over the same seeded games.
+
+    Tasks are ordered by candidate so a worker rarely has to clear its caches for new weights.
+    """
+    player_name, max_pieces, piece_mode = settings
+    tasks = [(player_name, weights, seed, max_pieces, piece_mode)
+             for weights in population.tolist() for seed in seeds]
+    chunk_size = max(1, min(len(seeds), len(tasks) // (4 * processes)))
+    scores = pool.map(_play_candidate, tasks, chunksize=chunk_size)
+    return numpy.array(scores, dtype=float).reshape(len(population), len(seeds)).mean(axis=1)
+
+
+def new_state(initial_weights, seed=0):
+    """Get the optimizer state before the first generation, seed picks the populations."""
+    return {'generation': 0, 'seed': seed, 'mean': list(initial_weights),
+            'std': [INITIAL_STD] * len(initial_weights), 'history': []}
+
+
+def read_checkpoint(path):
+    """Read the optimizer state saved after the last finished generation."""
+    with open(path, encoding='utf-8') as checkpoint_file:
+        return json.load(checkpoint_file)
+
+
+def write_checkpoint(path, state):
+    """Save the optimizer state, the old checkpoint is only replaced once the write is done."""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as checkpoint_file:
+        json.dump(state, checkpoint_file, indent=2)
+    os.replace(temp_path, path)
+
+
+def run_generation(pool, processes, state, seeds, settings):
+    """Sample, evaluate and refit one generation, updating state in place.
+
+    The population is sampled from a generator seeded with the seed of the run and the
+    generation so a resumed run carries on exactly as if it had never stopped.
+    """
+    generation = state['generation']
+    rng = numpy.random.default_rng([state['seed'], generation])
+    mean = numpy.array(state['mean'])
+    std = numpy.array(state['std'])
+    population = rng.normal(mean, std, size=(POPULATION_SIZE, len(mean)))
+    scores = evaluate_population(pool, processes, population, seeds, settings)
+
+    elite_count = max(1, int(POPULATION_SIZE * ELITE_FRACTION))
+    elite_indexes = numpy.argsort(scores)[::-1][:elite_count]
+    elite = population[elite_indexes]
+    noise = max(0.0, NOISE - generation * NOISE_DECAY)
+    state['mean'] = elite.mean(axis=0).tolist()
+    state['std'] = numpy.sqrt(elite.var(axis=0) + noise).tolist()
+    state['history'].append({'generation': generation, 'best': float(scores.max()),
+                             'elite_mean': float(scores[elite_indexes].mean()),
+                             'mean': float(scores.mean()),
+                             'best_weights': population[elite_indexes[0]].tolist()})
+    state['generation'] = generation + 1
+    return state
+
+
+def optimize(checkpoint_path, generations, settings,  # pylint: disable=too-many-arguments
+             first_seed=0, processes=None, *, seed=0):
+    """Run generations of the cross-entropy method, resuming from checkpoint_path if it exists.
+
+    Generation g plays the seeds first_seed + g * GAMES_PER_CANDIDATE onwards so every
+    candidate of a generation sees the same pieces but generations don't overfit one set.
+    seed picks the populations sampled, a resumed run keeps the seed it was started with.
+    """
+    if os.path.exists(checkpoint_path):
+        state = read_checkpoint(checkpoint_path)
+        print('Resuming from generation {} of {}.'.format(state['generation'], checkpoint_path))
+    else:
+        state = new_state(tetris_players.DELLACHERIE_WEIGHTS, seed)
+    processes = processes or os.cpu_count()
+    pool = multiprocessing.Pool(processes, batch_runner.init_worker)
+    try:
+        while state['generation'] < generations:
+            first_game = first_seed + state['generation'] * GAMES_PER_CANDIDATE
+            seeds = range(first_game, first_game + GAMES_PER_CANDIDATE)
+            run_generation(pool, processes, state, seeds, settings)
+            write_checkpoint(checkpoint_path, state)
+            last = state['history'][-1]
+            print('Generation {}: best {:.1f}, elite mean {:.1f}, mean {:.1f}'.format(
+                last['generation'], last['best'], last['elite_mean'], last['mean']))
+            print('  mean weights {}'.format(
+                ', '.join('{:.3f}'.format(weight) for weight in state['mean'])))
+    finally:
+        pool.terminate()
+        pool.join()
+    return state
+
+
+def main(argv=None):
+    """Run the optimizer from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--generations', type=int, default=50)
+    parser.add_argument('--checkpoint', default='cem_checkpoint.json')
+    parser.add_argument('--player', choices=sorted(batch_runner.PLAYERS), default='single_stage')
+    parser.add_argument('--max-pieces', type=int, default=MAX_PIECES)
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--piece-mode', choices=pieces.PIECE_MODES, default=pieces.UNIFORM)
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the populations sampled, kept when resuming')
+    args = parser.parse_args(argv)
+    state = optimize(args.checkpoint, args.generations,
+                     (args.player, args.max_pieces, args.piece_mode),
+                     args.first_seed, args.processes, seed=args.seed)
+    print('Tuned weights {}'.format(state['mean']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Copy on write version of the board helpers for search.
+
+A persistent board is a tuple of row tuples, the last row being the filled sentinel floor
+like in the boards made by TetrisApp.new_board. Rows are never changed once made, so a board
+made from another one shares every row the piece did not touch: placing a piece copies only
+the rows under the piece and clearing lines only rearranges row references, every cleared
+line adding the same shared empty row at the top. A search node then costs a tuple of row
+references instead of a full board copy, and siblings share most of their rows.
+
+Persistent boards read like list of lists boards, so the read only helpers work on them
+unchanged. get_interm_board and add_piece_to_board return new boards instead of changing the
+one given, otherwise they work like the ones in helpers.
+"""
+from tetris_dp import helpers
+
+check_collision = helpers.check_collision
+column_tops = helpers.column_tops
+find_holes_and_wells = helpers.find_holes_and_wells
+_EMPTY_ROWS = {}
+
+
+def empty_row(cols):
+    """Get the empty row shared by every board cols wide."""
+    row = _EMPTY_ROWS.get(cols)
+    if row is None:
+        row = _EMPTY_ROWS[cols] = (0,) * cols
+    return row
+
+
+def from_board(board):
+    """Convert a list of lists board into a persistent board."""
+    return tuple(map(tuple, board))
+
+
+def to_board(board):
+    """Convert a persistent board into a list of lists board."""
+    return [list(row) for row in board]
+
+
+def _add_piece(rows, piece, offset, mark_overlaps):
+    """Add a piece to a list of row references and get the indexes of the rows it changed.
+
+    Only the changed rows are copied. With mark_overlaps cells which overlap the board are
+    marked -1 on the top row like helpers.get_interm_board.
+    """
+    off_x, off_y = offset
+    changed = {}
+    for row_index, piece_row in enumerate(piece):
+        # A negative y is the sentinel row, like indexing a list of lists board
+        y_offset = (row_index + off_y - 1) % len(rows)
+        for column_index, val in enumerate(piece_row):
+            if not val:
+                continue
+            x_offset = column_index + off_x
+            if mark_overlaps and rows[y_offset][x_offset]:
+                y_changed = 0
+                new_val = -1
+            else:
+                y_changed = y_offset
+                new_val = rows[y_offset][x_offset] + val
+            row = changed.get(y_changed)
+            if row is None:
+                row = changed[y_changed] = list(rows[y_changed])
+                rows[y_changed] = row
+            row[x_offset] = new_val
+    for y_position, row in changed.items():
+        rows[y_position] = tuple(row)
+    return changed
+
+
+def add_piece_to_board(board, piece, offset):
+    """Get a new board with the piece added at the given position."""
+    rows = list(board)
+    _add_piece(rows, piece, offset, False)
+    return tuple(rows)
+
+
+def get_interm_board(board, piece, offset):
+    """Get a new board with the piece added and full rows removed for cost evaluation.
+
+    Returns the board and the rows removed. Only rows the piece changed are checked for full
+    rows, the boards searched never hold full rows before a piece is added.
+    """
+    rows = list(board)
+    changed = _add_piece(rows, piece, offset, True)
+    floor = len(rows) - 1
+    full_rows = [y_position for y_position in changed
+                 if y_position != floor and 0 not in rows[y_position]]
+    if full_rows:
+        for y_position in sorted(full_rows, reverse=True):
+            del rows[y_position]
+        rows[:0] = [empty_row(len(rows[0]))] * len(full_rows)
+    return tuple(rows), len(full_rows)
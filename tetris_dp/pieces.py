@@ -0,0 +1,40 @@
+"""Seeded piece generators.
+
+Every game draws its pieces from its own generator so the same seed always gives the same
+piece stream. Pieces are drawn uniformly at random or from shuffled bags of all seven shapes.
+"""
+import random
+
+from tetris_dp import constants
+
+UNIFORM = 'uniform'
+BAG = 'bag'
+PIECE_MODES = (UNIFORM, BAG)
+
+
+class PieceGenerator:
+    """Stream of shape indexes into TETRIS_SHAPES."""
+    def __init__(self, seed, mode=UNIFORM):
+        if mode not in PIECE_MODES:
+            raise ValueError('Unknown piece mode {!r}, expected one of {}'.format(
+                mode, PIECE_MODES))
+        self.seed = seed
+        self.mode = mode
+        self.rng = random.Random(seed)
+        self.bag = []
+
+    def next_index(self):
+        """Get the index of the next shape."""
+        if self.mode == BAG:
+            if not self.bag:
+                self.bag = list(range(len(constants.TETRIS_SHAPES)))
+                self.rng.shuffle(self.bag)
+            return self.bag.pop()
+        return self.rng.randrange(len(constants.TETRIS_SHAPES))
+
+    def clone(self):
+        """Copy the generator, the copy gives the same pieces from here on."""
+        generator_copy = PieceGenerator(self.seed, self.mode)
+        generator_copy.rng.setstate(self.rng.getstate())
+        generator_copy.bag = self.bag[:]
+        return generator_copy
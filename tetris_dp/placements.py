@@ -0,0 +1,115 @@
+"""Placement tables for every shape and rotation.
+
+The tables are built once for every board width so the players don't rotate pieces or step
+them down the board one row at a time for every move they look at.
+"""
+import collections
+
+from tetris_dp import bitboard
+from tetris_dp import constants
+from tetris_dp import helpers
+
+Placement = collections.namedtuple('Placement',
+                                   ['piece', 'masks', 'cells', 'bottom', 'x_range'])
+
+
+def _build_placement(piece, cols):
+    """Build the placement entry for a single rotated piece on a board cols wide."""
+    bottom = []
+    for column_index in range(0, len(piece[0])):
+        bottom.append(max(row_index for row_index, row in enumerate(piece)
+                          if row[column_index]))
+    cells = tuple((row_index, column_index) for row_index, row in enumerate(piece)
+                  for column_index, cell in enumerate(row) if cell)
+    x_range = range(0, cols - len(piece[0]) + 1)
+    return Placement(piece, bitboard.piece_masks(piece), cells, tuple(bottom), x_range)
+
+
+def _build_placements(cols):
+    """Build the placement entries for every rotation of every shape."""
+    all_placements = []
+    for shape_index, shape in enumerate(constants.TETRIS_SHAPES):
+        shape_placements = []
+        piece = shape
+        for rotation in range(0, constants.SHAPE_TO_ROTATION[shape_index]):
+            if rotation:
+                piece = helpers.rotate_clockwise(piece)
+            shape_placements.append(_build_placement(piece, cols))
+        all_placements.append(shape_placements)
+    return all_placements
+
+
+PLACEMENTS = _build_placements(constants.CONFIG['cols'])
+_PLACEMENTS_BY_COLS = {constants.CONFIG['cols']: PLACEMENTS}
+
+
+def get_placements(cols):
+    """Get the placement tables of a board cols wide, indexed by shape and rotation."""
+    all_placements = _PLACEMENTS_BY_COLS.get(cols)
+    if all_placements is None:
+        all_placements = _PLACEMENTS_BY_COLS[cols] = _build_placements(cols)
+    return all_placements
+
+
+def landing_y(engine, board, tops, placement, off_x):
+    """Find the first row offset where the placement collides when dropped at off_x.
+
+    This is the same offset found by stepping the piece down with check_collision. It comes
+    straight from the column tops unless the stack is higher than the piece is tall, then the
+    piece could slide under an overhang on the way down so it is stepped down like before.
+    """
+    off_y = min(tops[off_x + column_index] - bottom
+                for column_index, bottom in enumerate(placement.bottom))
+    if off_y < 0:
+        off_y = 0
+        while not engine.check_collision(board, placement.piece, (off_x, off_y)):
+            off_y += 1
+    return off_y
+
+
+def landing_placements(engine, board, tops, shape_index):
+    """Get (placement, x, landing y) of every move of a shape, in placement table order."""
+    moves = []
+    for placement in get_placements(len(tops))[shape_index]:
+        for off_x in placement.x_range:
+            off_y = min(tops[off_x + column_index] - bottom
+                        for column_index, bottom in enumerate(placement.bottom))
+            if off_y < 0:
+                off_y = landing_y(engine, board, tops, placement, off_x)
+            moves.append((placement, off_x, off_y))
+    return moves
+
+
+def move_code_bytes(cols):
+    """Get the bytes of the move code of a board cols wide, one byte fits 64 columns."""
+    if cols <= 64:
+        return 1
+    if cols <= 1 << 14:
+        return 2
+    raise ValueError('Boards wider than {} columns can not be recorded, got {}'.format(
+        1 << 14, cols))
+
+
+def move_x_bits(cols):
+    """Get the bits of x in the move code of a board cols wide, the rotation takes two more."""
+    return move_code_bytes(cols) * 8 - 2
+
+
+def move_code(shape_index, move, x_bits=6):
+    """Encode an (x, y, piece) move as an int, the rotation above bit x_bits and x below it.
+
+    Six bits of x fit boards up to 64 columns wide in one byte, see move_x_bits.
+    """
+    new_x, _, piece = move
+    if not 0 <= new_x < 1 << x_bits:
+        raise ValueError('x {} does not fit in {} bits'.format(new_x, x_bits))
+    for rotation, placement in enumerate(PLACEMENTS[shape_index]):
+        if placement.piece == piece:
+            return rotation << x_bits | new_x
+    raise ValueError('Piece {} is not a rotation of shape {}'.format(piece, shape_index))
+
+
+def decode_move(shape_index, code, cols=None, x_bits=6):
+    """Get the placement entry for a board cols wide and the x of a move from move_code."""
+    all_placements = PLACEMENTS if cols is None else get_placements(cols)
+    return all_placements[shape_index][code >> x_bits], code & ((1 << x_bits) - 1)
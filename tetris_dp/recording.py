@@ -0,0 +1,88 @@
+"""Compact binary game recordings.
+
+A recording is the seed, piece mode and board size of a game plus a move code per placement
+holding the rotation and column of the move, see placements.move_code. Codes are one byte
+on boards up to 64 columns wide and two little endian bytes on wider ones. The pieces come back
+from the seed and the landing rows from the board, so replaying rebuilds every board of the
+game. Moves are replayed as straight drops, pieces slid under overhangs by hand won't replay.
+
+File layout, repeated for every recording in the file:
+    magic b'TDPR', version byte, piece mode byte, seed (uint64), rows (uint16), cols (uint16),
+    move count (uint32), moves
+"""
+import struct
+
+from tetris_dp import constants
+from tetris_dp import engine
+from tetris_dp import helpers
+from tetris_dp import pieces
+from tetris_dp import placements
+
+MAGIC = b'TDPR'
+VERSION = 1
+_HEADER = struct.Struct('<4sBBQHHI')
+
+
+class Recording:
+    """Seed, piece mode, board size and move codes of a single game."""
+    def __init__(self, seed, piece_mode, moves, board_size=None):
+        self.seed = seed
+        self.piece_mode = piece_mode
+        self.moves = bytes(moves)
+        self.board_size = board_size or (constants.CONFIG['rows'], constants.CONFIG['cols'])
+
+    @classmethod
+    def from_engine(cls, game):
+        """Get the recording of a game played with a TetrisEngine."""
+        return cls(game.seed, game.pieces.mode, game.move_codes, (game.rows, game.cols))
+
+    def move_codes(self):
+        """Get the move code of every placement."""
+        code_bytes = placements.move_code_bytes(self.board_size[1])
+        return [int.from_bytes(self.moves[offset:offset + code_bytes], 'little')
+                for offset in range(0, len(self.moves), code_bytes)]
+
+    def to_bytes(self):
+        """Encode the recording."""
+        header = _HEADER.pack(MAGIC, VERSION, pieces.PIECE_MODES.index(self.piece_mode),
+                              self.seed, self.board_size[0], self.board_size[1],
+                              len(self.moves) // placements.move_code_bytes(self.board_size[1]))
+        return header + self.moves
+
+
+def write_recordings(path, recordings):
+    """Append recordings to a file with a single write."""
+    with open(path, 'ab') as recording_file:
+        recording_file.write(b''.join(recording.to_bytes() for recording in recordings))
+
+
+def read_recordings(path):
+    """Read every recording in a file."""
+    with open(path, 'rb') as recording_file:
+        data = recording_file.read()
+    recordings = []
+    offset = 0
+    while offset < len(data):
+        magic, version, mode_index, seed, rows, cols, move_count = _HEADER.unpack_from(
+            data, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a version {} recording file'.format(path, VERSION))
+        offset += _HEADER.size
+        move_count *= placements.move_code_bytes(cols)
+        recordings.append(Recording(seed, pieces.PIECE_MODES[mode_index],
+                                    data[offset:offset + move_count], (rows, cols)))
+        offset += move_count
+    return recordings
+
+
+def replay(recording):
+    """Replay a recording headless, yielding the engine after every placement."""
+    rows, cols = recording.board_size
+    game = engine.TetrisEngine(recording.seed, recording.piece_mode, rows, cols)
+    x_bits = placements.move_x_bits(cols)
+    for code in recording.move_codes():
+        placement, new_x = placements.decode_move(game.shape_index, code, cols, x_bits)
+        tops = helpers.column_tops(game.board)
+        new_y = placements.landing_y(helpers, game.board, tops, placement, new_x)
+        game.step((new_x, new_y, placement.piece))
+        yield game
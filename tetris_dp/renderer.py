@@ -0,0 +1,120 @@
+"""Dirty rectangle rendering of the tetris board.
+
+Fonts are loaded once and every color in COLORS is pre-rendered into a cell surface. Each
+frame the board and falling piece are flattened into a grid of color indexes and only the
+cells which differ from the last frame are blitted, the rectangles they cover are returned
+so only they need to be pushed to the display.
+"""
+import pygame
+
+from tetris_dp import constants
+
+SCORE_FONT_SIZE = 18
+MESSAGE_FONT_SIZE = 12
+TEXT_COLOR = (255, 255, 255)
+
+
+class BoardRenderer:
+    """Draws frames of a game on a screen, only redrawing what changed."""
+    def __init__(self, screen):
+        self.screen = screen
+        self.cell_size = constants.CONFIG['cell_size']
+        self.cell_surfaces = []
+        for color in constants.COLORS:
+            cell_surface = pygame.Surface((self.cell_size, self.cell_size)).convert()
+            cell_surface.fill(color)
+            self.cell_surfaces.append(cell_surface)
+        self.score_font = pygame.font.Font(pygame.font.match_font('arial'), SCORE_FONT_SIZE)
+        self.message_font = pygame.font.Font(pygame.font.get_default_font(), MESSAGE_FONT_SIZE)
+        self._frame = None
+        self._score = None
+        self._score_surface = None
+        self._score_rect = None
+        self._overlay_rect = None
+
+    def invalidate(self):
+        """Redraw every cell on the next frame."""
+        self._frame = None
+
+    def _compose(self, board, piece, offset):
+        """Get the color index of every visible cell with the piece drawn over the board."""
+        frame = [list(row) for row in board[:-1]]
+        off_x, off_y = offset
+        for y_position, row in enumerate(piece):
+            for x_position, val in enumerate(row):
+                if val and 0 <= off_y + y_position < len(frame):
+                    frame[off_y + y_position][off_x + x_position] = val
+        return frame
+
+    def _cells_under(self, rect):
+        """Get the (x, y) of every cell a screen rectangle overlaps."""
+        first_x = max(0, rect.left // self.cell_size)
+        first_y = max(0, rect.top // self.cell_size)
+        last_x = min(constants.CONFIG['cols'] - 1, (rect.right - 1) // self.cell_size)
+        last_y = min(constants.CONFIG['rows'] - 1, (rect.bottom - 1) // self.cell_size)
+        return [(x_position, y_position) for y_position in range(first_y, last_y + 1)
+                for x_position in range(first_x, last_x + 1)]
+
+    def draw(self, board, piece, offset, score):
+        """Draw a frame and return the rectangles of the screen which changed."""
+        frame = self._compose(board, piece, offset)
+        changed = set()
+        for y_position, row in enumerate(frame):
+            if self._frame is not None and row == self._frame[y_position]:
+                continue
+            for x_position, val in enumerate(row):
+                if self._frame is None or val != self._frame[y_position][x_position]:
+                    changed.add((x_position, y_position))
+        if self._overlay_rect is not None:
+            changed.update(self._cells_under(self._overlay_rect))
+            self._overlay_rect = None
+        # The score is drawn over the cells, the cells under it are redrawn first
+        if score != self._score:
+            if self._score_rect is not None:
+                changed.update(self._cells_under(self._score_rect))
+            self._render_score(score)
+            changed.update(self._cells_under(self._score_rect))
+        elif changed:
+            changed.update(self._cells_under(self._score_rect))
+
+        dirty_rects = []
+        for x_position, y_position in changed:
+            dirty_rects.append(self.screen.blit(
+                self.cell_surfaces[frame[y_position][x_position]],
+                (x_position * self.cell_size, y_position * self.cell_size)))
+        if dirty_rects:
+            self.screen.blit(self._score_surface, self._score_rect)
+        self._frame = frame
+        return dirty_rects
+
+    def _render_score(self, score):
+        """Render the score text, only done when the score changes."""
+        self._score = score
+        self._score_surface = self.score_font.render(str(score), True, TEXT_COLOR)
+        self._score_rect = self._score_surface.get_rect()
+        self._score_rect.midtop = (self.cell_size * constants.CONFIG['rows'] / 20, 10)
+
+    def overlay(self, text):
+        """Draw a line of text over the bottom of the board until the next frame.
+
+        Returns the rectangle it covers, the cells under it are restored by the next draw.
+        """
+        text_image = self.message_font.render(text, False, TEXT_COLOR, constants.COLORS[0])
+        text_rect = text_image.get_rect()
+        width, height = self.screen.get_size()
+        text_rect.midbottom = (width // 2, height - 10)
+        self.screen.blit(text_image, text_rect)
+        self._overlay_rect = text_rect
+        return text_rect
+
+    def message(self, msg):
+        """Clear the screen, draw a centered message and return the whole screen rectangle."""
+        self.screen.fill(constants.COLORS[0])
+        width, height = self.screen.get_size()
+        for i, line in enumerate(msg.splitlines()):
+            msg_image = self.message_font.render(line, False, TEXT_COLOR, constants.COLORS[0])
+            msgim_center_x, msgim_center_y = msg_image.get_size()
+            self.screen.blit(msg_image, (width // 2 - msgim_center_x // 2,
+                                         height // 2 - msgim_center_y // 2 + i * 22))
+        self.invalidate()
+        return [self.screen.get_rect()]
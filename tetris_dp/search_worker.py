@@ -0,0 +1,52 @@
+"""Run a player's search on a background thread.
+
+The visual mode asks the worker for the move of a position and polls it every frame, so a
+slow search never blocks event handling or drawing. Positions are keyed by the number of
+pieces placed, which lets the move for the next piece be requested from a clone of the game
+while the current piece is still falling.
+"""
+import time
+from multiprocessing.pool import ThreadPool
+
+
+class SearchWorker:
+    """Computes player moves on one background thread."""
+    def __init__(self, player):
+        self.player = player
+        self._pool = ThreadPool(processes=1)
+        self._requests = {}
+
+    def request(self, game):
+        """Start searching the move for the current piece of a game if it isn't already."""
+        if game.pieces_placed not in self._requests:
+            board = [row[:] for row in game.board]
+            self._requests[game.pieces_placed] = (
+                self._pool.apply_async(self.player, (board, game.piece)), time.time())
+
+    def result(self, game):
+        """Get the move for the current piece of a game, None while it is being searched.
+
+        Requests for earlier pieces are dropped once the move is taken.
+        """
+        self.request(game)
+        async_result, _ = self._requests[game.pieces_placed]
+        if not async_result.ready():
+            return None
+        for pieces_placed in list(self._requests):
+            if pieces_placed <= game.pieces_placed:
+                del self._requests[pieces_placed]
+        return async_result.get()
+
+    def waiting_time(self, game):
+        """Get how long the move for the current piece of a game has been searched for."""
+        if game.pieces_placed not in self._requests:
+            return 0.0
+        return time.time() - self._requests[game.pieces_placed][1]
+
+    def close(self):
+        """Stop the worker without waiting, the moves still being searched are dropped.
+
+        A search in progress runs to its end on the daemon worker thread, no one reads it.
+        """
+        self._pool.terminate()
+        self._requests = {}
@@ -12,29 +12,48 @@ Pushpak Jha, added tetris players
 """
 import sys
 import time
-from random import randrange as rand
 
 import pygame
 
 from tetris_dp import constants
-from tetris_dp import helpers
+from tetris_dp import engine
+from tetris_dp import pieces
+from tetris_dp import renderer
+from tetris_dp import search_worker
 from tetris_dp import tetris_players
 
 FAST_MODE = 0
 ANIMATE_FALLING = 0
+# Search moves on a background thread in visual mode so the window never freezes
+BACKGROUND_SEARCH = 1
+# Searches taking longer than this are reported on screen
+SLOW_DECISION_SECONDS = 0.5
+
+
+def _engine_attribute(name):
+    """Property which reads and writes an attribute of the app's engine."""
+    return property(lambda self: getattr(self.engine, name),
+                    lambda self, value: setattr(self.engine, name, value))
 
 
 class TetrisApp:
-    """The main tetris application."""
-    def __init__(self):
-        self.score = 0
-        self.piece = None
-        self.piece_x = None
-        self.piece_y = None
-        self.gameover = None
-        self.board = None
+    """The main tetris application.
+
+    The game rules live in a TetrisEngine, the app renders it and handles input. The player is
+    the function used to pick moves in run, it takes the board and piece and returns the x, y
+    and rotated piece of the move.
+    """
+    board = _engine_attribute('board')
+    piece = _engine_attribute('piece')
+    piece_x = _engine_attribute('piece_x')
+    piece_y = _engine_attribute('piece_y')
+    score = _engine_attribute('score')
+    gameover = _engine_attribute('gameover')
+
+    def __init__(self, player=None, seed=None, piece_mode=pieces.UNIFORM):
+        self.player = player or tetris_players.single_stage_player
+        self.engine = engine.TetrisEngine(seed, piece_mode)
         self.paused = None
-        self.init_game()
         self.skip_cost = 0
         if not FAST_MODE:
             pygame.init()  # pylint: disable=no-member
@@ -45,119 +64,53 @@ class TetrisApp:
             self.screen = pygame.display.set_mode((self.width, self.height))
 
             pygame.event.set_blocked(pygame.MOUSEMOTION)  # pylint: disable=no-member
-            self.font_name = pygame.font.match_font('arial')
+            self.renderer = renderer.BoardRenderer(self.screen)
 
     @staticmethod
     def new_board():
         """Spawn a new empty board."""
-        board = [[0 for _ in range(constants.CONFIG['cols'])]
-                 for _ in range(constants.CONFIG['rows'])]
-        board += [[1 for _ in range(constants.CONFIG['cols'])]]
-        return board
-
-    def draw_text(self, surf, text, size, x_position, y_position):
-        """Draw text on the screen."""
-        font = pygame.font.Font(self.font_name, size)
-        text_surface = font.render(text, True, (255, 255, 255))
-        text_rect = text_surface.get_rect()
-        text_rect.midtop = (x_position, y_position)
-        surf.blit(text_surface, text_rect)
+        return engine.new_board()
 
     def new_piece(self):
         """Randomly spawn a new piece."""
-        self.piece = constants.TETRIS_SHAPES[rand(len(constants.TETRIS_SHAPES))]
-        self.piece_x = int(constants.CONFIG['cols'] / 2 - len(self.piece[0])/2)
-        self.piece_y = 0
-
-        if helpers.check_collision(self.board, self.piece, (self.piece_x, self.piece_y)):
-            self.gameover = True
+        self.engine.new_piece()
 
     def init_game(self):
         """Start a tetris game with a board and piece."""
-        self.board = self.new_board()
-        self.new_piece()
+        self.engine.reset()
 
     def center_msg(self, msg):
-        """Helper to add a message on the screen."""
-        for i, line in enumerate(msg.splitlines()):
-            msg_image = pygame.font.Font(
-                pygame.font.get_default_font(), 12).render(
-                    line, False, (255, 255, 255), (0, 0, 0))
-
-            msgim_center_x, msgim_center_y = msg_image.get_size()
-            msgim_center_x //= 2
-            msgim_center_y //= 2
-
-            self.screen.blit(msg_image, (self.width // 2-msgim_center_x,
-                                         self.height // 2-msgim_center_y+i*22))
-
-    def draw_matrix(self, board, offset):
-        """Draw the actual board using pygame."""
-        off_x, off_y = offset
-        for y_position, row in enumerate(board):
-            for x_position, val in enumerate(row):
-                try:
-                    if val:
-                        pygame.draw.rect(
-                            self.screen,
-                            constants.COLORS[val],
-                            pygame.Rect(
-                                (off_x+x_position) * constants.CONFIG['cell_size'],
-                                (off_y+y_position) * constants.CONFIG['cell_size'],
-                                constants.CONFIG['cell_size'],
-                                constants.CONFIG['cell_size']), 0)
-                        self.draw_text(
-                            self.screen, str(self.score), 18,
-                            constants.CONFIG['cell_size'] * constants.CONFIG['rows'] / 20,
-                            10)
-                except IndexError:
-                    print('***' * 20)
-                    print('YOU SHOULD NOT BE HERE')
-                    print(self.board)
-                    print(self.piece)
-                    print('***' * 20)
-                    self.gameover = True
+        """Clear the screen and show a message, return the rectangles to update."""
+        return self.renderer.message(msg)
+
+    def render(self):
+        """Draw the current frame and push only the changed rectangles to the display."""
+        if self.paused:
+            dirty_rects = self.center_msg('Paused')
+        else:
+            dirty_rects = self.renderer.draw(self.board, self.piece,
+                                             (self.piece_x, self.piece_y), self.score)
+        pygame.display.update(dirty_rects)
 
     def move(self, delta_x):
         """For manual play move the piece left or right."""
-        if not self.gameover and not self.paused:
-            new_x = self.piece_x + delta_x
-            if new_x < 0:
-                new_x = 0
-            if new_x > constants.CONFIG['cols'] - len(self.piece[0]):
-                new_x = constants.CONFIG['cols'] - len(self.piece[0])
-            if not helpers.check_collision(self.board, self.piece, (new_x, self.piece_y)):
-                self.piece_x = new_x
+        if not self.paused:
+            self.engine.move(delta_x)
 
     def quit(self):
         """Quits the game."""
-        self.center_msg("Exiting...")
-        pygame.display.update()
+        pygame.display.update(self.center_msg("Exiting..."))
         sys.exit()
 
     def drop(self):
         """Drops the piece into place and spawns the next one."""
-        if not self.gameover and not self.paused:
-            self.board = helpers.add_piece_to_board(self.board, self.piece,
-                                                    (self.piece_x, self.piece_y))
-            self.new_piece()
-            while True:
-                for i, row in enumerate(self.board[:-1]):
-                    if 0 not in row:
-                        self.board = helpers.remove_row(self.board, i)
-                        self.score += 1
-                        break
-                else:
-                    break
+        if not self.paused:
+            self.engine.drop()
 
     def rotate_piece(self):
         """Rotate a piece as long as it won't cause a collision."""
-        if not self.gameover and not self.paused:
-            new_piece = helpers.rotate_clockwise(self.piece)
-            if not helpers.check_collision(self.board,
-                                           new_piece,
-                                           (self.piece_x, self.piece_y)):
-                self.piece = new_piece
+        if not self.paused:
+            self.engine.rotate()
 
     def toggle_pause(self):
         """Pauses the game."""
@@ -171,6 +124,8 @@ class TetrisApp:
 
     def run(self):  # pylint: disable=too-many-branches
         """Main game loop for the automatic playing tetris game."""
+        if BACKGROUND_SEARCH and not FAST_MODE:
+            return self.background_run()
         self.gameover = False
         self.paused = False
 
@@ -178,25 +133,16 @@ class TetrisApp:
             pygame.time.set_timer(pygame.USEREVENT+1, constants.CONFIG['delay'])  # pylint: disable=no-member
             pygame_clock = pygame.time.Clock()
         while True:
-            if not FAST_MODE:
-                self.screen.fill((0, 0, 0))
             if self.gameover:
                 if not FAST_MODE:
-                    self.center_msg("""Game Over! Press space to continue""")
+                    pygame.display.update(self.center_msg("""Game Over! Press space to continue"""))
                     print('Final Score: {}'.format(self.score))
                     time.sleep(1)
                     self.quit()
                 else:
                     return self.score
-            else:
-                if not FAST_MODE:
-                    if self.paused:
-                        self.center_msg("Paused")
-                    else:
-                        self.draw_matrix(self.board, (0, 0))
-                        self.draw_matrix(self.piece, (self.piece_x, self.piece_y))
             if not FAST_MODE:
-                pygame.display.update()
+                self.render()
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:  # pylint: disable=no-member
                         self.quit()
@@ -205,12 +151,10 @@ class TetrisApp:
             # Set to 1 if you want to animate the falling of the blocks
             if ANIMATE_FALLING:
                 if not self.skip_cost:
-                    self.piece_x, _, self.piece = tetris_players.single_stage_player(
-                        self.board, self.piece)
+                    self.piece_x, _, self.piece = self.player(self.board, self.piece)
                 self.drop_plus_falling()
             else:
-                self.piece_x, self.piece_y, self.piece = tetris_players.single_stage_player(
-                    self.board, self.piece)
+                self.piece_x, self.piece_y, self.piece = self.player(self.board, self.piece)
                 self.drop()
             if not FAST_MODE and not ANIMATE_FALLING:
                 # time.sleep(0.1)
@@ -219,6 +163,58 @@ class TetrisApp:
                 time.sleep(0.05)
                 pygame_clock.tick(constants.CONFIG['maxfps'])
 
+    def background_run(self):  # pylint: disable=too-many-branches
+        """Game loop for the automatic players with the search on a background thread.
+
+        Events are handled and frames drawn at maxfps whatever the player is doing. As soon as
+        the move of the current piece is known the move of the next one is requested from a
+        copy of the game, so it is searched while the current piece falls.
+        """
+        self.gameover = False
+        self.paused = False
+        worker = search_worker.SearchWorker(self.player)
+        pygame_clock = pygame.time.Clock()
+        move = None
+        waiting = 0.0
+        try:
+            while not self.gameover:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:  # pylint: disable=no-member
+                        self.quit()
+                    elif event.type == pygame.KEYDOWN and event.key == pygame.K_p:  # pylint: disable=no-member
+                        self.toggle_pause()
+                if not self.paused and move is None:
+                    move = worker.result(self.engine)
+                    if move is None:
+                        waiting = worker.waiting_time(self.engine)
+                    else:
+                        if waiting > SLOW_DECISION_SECONDS:
+                            print('Move for piece {} took {:.1f}s'.format(
+                                self.engine.pieces_placed + 1, waiting))
+                        waiting = 0.0
+                        next_game = self.engine.clone()
+                        next_game.step(move)
+                        if not next_game.gameover:
+                            worker.request(next_game)
+                        self.piece_x, _, self.piece = move
+                if not self.paused and move is not None:
+                    if ANIMATE_FALLING and self.piece_y + 1 < move[1]:
+                        self.piece_y += 1
+                    else:
+                        self.engine.step(move)
+                        move = None
+                self.render()
+                if waiting > SLOW_DECISION_SECONDS and not self.paused:
+                    pygame.display.update(self.renderer.overlay(
+                        'Thinking... {:.1f}s'.format(waiting)))
+                pygame_clock.tick(constants.CONFIG['maxfps'])
+        finally:
+            worker.close()
+        pygame.display.update(self.center_msg("""Game Over!"""))
+        print('Final Score: {}'.format(self.score))
+        time.sleep(1)
+        self.quit()
+
     def manual_run(self):
         """Main game loop if you want to play manually with the arrow keys."""
         key_actions = {
@@ -237,22 +233,12 @@ class TetrisApp:
         pygame.time.set_timer(pygame.USEREVENT + 1, constants.CONFIG['delay'])  # pylint: disable=no-member
         pygame_clock = pygame.time.Clock()
         while True:
-            self.screen.fill((0, 0, 0))
             if self.gameover:
-                self.center_msg("""Game Over!""")
+                pygame.display.update(self.center_msg("""Game Over!"""))
                 print('Final Score: {}'.format(self.score))
                 time.sleep(1)
                 self.quit()
-            else:
-                if self.paused:
-                    self.center_msg("Paused")
-                else:
-                    self.draw_matrix(self.board, (0, 0))
-                    self.draw_matrix(self.piece,
-                                     (self.piece_x,
-                                      self.piece_y))
-            if not FAST_MODE:
-                pygame.display.update()
+            self.render()
 
             for event in pygame.event.get():
                 if event.type == pygame.USEREVENT + 1:  # pylint: disable=no-member
@@ -272,21 +258,8 @@ class TetrisApp:
         This slowly drops a piece to animate a falling piece on the board. When using the
         automatic tetris players we don't care about that so the drop functions are different.
         """
-        if not self.gameover and not self.paused:
-            self.piece_y += 1
-            if helpers.check_collision(self.board, self.piece, (self.piece_x, self.piece_y)):
-                self.board = helpers.add_piece_to_board(self.board, self.piece,
-                                                        (self.piece_x, self.piece_y))
-                self.new_piece()
-                while True:
-                    for i, row in enumerate(self.board[:-1]):
-                        if 0 not in row:
-                            self.board = helpers.remove_row(
-                                self.board, i)
-                            self.score += 1
-                            break
-                    else:
-                        break
+        if not self.paused:
+            self.engine.soft_drop()
 
     def drop_plus_falling(self):
         """The drop function when playing automatically but animates falling down.
@@ -295,19 +268,6 @@ class TetrisApp:
         automatic tetris players we don't care about that so the drop functions are different.
         """
         if not self.gameover and not self.paused:
-            self.piece_y += 1
             self.skip_cost = 1
-            if helpers.check_collision(self.board, self.piece, (self.piece_x, self.piece_y)):
-                self.board = helpers.add_piece_to_board(self.board, self.piece,
-                                                        (self.piece_x, self.piece_y))
-                self.new_piece()
+            if self.engine.soft_drop():
                 self.skip_cost = 0
-                while True:
-                    for i, row in enumerate(self.board[:-1]):
-                        if 0 not in row:
-                            self.board = helpers.remove_row(
-                                self.board, i)
-                            self.score += 1
-                            break
-                    else:
-                        break
@@ -1,11 +1,49 @@
 """Various automatic tetris players."""
 import random
+import time
 from multiprocessing.pool import ThreadPool
 import numpy
 
+from tetris_dp import batch_evaluator
+from tetris_dp import bitboard
+from tetris_dp import board_state
 from tetris_dp import constants
 from tetris_dp import helpers
+from tetris_dp import instrumentation
+from tetris_dp import persistent_board
+from tetris_dp import placements
+from tetris_dp import transposition
 USE_DELLACHERIES = 1
+USE_BITBOARD = 1
+USE_BATCH_EVALUATOR = 1
+USE_INCREMENTAL_FEATURES = 1
+USE_TRANSPOSITION_TABLE = 1
+USE_PERSISTENT_BOARDS = 1
+
+# Max entries kept in each transposition table before the least recently used are evicted
+TRANSPOSITION_TABLE_SIZE = 100000
+# (board, piece) -> (best move, cost)
+MOVE_TABLE = transposition.TranspositionTable(TRANSPOSITION_TABLE_SIZE)
+# (afterstate, removed rows, landing row) -> Dellacherie cost
+AFTERSTATE_TABLE = transposition.TranspositionTable(TRANSPOSITION_TABLE_SIZE)
+
+# Original weights stolen from ref #2 in _calculate_dellacheries_cost
+# weight = [landing height, cleared rows, row transitions, col transitions, holes, wells]
+# orig_weights = [4.5001588, -3.4181268, 3.278882, 9.3486953, 7.8992654, 3.3855972]
+DELLACHERIE_WEIGHTS = [6.5001588, -5.4181268, 3.278882, 9.3486953, 9.8992654, 5.3855972]
+# DELLACHERIE_WEIGHTS = [6, -5, 3, 9, 9, 5]
+
+
+def set_weights(weights):
+    """Use new Dellacherie weights, clearing the transposition tables if they changed.
+
+    The tables hold moves and costs worked out with the old weights.
+    """
+    weights = [float(weight) for weight in weights]
+    if weights != DELLACHERIE_WEIGHTS:
+        DELLACHERIE_WEIGHTS[:] = weights
+        MOVE_TABLE.clear()
+        AFTERSTATE_TABLE.clear()
 
 
 def random_player(board, piece, shape_x, shape_y):
@@ -21,9 +59,9 @@ def random_player(board, piece, shape_x, shape_y):
         final_shape = piece
 
     # Get random x_position position
-    new_x = random.randint(0, constants.CONFIG['cols'])
-    if new_x > constants.CONFIG['cols'] - len(piece[0]):
-        new_x = constants.CONFIG['cols'] - len(piece[0])
+    new_x = random.randint(0, len(board[0]))
+    if new_x > len(board[0]) - len(piece[0]):
+        new_x = len(board[0]) - len(piece[0])
     if not helpers.check_collision(board, piece, (new_x, shape_y)):
         shape_x = new_x
     return shape_x, final_shape
@@ -31,9 +69,28 @@ def random_player(board, piece, shape_x, shape_y):
 
 def single_stage_player(board, piece):
     """Player which returns the lowest cost move given the current board and piece."""
+    if not USE_TRANSPOSITION_TABLE:
+        return _find_best_move(board, piece)[0]
+    timer = instrumentation.start()
+    key = transposition.board_piece_key(bitboard.from_board(board), piece)
+    best_move = MOVE_TABLE.get(key)
+    instrumentation.stop('cache', timer)
+    if best_move is None:
+        instrumentation.count('move_cache_misses')
+        best_move = _find_best_move(board, piece)
+        MOVE_TABLE.put(key, best_move)
+    else:
+        instrumentation.count('move_cache_hits')
+    return best_move[0]
+
+
+def _find_best_move(board, piece):
+    """Get the lowest cost move and its cost."""
+    if USE_DELLACHERIES and USE_BATCH_EVALUATOR:
+        return batch_evaluator.best_move(board, piece, DELLACHERIE_WEIGHTS)
     cost_to_move = _get_costs_of_moves(board, piece)
     min_cost = min(cost_to_move.keys())
-    return cost_to_move[min_cost]
+    return cost_to_move[min_cost], min_cost
 
 
 def lookahead_player(board, piece):
@@ -48,14 +105,19 @@ def lookahead_player(board, piece):
 
 def _simulate_stages(sorted_costs, cost_to_move, board):
     """Simulate the next few moves of the game and get future costs."""
+    timer = instrumentation.start_exclusive()
     pool = ThreadPool(processes=4)
     final_adjusted_costs = {}
     results = []
+    if USE_PERSISTENT_BOARDS:
+        # Every stage shares the rows of the board instead of copying it
+        board = persistent_board.from_board(board)
     for cost in sorted_costs[:4]:
         results.append(pool.apply_async(_simulate_stage_threaded, args=(board, cost_to_move, cost)))
     pool.close()
     pool.join()
     results = [r.get() for r in results]
+    instrumentation.stop_exclusive('pool', timer)
     for adjusted_cost in results:
         final_adjusted_costs.update(adjusted_cost)
     return final_adjusted_costs
@@ -66,18 +128,21 @@ def _simulate_stage_threaded(board, cost_to_move, cost):
     cur_x, cur_y, cur_piece = cost_to_move[cost]
     future_costs = []
     adjusted_costs = {}
+    boards = persistent_board if USE_PERSISTENT_BOARDS else helpers
     for _ in range(0, 1):
-        interm_board, removed_rows = helpers.get_interm_board(board, cur_piece, (cur_x, cur_y))
+        interm_board, removed_rows = boards.get_interm_board(board, cur_piece, (cur_x, cur_y))
         future_cost = 0
         for _ in range(0, 1):
-            rand_piece = random.choice(constants.TETRIS_SHAPES)
+            # Seed the sampled piece from the board so lookahead moves are reproducible
+            rand_piece = random.Random(transposition.zobrist_hash(
+                bitboard.from_board(interm_board))).choice(constants.TETRIS_SHAPES)
             best_x, best_y, best_piece = single_stage_player(interm_board, rand_piece)
-            interm_board = helpers.add_piece_to_board(
+            interm_board = boards.add_piece_to_board(
                 interm_board, best_piece, (best_x, best_y))
             if not USE_DELLACHERIES:
                 future_cost += _calculate_simple_cost(interm_board) / 1
             else:
-                future_cost += _calculate_dellacheries_cost(
+                future_cost += _get_afterstate_cost(
                     interm_board, removed_rows, (best_x, best_y)) / 1
         future_costs.append(future_cost)
     expected_future_cost = sum(future_costs) / len(future_costs)
@@ -89,28 +154,76 @@ def _simulate_stage_threaded(board, cost_to_move, cost):
 def _get_costs_of_moves(board, piece):
     """Get the costs of all the moves given a board and piece."""
     cost_to_move = {}
-    max_x = len(board[0])
     rotation_index = constants.TETRIS_SHAPES.index(piece)
-
-    for rand_rotation in range(0, constants.SHAPE_TO_ROTATION[rotation_index]):
-        if rand_rotation:
-            piece = helpers.rotate_clockwise(piece)
-        for new_x in range(0, max_x - len(piece[0]) + 1):
-            interm_piece_y = 0
-            while not helpers.check_collision(board, piece, (new_x, interm_piece_y)):
-                interm_piece_y += 1
-            interm_board, removed_rows = helpers.get_interm_board(
+    engine = helpers
+    state = None
+    timer = instrumentation.start()
+    if USE_BITBOARD and USE_DELLACHERIES:
+        engine = bitboard
+        board = bitboard.from_board(board)
+        if USE_INCREMENTAL_FEATURES:
+            state = board_state.BoardState(board)
+    elif USE_PERSISTENT_BOARDS:
+        engine = persistent_board
+        board = persistent_board.from_board(board)
+    tops = engine.column_tops(board)
+    instrumentation.stop('board_copy', timer)
+
+    timer = instrumentation.start()
+    moves = placements.landing_placements(engine, board, tops, rotation_index)
+    instrumentation.stop('move_generation', timer)
+    instrumentation.count('candidates', len(moves))
+    # Checked once per call, the board copies are timed together and added at the end
+    timed = instrumentation.ENABLED
+    board_copy_seconds = 0.0
+    start_time = 0.0
+    for placement, new_x, interm_piece_y in moves:
+        piece = placement.piece
+        if timed:
+            start_time = time.perf_counter()
+        if state is not None:
+            removed_rows = state.place(placement, new_x, interm_piece_y)
+            if timed:
+                board_copy_seconds += time.perf_counter() - start_time
+            interm_cost = _get_afterstate_cost(
+                state, removed_rows, (new_x, interm_piece_y), board_state, state.hash)
+            state.undo()
+        else:
+            interm_board, removed_rows = engine.get_interm_board(
                 board, piece, (new_x, interm_piece_y))
-
+            if timed:
+                board_copy_seconds += time.perf_counter() - start_time
             if not USE_DELLACHERIES:
                 interm_cost = _calculate_simple_cost(interm_board, removed_rows)
             else:
                 interm_cost = _calculate_dellacheries_cost(
-                    interm_board, removed_rows, (new_x, interm_piece_y))
-            cost_to_move[interm_cost] = (new_x, interm_piece_y, piece)
+                    interm_board, removed_rows, (new_x, interm_piece_y), engine)
+        cost_to_move[interm_cost] = (new_x, interm_piece_y, piece)
+    if timed:
+        instrumentation.add('board_copy', board_copy_seconds)
     return cost_to_move
 
 
+def _get_afterstate_cost(board, removed_rows, offset, engine=helpers, board_hash=None):
+    """Get the Dellacherie cost of an afterstate, looked up in AFTERSTATE_TABLE first.
+
+    The board hash is worked out from a list of lists board if it isn't given.
+    """
+    if not USE_TRANSPOSITION_TABLE:
+        return _calculate_dellacheries_cost(board, removed_rows, offset, engine)
+    if board_hash is None:
+        board_hash = transposition.zobrist_hash(bitboard.from_board(board))
+    key = (board_hash, removed_rows, offset[1])
+    cost = AFTERSTATE_TABLE.get(key)
+    if cost is None:
+        instrumentation.count('afterstate_cache_misses')
+        cost = _calculate_dellacheries_cost(board, removed_rows, offset, engine)
+        AFTERSTATE_TABLE.put(key, cost)
+    else:
+        instrumentation.count('afterstate_cache_hits')
+    return cost
+
+
 def _calculate_simple_cost(board, removed_rows=0):
     """Given a board calculate the cost."""
     max_x = len(board[0])
@@ -142,7 +255,7 @@ def _calculate_simple_cost(board, removed_rows=0):
     return _get_cost_from_vectors(costs, weights)
 
 
-def _calculate_dellacheries_cost(board, removed_rows, offset):
+def _calculate_dellacheries_cost(board, removed_rows, offset, engine=helpers):
     """Given a board calculate the cost using Dellacherie's criteria.
 
     See ref #1 https://hal.inria.fr/hal-00926213/document
@@ -157,23 +270,22 @@ def _calculate_dellacheries_cost(board, removed_rows, offset):
      Note that borders count as filled cells.
     (f5) Number of holes: The number of empty cells with at least one filled cell above.
     (f6) Cumulative wells: The sum of the accumulated depths of the wells.
+    The engine is the module holding the board functions, helpers, bitboard or board_state.
     """
     _, off_y = offset
-
-    # Original weights stolen from ref #2 above
-    # weight = [landing height, cleared rows, row transitions, col transitions, holes, wells]
-    # orig_weights = [4.5001588, -3.4181268, 3.278882, 9.3486953, 7.8992654, 3.3855972]
-    weights = [6.5001588, -5.4181268, 3.278882, 9.3486953, 9.8992654, 5.3855972]
-    # weights = [6, -5, 3, 9, 9, 5]
     costs = []
+    timer = None
+    if instrumentation.ENABLED:
+        instrumentation.count('afterstates')
+        timer = instrumentation.start()
 
     # Add to costs
     # Rule 1
-    costs.append(constants.CONFIG['rows'] + 1 - off_y)
+    costs.append(len(board) - off_y)
     # Rule 2
     costs.append(removed_rows**4)
     # Rule 3
-    num_holes, num_wells, row_transitions, col_transitions = helpers.find_holes_and_wells(board)
+    num_holes, num_wells, row_transitions, col_transitions = engine.find_holes_and_wells(board)
     costs.append(row_transitions)
     # Rule 4
     costs.append(col_transitions)
@@ -181,9 +293,15 @@ def _calculate_dellacheries_cost(board, removed_rows, offset):
     costs.append(num_holes)
     # Rule 6
     costs.append(num_wells)
+    if timer is not None:
+        instrumentation.stop('features', timer)
+        timer = instrumentation.start()
 
     # Get the final cost
-    return _get_cost_from_vectors(costs, weights)
+    cost = _get_cost_from_vectors(costs, DELLACHERIE_WEIGHTS)
+    if timer is not None:
+        instrumentation.stop('scoring', timer)
+    return cost
 
 
 def _get_cost_from_vectors(costs, weights):
@@ -206,7 +324,7 @@ def _find_column_heights(board, max_x, max_y):
                 all_heights.append(99)
                 break
             elif board[y_position][x_position]:
-                cost.append((21 - y_position)**2)
-                all_heights.append(21 - y_position)
+                cost.append((max_y - y_position)**2)
+                all_heights.append(max_y - y_position)
                 break
     return all_heights, cost
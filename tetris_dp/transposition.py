@@ -0,0 +1,125 @@
+"""Transposition tables for board evaluations.
+
+Boards are hashed with Zobrist hashing, every cell has a random 64 bit key and the hash of a
+board is the XOR of the keys of its filled cells. Filling a cell only needs one more XOR so
+board states can keep their hash up to date as pieces are placed.
+"""
+import collections
+import random
+import threading
+
+from tetris_dp import constants
+
+_ZOBRIST_SEED = 20190601
+# Wider rows are hashed a byte at a time, a key for every row mask would take too much memory
+ROW_TABLE_MAX_COLS = 12
+_KEYS = {}
+
+ZobristKeys = collections.namedtuple('ZobristKeys',
+                                     ['cell_keys', 'row_keys', 'byte_keys', 'piece_keys'])
+
+
+def _mask_keys(cell_keys):
+    """Get the key of every mask of a run of cells."""
+    # The key of a mask is the key of the mask without its lowest bit XOR that cell
+    mask_keys = [0] * (1 << len(cell_keys))
+    for mask in range(1, len(mask_keys)):
+        low_bit = mask & -mask
+        mask_keys[mask] = mask_keys[mask ^ low_bit] ^ cell_keys[low_bit.bit_length() - 1]
+    return mask_keys
+
+
+def keys_for(rows, cols):
+    """Get the random cell, row mask and piece keys of a board size, built on first use.
+
+    Every size draws its keys from the same seed so the default board always hashes the same.
+    Boards up to ROW_TABLE_MAX_COLS wide get a key for every row mask, wider ones a key for
+    every mask of each byte of a row.
+    """
+    keys = _KEYS.get((rows, cols))
+    if keys is None:
+        key_generator = random.Random(_ZOBRIST_SEED)
+        cell_keys = [[key_generator.getrandbits(64) for _ in range(cols)]
+                     for _ in range(rows + 1)]
+        row_keys = None
+        byte_keys = None
+        if cols <= ROW_TABLE_MAX_COLS:
+            row_keys = [_mask_keys(row_cell_keys) for row_cell_keys in cell_keys]
+        else:
+            byte_keys = [[_mask_keys(row_cell_keys[first_x:first_x + 8])
+                          for first_x in range(0, cols, 8)] for row_cell_keys in cell_keys]
+        piece_keys = [key_generator.getrandbits(64) for _ in constants.TETRIS_SHAPES]
+        keys = _KEYS[(rows, cols)] = ZobristKeys(cell_keys, row_keys, byte_keys, piece_keys)
+    return keys
+
+
+def board_keys(rows):
+    """Get the keys for the size of a bitboard, its sentinel floor row gives the width."""
+    return keys_for(len(rows) - 1, rows[-1].bit_length())
+
+
+CELL_KEYS, ROW_KEYS, _, PIECE_KEYS = keys_for(constants.CONFIG['rows'], constants.CONFIG['cols'])
+
+
+def zobrist_hash(rows):
+    """Get the Zobrist hash of a bitboard."""
+    keys = board_keys(rows)
+    board_hash = 0
+    if keys.row_keys is not None:
+        for row_keys, row in zip(keys.row_keys, rows):
+            board_hash ^= row_keys[row]
+        return board_hash
+    for row_byte_keys, row in zip(keys.byte_keys, rows):
+        for byte_keys in row_byte_keys:
+            board_hash ^= byte_keys[row & 255]
+            row >>= 8
+    return board_hash
+
+
+def board_piece_key(rows, piece):
+    """Get the key of a bitboard and the piece about to be placed on it."""
+    return zobrist_hash(rows) ^ board_keys(rows).piece_keys[constants.TETRIS_SHAPES.index(piece)]
+
+
+class TranspositionTable:
+    """Bounded mapping from board keys to results with least recently used eviction."""
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Get the value stored for key or None, counting the hit or miss."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries when full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def hit_rate(self):
+        """Get the fraction of lookups which were found in the table."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
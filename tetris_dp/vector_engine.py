@@ -0,0 +1,246 @@
+"""Many headless tetris games stepped at once with numpy.
+
+The boards of K games are held in one (K, rows + 1, cols) array, the last row of each being
+the floor like the boards of engine.TetrisEngine. Every step places one piece in every game,
+clears the full rows, spawns the next pieces and starts a new game wherever one ended, all
+with array operations over the K games. The rules are the ones of TetrisEngine.drop, game k
+started with seed s plays exactly like TetrisEngine(s) given the same moves.
+
+Moves are action indexes into the placements of the current shape, every rotation at every
+x in placement table order, so actions past the number of placements of a shape are masked.
+The action of rotation r at x is first_actions[shape index][r] + x.
+"""
+import collections
+
+import numpy
+
+from tetris_dp import batch_evaluator
+from tetris_dp import constants
+from tetris_dp import helpers
+from tetris_dp import pieces
+from tetris_dp import placements
+
+ActionTable = collections.namedtuple(
+    'ActionTable', ['moves', 'first_actions', 'mask', 'cell_rows', 'cell_columns',
+                    'cell_values', 'spawn_rows', 'spawn_columns'])
+_ACTION_TABLES_BY_COLS = {}
+
+
+def _build_action_table(cols):
+    """Build the cells of every action of every shape on a board cols wide."""
+    moves = [[(placement, new_x) for placement in shape_placements
+              for new_x in placement.x_range]
+             for shape_placements in placements.get_placements(cols)]
+    first_actions = []
+    for shape_placements in placements.get_placements(cols):
+        first_actions.append([0])
+        for placement in shape_placements[:-1]:
+            first_actions[-1].append(first_actions[-1][-1] + len(placement.x_range))
+    max_actions = max(len(shape_moves) for shape_moves in moves)
+    mask = numpy.zeros((len(moves), max_actions), dtype=bool)
+    cell_rows = numpy.zeros((len(moves), max_actions, 4), dtype=numpy.intp)
+    cell_columns = numpy.zeros((len(moves), max_actions, 4), dtype=numpy.intp)
+    cell_values = numpy.zeros((len(moves), 4), dtype=numpy.uint8)
+    for shape_index, shape_moves in enumerate(moves):
+        mask[shape_index, :len(shape_moves)] = True
+        # Masked actions repeat the first one so they can be worked out like the others
+        for action, (placement, new_x) in enumerate(
+                shape_moves + [shape_moves[0]] * (max_actions - len(shape_moves))):
+            for cell_index, (row_index, column_index) in enumerate(placement.cells):
+                cell_rows[shape_index, action, cell_index] = row_index
+                cell_columns[shape_index, action, cell_index] = column_index + new_x
+                cell_values[shape_index, cell_index] = placement.piece[row_index][column_index]
+    spawn_rows = numpy.zeros((len(moves), 4), dtype=numpy.intp)
+    spawn_columns = numpy.zeros((len(moves), 4), dtype=numpy.intp)
+    for shape_index, shape in enumerate(constants.TETRIS_SHAPES):
+        spawn_x = int(cols / 2 - len(shape[0])/2)
+        cells = [(row_index, column_index + spawn_x) for row_index, row in enumerate(shape)
+                 for column_index, cell in enumerate(row) if cell]
+        spawn_rows[shape_index], spawn_columns[shape_index] = zip(*cells)
+    return ActionTable(moves, first_actions, mask, cell_rows, cell_columns, cell_values,
+                       spawn_rows, spawn_columns)
+
+
+def get_action_table(cols):
+    """Get the action table of a board cols wide."""
+    table = _ACTION_TABLES_BY_COLS.get(cols)
+    if table is None:
+        table = _ACTION_TABLES_BY_COLS[cols] = _build_action_table(cols)
+    return table
+
+
+class VectorEngine:
+    """The rules of K tetris games stepped together.
+
+    Game k starts with seed + k and every game started after one ends takes the next unused
+    seed. If max_pieces is given games placing that many pieces end like games which topped
+    out. The seed, score and pieces placed of every game that ended are appended to finished.
+    """
+    def __init__(self, num_games, seed=0,  # pylint: disable=too-many-arguments
+                 piece_mode=pieces.UNIFORM, board_size=(None, None), max_pieces=None):
+        rows, cols = board_size
+        self.rows = constants.CONFIG['rows'] if rows is None else rows
+        self.cols = constants.CONFIG['cols'] if cols is None else cols
+        self.num_games = num_games
+        self.piece_mode = piece_mode
+        self.max_pieces = max_pieces
+        self.table = get_action_table(self.cols)
+        self.boards = numpy.zeros((num_games, self.rows + 1, self.cols), dtype=numpy.uint8)
+        self.shape_indexes = numpy.zeros(num_games, dtype=numpy.intp)
+        self.seeds = numpy.zeros(num_games, dtype=numpy.int64)
+        self.scores = numpy.zeros(num_games, dtype=numpy.int64)
+        self.pieces_placed = numpy.zeros(num_games, dtype=numpy.int64)
+        self.generators = [None] * num_games
+        self.finished = []
+        self._next_seed = seed
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """Start K new games with the seeds seed to seed + K - 1, or the next unused seeds."""
+        if seed is not None:
+            self._next_seed = seed
+        self.finished = []
+        self._start_games(numpy.arange(self.num_games))
+
+    def _start_games(self, games):
+        """Start new games in the given slots with the next unused seeds."""
+        for game in games.tolist():
+            self.seeds[game] = self._next_seed
+            self.generators[game] = pieces.PieceGenerator(self._next_seed, self.piece_mode)
+            self._next_seed += 1
+        self.boards[games] = 0
+        self.boards[games, -1] = 1
+        self.scores[games] = 0
+        self.pieces_placed[games] = 0
+        self._spawn(games)
+
+    def _spawn(self, games):
+        """Draw the next piece of the given games and get a mask of the ones which topped out."""
+        self.shape_indexes[games] = [self.generators[game].next_index()
+                                     for game in games.tolist()]
+        shape_indexes = self.shape_indexes[games]
+        return self.boards[games[:, numpy.newaxis], self.table.spawn_rows[shape_indexes],
+                           self.table.spawn_columns[shape_indexes]].any(axis=1)
+
+    def action_mask(self):
+        """Get a (K, max actions) mask of the actions of the current pieces."""
+        return self.table.mask[self.shape_indexes]
+
+    def column_tops(self):
+        """Get the row index of the highest filled cell of every column as a (K, cols) array."""
+        return (self.boards != 0).argmax(axis=1)
+
+    def landing_rows(self, games, actions, tops=None):
+        """Get the landing y of actions of the given games, like placements.landing_y.
+
+        games and actions are index arrays of the same shape. Pieces which have to be
+        stepped down past the tops are dropped one game at a time with landing_y, masked
+        actions are left as they are.
+        """
+        tops = self.column_tops() if tops is None else tops
+        shape_indexes = self.shape_indexes[games]
+        landing = (tops[games[..., numpy.newaxis],
+                        self.table.cell_columns[shape_indexes, actions]]
+                   - self.table.cell_rows[shape_indexes, actions]).min(axis=-1)
+        stepped = (landing < 0) & self.table.mask[shape_indexes, actions]
+        for index in zip(*numpy.nonzero(stepped)):
+            game = games[index]
+            placement, new_x = self.table.moves[shape_indexes[index]][actions[index]]
+            landing[index] = placements.landing_y(helpers, self.boards[game],
+                                                  tops[game].tolist(), placement, new_x)
+        return landing
+
+    def moves(self, actions):
+        """Get the (x, y, piece) move of every game's action, as TetrisEngine.step takes."""
+        games = numpy.arange(self.num_games)
+        landing = self.landing_rows(games, actions).tolist()
+        return [(new_x, new_y, placement.piece) for (placement, new_x), new_y in zip(
+            (self.table.moves[shape_index][action] for shape_index, action
+             in zip(self.shape_indexes.tolist(), actions.tolist())), landing)]
+
+    def step(self, actions, landing=None):
+        """Place the current piece of every game with an action and return (rows, ended).
+
+        The pieces are dropped straight down unless the landing y of every action is given.
+        rows is the number of rows each game removed and ended is a mask of the games which
+        ended on this step, their slots already hold new games.
+        """
+        actions = numpy.asarray(actions, dtype=numpy.intp)
+        if not self.action_mask()[numpy.arange(self.num_games), actions].all():
+            raise ValueError('Actions past the placements of the current pieces')
+        games = numpy.arange(self.num_games)
+        if landing is None:
+            landing = self.landing_rows(games, actions)
+        shape_indexes = self.shape_indexes.copy()
+        cell_rows = (self.table.cell_rows[shape_indexes, actions]
+                     + numpy.asarray(landing)[:, numpy.newaxis] - 1)
+        cell_columns = self.table.cell_columns[shape_indexes, actions]
+        self.boards[games[:, numpy.newaxis], cell_rows, cell_columns] += \
+            self.table.cell_values[shape_indexes]
+        self.pieces_placed += 1
+        # TetrisEngine.drop spawns the next piece before removing the full rows
+        ended = self._spawn(games)
+        piece_rows = numpy.zeros((self.num_games, self.rows + 1), dtype=bool)
+        piece_rows[games[:, numpy.newaxis], cell_rows % (self.rows + 1)] = True
+        full_rows = (self.boards[:, :-1] != 0).all(axis=2) & piece_rows[:, :-1]
+        removed_rows = batch_evaluator.clear_full_rows(self.boards, full_rows)
+        self.scores += removed_rows
+        if self.max_pieces is not None:
+            ended |= self.pieces_placed >= self.max_pieces
+        ended_games = numpy.nonzero(ended)[0]
+        if len(ended_games):
+            self.finished.extend(zip(self.seeds[ended_games].tolist(),
+                                     self.scores[ended_games].tolist(),
+                                     self.pieces_placed[ended_games].tolist()))
+            self._start_games(ended_games)
+        return removed_rows, ended
+
+    def afterstate_features(self):
+        """Get the Dellacherie features of every action of every game as a (K, actions, 6) array.
+
+        The afterstates of every action of every game are built in one batch, like
+        batch_evaluator._evaluate the rows above every piece cell are left out. The features
+        of masked actions are zero.
+        """
+        mask = self.action_mask()
+        max_actions = mask.shape[1]
+        games = numpy.repeat(numpy.arange(self.num_games)[:, numpy.newaxis], max_actions, axis=1)
+        actions = numpy.repeat(numpy.arange(max_actions)[numpy.newaxis], self.num_games, axis=0)
+        landing = self.landing_rows(games, actions)
+        first_row = max(0, int(landing[mask].min()) - 2)
+        landing -= first_row
+        shape_indexes = self.shape_indexes[games]
+        cell_rows = (self.table.cell_rows[shape_indexes, actions]
+                     + landing[..., numpy.newaxis] - 1)
+        cell_columns = self.table.cell_columns[shape_indexes, actions]
+        boards = self.boards[:, first_row:] != 0
+        # Like batch_evaluator.build_afterstates, cells which overlap go on the top row
+        cell_rows[boards[games[..., numpy.newaxis], cell_rows, cell_columns]] = 0
+        afterstates = numpy.repeat(boards[:, numpy.newaxis], max_actions, axis=1)
+        afterstates[games[..., numpy.newaxis], actions[..., numpy.newaxis],
+                    cell_rows, cell_columns] = True
+        afterstates = afterstates.reshape((-1,) + boards.shape[1:])
+        removed_rows = batch_evaluator.clear_full_rows(afterstates,
+                                                       afterstates[:, :-1, :].all(axis=2))
+        features = batch_evaluator.find_features(afterstates, removed_rows, landing.ravel())
+        features = features.reshape(self.num_games, max_actions, features.shape[1])
+        features[~mask] = 0
+        return features
+
+    def greedy_actions(self, weights):
+        """Get the lowest Dellacherie cost action of every game, like single_stage_player.
+
+        Ties go to the last action like batch_evaluator.best_move.
+        """
+        costs = self.afterstate_features().dot(weights)
+        costs[~self.action_mask()] = numpy.inf
+        return costs.shape[1] - 1 - numpy.argmin(costs[:, ::-1], axis=1)
+
+    def play(self, weights, games):
+        """Play greedy games until at least games of them have finished and return finished.
+
+        Every slot keeps starting new games, so the last steps may finish more than asked.
+        """
+        while len(self.finished) < games:
+            self.step(self.greedy_actions(weights))
+        return self.finished